@@ -1,5 +1,22 @@
 # api/__init__.py
+import importlib
+
 from .base import AIClientAdapter
-from .openai_client import OpenAIClient
-from .deepseek_client import DeepSeekClient
-from .config import get_client, CLIENTS
+from .config import get_client, evict_clients, CLIENTS
+from .cache import ResponseCache, get_response_cache
+
+# Re-exported on first access, so importing the package loads no HTTP library or SDK
+_LAZY = {
+    "OpenAIClient": ".openai_client",
+    "DeepSeekClient": ".deepseek_client",
+    "LocalClient": ".local_client",
+    "get_session": ".session",
+    "configure_session": ".session",
+    "session_stats": ".session",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
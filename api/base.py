@@ -1,20 +1,95 @@
 # api/base.py
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from typing import Iterator, Optional
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, Optional
+from .cancel import CancelToken
 
 class AIClientAdapter(ABC):
     """Base class for AI service adapters"""
 
+    # False for local servers that accept any key
+    requires_api_key = True
+
     def __init__(self, api_key: str, model: str):
         self.api_key = api_key
         self.model = model
+        self._requests_lock = threading.Lock()
+        self._requests = 0  # in flight
+        self._retired = False
+
+    @property
+    def in_flight(self) -> int:
+        return self._requests
+
+    @contextmanager
+    def _tracked(self):
+        """Count a request as in flight while the block runs; adapters wrap their sends in it."""
+        with self._requests_lock:
+            self._requests += 1
+        try:
+            yield
+        finally:
+            with self._requests_lock:
+                self._requests -= 1
+                close = self._retired and not self._requests
+            if close:
+                self.close()
+
+    def retire(self) -> None:
+        """Close the client once the requests in flight on it have finished."""
+        with self._requests_lock:
+            self._retired = True
+            close = not self._requests
+        if close:
+            self.close()
 
     @abstractmethod
-    def send_message(self, messages: list, stream: bool = True) -> Iterator[str]:
-        """Send message and yield response chunks"""
+    def send_message(self, messages: list, stream: bool = True,
+                     cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        """Send message and yield response chunks.
+
+        Cancelling ``cancel`` closes the request's connection and ends the
+        iterator without an error chunk.
+        """
         pass
 
+    async def asend_message(self, messages: list, stream: bool = True,
+                            cancel: Optional[CancelToken] = None) -> AsyncIterator[str]:
+        """Send message and asynchronously yield response chunks.
+
+        Adapters override this with a native implementation so many replies
+        can stream on one event loop. This fallback steps ``send_message``
+        in the loop's default executor.
+
+        Native implementations stop on ``cancel`` by cancelling the task
+        iterating them; if that task is awaiting something else at the time,
+        it receives the ``CancelledError`` itself.
+        """
+        loop = asyncio.get_running_loop()
+        if cancel is None:
+            chunks = self.send_message(messages, stream)
+        else:
+            chunks = self.send_message(messages, stream, cancel=cancel)
+        done = object()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, done)
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            try:
+                chunks.close()
+            except ValueError:
+                pass  # still running in the executor after a cancel; it ends on its own
+
     @abstractmethod
     def validate_api_key(self) -> bool:
         """Validate API key is valid"""
         pass
+
+    def close(self) -> None:
+        """Release the client's transport; the client is not used afterwards"""
+        pass
@@ -0,0 +1,242 @@
+# api/batch.py
+"""Run a JSONL file of prompts through a provider adapter, without the UI.
+
+Each input line is a JSON object with an ``id`` (the line number if left
+out) and either a ``prompt`` string or a ``messages`` list of
+``{"role": ..., "content": ...}``; a ``model`` key overrides ``--model``
+for that line. Replies are streamed to the output JSONL as they complete,
+one object per input line, so the output is in completion order. Then
+throughput and latency percentiles are printed::
+
+    python -m api.batch prompts.jsonl -o replies.jsonl --provider deepseek \\
+        --model deepseek-chat --concurrency 16 --rate 5
+
+The API key comes from ``--api-key`` or the ``AI_CHAT_API_KEY`` variable.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import aclosing
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+
+from data.models import Message, ReplyMetrics
+from .config import get_client
+from .context import count_tokens
+from .errors import is_error
+from .metrics import StreamTimer, aggregate, current_timer
+from .session import aclose_session
+
+API_KEY_ENV = "AI_CHAT_API_KEY"
+
+# Requests in flight at once
+DEFAULT_CONCURRENCY = 8
+
+# ReplyMetrics fields summarised as p50/p95 at the end of a run
+STAT_FIELDS = ["connect", "first_chunk", "total", "tokens_per_sec"]
+
+
+@dataclass
+class BatchItem:
+    id: str
+    messages: List[Message]
+    model: Optional[str] = None
+
+
+@dataclass
+class BatchStats:
+    prompts: int = 0
+    errors: int = 0
+    tokens: int = 0  # reply tokens, estimated with count_tokens
+    elapsed: float = 0.0
+    metrics: List[ReplyMetrics] = field(default_factory=list, repr=False)
+
+    @property
+    def replies_per_sec(self) -> float:
+        return self.prompts / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> dict:
+        percentiles = aggregate(self.metrics, STAT_FIELDS)
+        return {
+            "prompts": self.prompts,
+            "errors": self.errors,
+            "elapsed": self.elapsed,
+            "replies_per_sec": self.replies_per_sec,
+            "tokens_per_sec": self.tokens_per_sec,
+            "percentiles": {name: {"p50": p50, "p95": p95} for name, (p50, p95, _) in percentiles.items()},
+        }
+
+
+def parse_item(line: str, number: int) -> BatchItem:
+    """One input line as a BatchItem; raises ValueError if it is malformed."""
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    item_id = str(data.get("id", number))
+    if "messages" in data:
+        messages = [Message(role=m["role"], content=m["content"]) for m in data["messages"]]
+    elif "prompt" in data:
+        messages = [Message(role="user", content=str(data["prompt"]))]
+    else:
+        raise ValueError("needs a 'prompt' or 'messages'")
+    return BatchItem(item_id, messages, data.get("model"))
+
+
+def read_items(lines: IO[str]) -> Iterator[Tuple[int, str]]:
+    """(line number, text) for each non-blank line; parsed lazily by the workers."""
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            yield number, line
+
+
+class RateLimiter:
+    """Spaces request starts at least ``1 / rate`` seconds apart; 0 means no limit."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def run_item(item: BatchItem, provider: str, api_key: str, model: str,
+                   base_url: Optional[str] = None, stream: bool = True) -> dict:
+    """Send one item and return its output record."""
+    model = item.model or model
+    timer = StreamTimer(provider, model)
+    current_timer.set(timer)
+    chunks = []
+    error = status = None
+    try:
+        client = get_client(provider, api_key, model, base_url)
+        timer.model = model = client.model
+        async with aclosing(client.asend_message(item.messages, stream)) as replies:
+            async for chunk in replies:
+                timer.chunk(chunk)
+                chunks.append(chunk)
+    except Exception as e:
+        error = str(e)
+    failed = next((c for c in chunks if is_error(c)), None)
+    if failed is not None:
+        # Possibly after some text: the reply keeps what arrived before it
+        error = str(failed)
+        status = failed.status
+        chunks = [c for c in chunks if not is_error(c)]
+    reply = "".join(chunks)
+    tokens = count_tokens(reply)
+    metrics = timer.finish(tokens)
+    return {
+        "id": item.id,
+        "model": model,
+        "reply": reply,
+        "error": error,
+        "status": status,  # HTTP status of a failed request, when there was one
+        "tokens": tokens,
+        "metrics": asdict(metrics),
+    }
+
+
+async def run_batch(lines: IO[str], output: IO[str], provider: str, api_key: str, model: str,
+                    base_url: Optional[str] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                    rate: float = 0.0, stream: bool = True) -> BatchStats:
+    """Run every line of ``lines`` and write one JSON record per line to ``output``.
+
+    At most ``concurrency`` requests are in flight, started no faster than
+    ``rate`` per second. Input is read as workers free up, so files of any
+    length run in constant memory.
+    """
+    items = read_items(lines)
+    limiter = RateLimiter(rate)
+    stats = BatchStats()
+    start = time.perf_counter()
+
+    async def worker():
+        for number, line in items:
+            try:
+                item = parse_item(line, number)
+            except (ValueError, KeyError, TypeError) as e:
+                record = {"id": str(number), "reply": "", "status": None,
+                          "error": f"Invalid input on line {number}: {e}"}
+            else:
+                await limiter.wait()
+                record = await run_item(item, provider, api_key, model, base_url, stream)
+                stats.metrics.append(ReplyMetrics(**record["metrics"]))
+                stats.tokens += record["tokens"]
+            stats.prompts += 1
+            stats.errors += record["error"] is not None
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        # The shared async HTTP client belongs to this event loop
+        await aclose_session()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def format_stats(stats: BatchStats) -> str:
+    lines = [
+        f"{stats.prompts} prompts, {stats.errors} errors in {stats.elapsed:.2f}s",
+        f"{stats.replies_per_sec:.2f} replies/s, {stats.tokens_per_sec:.1f} tokens/s",
+        f"{'':<16}{'p50':>10}{'p95':>10}",
+    ]
+    for name, (p50, p95, _) in aggregate(stats.metrics, STAT_FIELDS).items():
+        unit = "" if name == "tokens_per_sec" else "s"
+        cells = ["—" if v is None else f"{v:.3f}{unit}" for v in (p50, p95)]
+        lines.append(f"{name:<16}{cells[0]:>10}{cells[1]:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", type=Path, help="JSONL file of prompts, or - for stdin")
+    parser.add_argument("-o", "--output", type=Path, help="JSONL file for the replies (default: stdout)")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default="", help="default: the provider's own")
+    parser.add_argument("--api-key", default=os.environ.get(API_KEY_ENV, ""))
+    parser.add_argument("--base-url")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=0.0, help="requests started per second; 0 for no limit")
+    parser.add_argument("--no-stream", dest="stream", action="store_false")
+    parser.add_argument("--stats", type=Path, help="also write the statistics to this JSON file")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if str(args.input) == "-" else args.input.open(encoding="utf-8")
+    output = sys.stdout if args.output is None else args.output.open("w", encoding="utf-8")
+    try:
+        stats = asyncio.run(run_batch(
+            source, output, args.provider, args.api_key, args.model, args.base_url,
+            args.concurrency, args.rate, args.stream,
+        ))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(format_stats(stats), file=sys.stderr)
+    if args.stats:
+        args.stats.write_text(json.dumps(stats.summary(), indent=2))
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# api/cache.py
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import aclosing, closing
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional
+
+from .base import AIClientAdapter
+from .cancel import CancelToken, is_cancelled
+from .errors import is_error
+
+CACHE_FILE = "response_cache.sqlite3"
+
+# Total size of the stored replies before the least recently used are evicted
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Seconds a reply stays valid after it was received
+CACHE_TTL = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    chunks TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses (used_at);
+"""
+
+
+def cache_key(provider: str, model: str, messages: list, **params) -> str:
+    """Hash what determines a reply: provider, model, history and request options.
+
+    Only each message's role and content count, with surrounding whitespace
+    stripped, so timestamps and cached token counts do not split entries.
+    """
+    request = {
+        "provider": provider,
+        "model": model,
+        "messages": [[m.role, m.content.strip()] for m in messages],
+        "params": params,
+    }
+    encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Replies stored on disk as the chunks they streamed in.
+
+    Entries expire ``ttl`` seconds after they were stored; once the stored
+    chunks exceed ``max_bytes``, the least recently used entries go first.
+    Safe to use from any thread.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.directory / CACHE_FILE), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT chunks, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self.conn:
+                if now - row[1] > self.ttl:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                self.conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        encoded = json.dumps(chunks, ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, chunks, size, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, size, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY used_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+    @property
+    def size(self) -> int:
+        """Bytes of stored chunks"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+class CachingClient(AIClientAdapter):
+    """Serves repeated requests to ``client`` from a ResponseCache.
+
+    A hit is replayed chunk by chunk through the same iterator a live reply
+    comes through. Only replies that complete are stored: ones that were
+    cancelled, abandoned by the caller or came back as an error are not.
+    """
+
+    def __init__(self, client: AIClientAdapter, provider: str, cache: ResponseCache):
+        super().__init__(client.api_key, client.model)
+        self.client = client
+        self.provider = provider
+        self.cache = cache
+
+    def key(self, messages: list) -> str:
+        return cache_key(self.provider, self.model, messages,
+                         base_url=getattr(self.client, "base_url", None))
+
+    @staticmethod
+    def _complete(chunks: List[str], cancel: Optional[CancelToken]) -> bool:
+        # A reply can fail after streaming some text, so every chunk is checked
+        return bool(chunks) and not any(is_error(c) for c in chunks) and not is_cancelled(cancel)
+
+    def send_message(self, messages: list, stream: bool = True,
+                     cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        key = self.key(messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield from cached
+            return
+
+        received = []
+        with closing(self.client.send_message(messages, stream, cancel=cancel)) as chunks:
+            for chunk in chunks:
+                received.append(chunk)
+                yield chunk
+        if self._complete(received, cancel):
+            self.cache.put(key, received)
+
+    async def asend_message(self, messages: list, stream: bool = True,
+                            cancel: Optional[CancelToken] = None) -> AsyncIterator[str]:
+        key = self.key(messages)
+        # The lookup and the write touch the disk, so they stay off the event loop
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            for chunk in cached:
+                yield chunk
+            return
+
+        received = []
+        async with aclosing(self.client.asend_message(messages, stream, cancel=cancel)) as chunks:
+            async for chunk in chunks:
+                received.append(chunk)
+                yield chunk
+        if self._complete(received, cancel):
+            await asyncio.to_thread(self.cache.put, key, received)
+
+    def validate_api_key(self) -> bool:
+        return self.client.validate_api_key()
+
+
+# Resolved cache directory -> ResponseCache
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(directory: Path) -> ResponseCache:
+    """Return the shared cache stored in ``directory``, opening it on first use."""
+    key = Path(directory).resolve()
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(key)
+        return _caches[key]
+
+
+def close_response_caches() -> None:
+    with _caches_lock:
+        caches = list(_caches.values())
+        _caches.clear()
+    for cache in caches:
+        cache.close()
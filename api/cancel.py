@@ -0,0 +1,95 @@
+# api/cancel.py
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CancelToken:
+    """Stops a running ``send_message``/``asend_message`` from any thread.
+
+    Adapters register callbacks that abort their transport (closing the
+    HTTP response or SDK stream) for as long as a request is running;
+    ``cancel`` runs them at once, so a stalled read is interrupted too.
+    The adapter then ends its iterator quietly instead of yielding an error.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Cancel callback failed")
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` on cancel, or right away if already cancelled."""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+def is_cancelled(cancel: Optional[CancelToken]) -> bool:
+    return cancel is not None and cancel.cancelled
+
+
+@contextmanager
+def closing_on_cancel(cancel: Optional[CancelToken], close: Callable[[], None]):
+    """Call ``close`` if ``cancel`` fires while the block runs."""
+    if cancel is None:
+        yield
+        return
+    cancel.on_cancel(close)
+    try:
+        yield
+    finally:
+        cancel.remove(close)
+
+
+@contextmanager
+def cancelling_task(cancel: Optional[CancelToken]):
+    """Cancel the current asyncio task if ``cancel`` fires while the block runs.
+
+    Cancelling the task interrupts whatever it awaits, a connect or a read,
+    and unwinds ``async with`` blocks so responses are closed on the way out.
+    """
+    task = asyncio.current_task()
+    loop = task.get_loop()
+    active = [True]
+
+    def cancel_task():
+        # The block may have finished between the token firing and this running
+        if active[0]:
+            task.cancel()
+
+    try:
+        with closing_on_cancel(cancel, lambda: loop.call_soon_threadsafe(cancel_task)):
+            yield
+    finally:
+        active[0] = False
+
+
+def uncancel_current_task() -> None:
+    """Clear a cancellation the token requested once it has been handled."""
+    task = asyncio.current_task()
+    if task is not None and hasattr(task, "uncancel"):  # Python 3.11+
+        task.uncancel()
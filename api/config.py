@@ -1,15 +1,164 @@
-# api/config.py
-from .openai_client import OpenAIClient
-from .deepseek_client import DeepSeekClient
+import importlib
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Iterable, Optional, Type
+
 from .base import AIClientAdapter
+from .cache import CachingClient, ResponseCache
 
-CLIENTS = {
-    "openai": OpenAIClient,
-    "deepseek": DeepSeekClient,
+# provider -> "module:class" of its adapter
+CLIENT_CLASSES = {
+    "openai": "api.openai_client:OpenAIClient",
+    "deepseek": "api.deepseek_client:DeepSeekClient",
+    "local": "api.local_client:LocalClient",
 }
 
-def get_client(provider: str, api_key: str, model: str) -> AIClientAdapter:
+# Providers whose adapter sets requires_api_key = False, known without importing it
+KEYLESS_PROVIDERS = frozenset({"local"})
+
+
+class ClientRegistry(Mapping):
+    """Provider name -> adapter class, each imported on its first lookup.
+
+    Adapter modules pull in their SDKs (the openai package alone takes
+    longer to import than the rest of the app's startup), so a provider
+    nobody selects is never loaded. What the UI needs before a request,
+    such as ``requires_api_key``, is answered without the import.
+    """
+
+    def __init__(self, paths: Dict[str, str], keyless: Iterable[str] = ()):
+        self._paths = dict(paths)
+        self._keyless = frozenset(keyless)
+        self._classes: Dict[str, Type[AIClientAdapter]] = {}
+
+    def __getitem__(self, provider: str) -> Type[AIClientAdapter]:
+        client_class = self._classes.get(provider)
+        if client_class is None:
+            module, name = self._paths[provider].split(":")
+            # import_module is thread-safe, so a preload may race a lookup
+            client_class = self._classes[provider] = getattr(importlib.import_module(module), name)
+        return client_class
+
+    def __contains__(self, provider) -> bool:
+        return provider in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def loaded(self, provider: str) -> bool:
+        return provider in self._classes
+
+    def requires_api_key(self, provider: str) -> bool:
+        """Whether ``provider`` needs an API key; unknown providers count as needing one."""
+        return provider not in self._keyless
+
+
+CLIENTS = ClientRegistry(CLIENT_CLASSES, KEYLESS_PROVIDERS)
+
+
+def preload_clients(*providers: str) -> threading.Thread:
+    """Import the adapters of ``providers`` on a background thread.
+
+    Unknown or empty provider names are skipped.
+    """
+    def load():
+        for provider in providers:
+            if provider in CLIENTS:
+                CLIENTS[provider]
+
+    thread = threading.Thread(target=load, name="preload-clients", daemon=True)
+    thread.start()
+    return thread
+
+# Seconds a client may go unused before it is closed and dropped
+CLIENT_IDLE_TIMEOUT = 600
+
+# (provider, api_key, model, base_url) -> [client, last used (time.monotonic())]
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider: str, api_key: str, model: str, base_url: Optional[str] = None,
+               cache: Optional[ResponseCache] = None) -> AIClientAdapter:
+    """Return the warm client for these settings, creating it on first use.
+
+    Clients are shared across requests so their HTTP connection pools stay
+    alive; ones idle for longer than ``CLIENT_IDLE_TIMEOUT`` are closed.
+    An empty ``model`` means the provider's default. With a ``cache``,
+    repeated requests are answered from it.
+    """
     client_class = CLIENTS.get(provider)
     if not client_class:
         raise ValueError(f"Unknown provider: {provider}")
-    return client_class(api_key=api_key, model=model)
+
+    key = (provider, api_key, model, base_url)
+    now = time.monotonic()
+    with _clients_lock:
+        stale = _pop_idle(now)
+        entry = _clients.get(key)
+        if entry is None:
+            options = {"api_key": api_key}
+            if model:
+                options["model"] = model
+            if base_url:
+                options["base_url"] = base_url
+            entry = _clients[key] = [client_class(**options), now]
+        entry[1] = now
+        client = entry[0]
+    _close(stale)
+    if cache is not None:
+        return CachingClient(client, provider, cache)
+    return client
+
+
+def _pop_idle(now: float, timeout: float = None) -> list:
+    timeout = CLIENT_IDLE_TIMEOUT if timeout is None else timeout
+    idle = [key for key, (_, last_used) in _clients.items() if now - last_used > timeout]
+    return [_clients.pop(key)[0] for key in idle]
+
+
+def _close(clients: list) -> None:
+    for client in clients:
+        try:
+            # Replies still streaming on the client keep it open until they end
+            client.retire()
+        except Exception:
+            pass  # a transport that fails to close is dropped anyway
+
+
+def evict_idle(timeout: float = None) -> int:
+    """Close clients unused for ``timeout`` seconds; return how many."""
+    with _clients_lock:
+        stale = _pop_idle(time.monotonic(), timeout)
+    _close(stale)
+    return len(stale)
+
+
+def evict_clients(provider: Optional[str] = None) -> None:
+    """Close cached clients, once their requests in flight have finished.
+
+    Only clients of ``provider`` are closed when one is given.
+    """
+    with _clients_lock:
+        keys = [key for key in _clients if provider is None or key[0] == provider]
+        evicted = [_clients.pop(key)[0] for key in keys]
+    _close(evicted)
+
+
+def evict_client(provider: str, api_key: str, model: str, base_url: Optional[str] = None) -> bool:
+    """Close the cached client for these settings; returns False if there was none."""
+    with _clients_lock:
+        entry = _clients.pop((provider, api_key, model, base_url), None)
+    if entry is None:
+        return False
+    _close([entry[0]])
+    return True
+
+
+def cached_clients() -> int:
+    with _clients_lock:
+        return len(_clients)
@@ -0,0 +1,195 @@
+# api/context.py
+import re
+from typing import Callable, List, Optional
+
+from data.models import Message, MessagePage
+
+# Context window sizes in tokens; a model matches the longest name it starts with
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "deepseek-chat": 64000,
+    "deepseek-coder": 64000,
+    "deepseek-reasoner": 64000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Tokens kept free for the reply
+REPLY_RESERVE = 1024
+
+# Per-message framing (role, separators) the API adds around the content
+MESSAGE_OVERHEAD = 4
+
+# Share of the budget a summary of dropped turns may take
+SUMMARY_SHARE = 0.25
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+SNIPPET_LENGTH = 160
+
+# CJK characters are roughly a token each; other words about four characters per token
+CJK = "぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+TOKEN_PIECES = re.compile(rf"[{CJK}]|[^\W{CJK}]+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the tokens ``text`` costs, without a model-specific tokenizer.
+
+    Errs on the high side for English so budgets are not overrun.
+    """
+    tokens = 0
+    for piece in TOKEN_PIECES.findall(text):
+        tokens += (len(piece) + 3) // 4 if len(piece) > 1 else 1
+    return tokens
+
+
+def message_tokens(message: Message) -> int:
+    """Tokens ``message`` takes in a request, counting its content only once.
+
+    The count is stored on the message, and saved with it from then on.
+    """
+    if message.token_count is None:
+        message.token_count = count_tokens(message.content)
+    return message.token_count + MESSAGE_OVERHEAD
+
+
+def context_window(model: str) -> int:
+    matches = [name for name in MODEL_CONTEXT_WINDOWS if model.startswith(name)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def extractive_summary(messages: List[Message], previous: Optional[str] = None) -> str:
+    """Summarize turns by the start of each one, extending ``previous``.
+
+    Costs no request; pass a model-backed function to ``ContextWindow`` for
+    a real summary.
+    """
+    lines = [previous] if previous else []
+    for message in messages:
+        snippet = " ".join(message.content.split())
+        if len(snippet) > SNIPPET_LENGTH:
+            snippet = snippet[:SNIPPET_LENGTH - 1] + "…"
+        lines.append(f"{message.role}: {snippet}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """Fits a conversation's history into a model's token budget.
+
+    System messages are always sent. The rest are taken newest first while
+    they fit in ``budget`` tokens (the model's window less ``reserve`` for
+    the reply). With a ``summarize`` function, turns that no longer fit are
+    replaced by one system message summarizing them; the summary is rolled
+    forward as more turns fall out, so each turn is summarized once. Use one
+    instance per conversation, and either ``build`` or ``build_paged`` with it.
+    """
+
+    def __init__(self, model: str, budget: Optional[int] = None, reserve: int = REPLY_RESERVE,
+                 summarize: Optional[Callable[[List[Message], Optional[str]], str]] = None):
+        self.model = model
+        self.budget = budget if budget is not None else context_window(model) - reserve
+        self.summarize = summarize
+        self._summary = None
+        self._summarized = []  # the turns self._summary covers
+        self._covered = 0  # build_paged: the positions before this are in self._summary
+
+    def build(self, messages: List[Message]) -> List[Message]:
+        system = [m for m in messages if m.role == "system"]
+        turns = [m for m in messages if m.role != "system"]
+        available = self.budget - sum(message_tokens(m) for m in system)
+        if sum(message_tokens(m) for m in turns) <= available:
+            return list(messages)
+
+        summary_budget = int(self.budget * SUMMARY_SHARE) if self.summarize else 0
+        kept = self._newest(turns, available - summary_budget)
+
+        dropped = turns[:len(turns) - len(kept)]
+        if not dropped or not self.summarize:
+            return system + kept
+        return system + [self._summary_message(dropped, summary_budget)] + kept
+
+    def build_paged(self, read_page: Callable[[Optional[int]], MessagePage]) -> List[Message]:
+        """Like ``build``, reading only as much of the conversation as it needs.
+
+        ``read_page(before)`` returns the page of messages before a position,
+        as ``get_messages`` does. Pages are read newest first until the budget
+        is full; of the turns that fall out of it, only those not in the
+        summary yet are read back and folded in. The conversation must only
+        grow between calls, and system messages are only looked for in the
+        pages read for the budget.
+        """
+        tail, cursor = [], None
+        while True:
+            page = read_page(cursor)
+            tail[:0] = page.messages
+            cursor = page.cursor
+            if cursor is None or sum(message_tokens(m) for m in tail) > self.budget:
+                break
+        start = cursor or 0  # position of tail[0]
+
+        system = [m for m in tail if m.role == "system"]
+        turns = [m for m in tail if m.role != "system"]
+        available = self.budget - sum(message_tokens(m) for m in system)
+        if start == 0 and sum(message_tokens(m) for m in turns) <= available:
+            return tail
+
+        summary_budget = int(self.budget * SUMMARY_SHARE) if self.summarize else 0
+        kept = self._newest(turns, available - summary_budget)
+        if not kept:
+            return system
+        first_kept = next(i for i, m in enumerate(tail) if m is kept[0])
+        end = start + first_kept  # positions before this are dropped
+        if not self.summarize:
+            return system + kept
+
+        if self._covered < end:
+            # Read back whatever fell out before the pages already in hand
+            older, before = [], start
+            while before and before > self._covered:
+                page = read_page(before)
+                older[:0] = page.messages
+                before = page.cursor
+            older = older[self._covered - (before or 0):] if older else []
+            dropped = older + tail[max(self._covered - start, 0):first_kept]
+            self._summary = self.summarize([m for m in dropped if m.role != "system"], self._summary)
+            self._covered = end
+        if self._summary is None:
+            return system + kept
+        return system + [self._render_summary(summary_budget)] + kept
+
+    @staticmethod
+    def _newest(turns: List[Message], available: int) -> List[Message]:
+        kept = []
+        for message in reversed(turns):
+            cost = message_tokens(message)
+            # The newest turn goes out even if it alone is too big
+            if kept and cost > available:
+                break
+            kept.append(message)
+            available -= cost
+        kept.reverse()
+        return kept
+
+    def _summary_message(self, dropped: List[Message], budget: int) -> Message:
+        covered = len(self._summarized)
+        # Compared by value, so a history re-read from storage still rolls forward
+        if covered <= len(dropped) and all(a == b for a, b in zip(self._summarized, dropped)):
+            if covered < len(dropped):
+                self._summary = self.summarize(dropped[covered:], self._summary)
+        else:
+            # A different or rewritten history: start over
+            self._summary = self.summarize(dropped, None)
+        self._summarized = list(dropped)
+        return self._render_summary(budget)
+
+    def _render_summary(self, budget: int) -> Message:
+        content = f"{SUMMARY_HEADER}\n{self._summary}"
+        # Oldest summary lines go first when it outgrows its share
+        lines = content.split("\n")
+        while len(lines) > 2 and count_tokens("\n".join(lines)) + MESSAGE_OVERHEAD > budget:
+            del lines[1]
+        self._summary = "\n".join(lines[1:])
+        return Message(role="system", content="\n".join(lines))
@@ -1,66 +1,129 @@
 # api/deepseek_client.py
+import asyncio
+import httpx
 import requests
 from .base import AIClientAdapter
-from typing import Iterator
-import json
+from .cancel import CancelToken, cancelling_task, closing_on_cancel, is_cancelled, uncancel_current_task
+from .errors import ErrorChunk
+from .metrics import mark_connected
+from .session import get_session, get_async_session, iter_reads, abort_response
+from .sse import iter_deltas, aiter_deltas
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
 
 class DeepSeekClient(AIClientAdapter):
-    def __init__(self, api_key: str, model: str = "deepseek-chat"):
+    def __init__(self, api_key: str, model: str = "deepseek-chat",
+                 base_url: str = "https://api.deepseek.com/v1",
+                 session: Optional[requests.Session] = None):
         super().__init__(api_key, model)
-        self.base_url = "https://api.deepseek.com/v1"
+        self.base_url = base_url.rstrip("/")
+        # None means the pooled session shared by all adapters
+        self._session = session
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session or get_session()
 
-    def send_message(self, messages: list, stream: bool = True) -> Iterator[str]:
+    def _request(self, messages: list, stream: bool) -> Tuple[str, dict, dict]:
         formatted = [{"role": m.role, "content": m.content} for m in messages]
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        headers = {"Content-Type": "application/json", **self._auth_headers()}
 
         data = {
             "model": self.model,
             "messages": formatted,
             "stream": stream
         }
+        return f"{self.base_url}/chat/completions", headers, data
 
-        try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                stream=stream
-            )
-            response.raise_for_status()
+    def _auth_headers(self) -> dict:
+        # Local servers run without a key, and an empty bearer token is not a valid header
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    @staticmethod
+    def _error_chunk(error: Exception) -> ErrorChunk:
+        if isinstance(error, (requests.HTTPError, httpx.HTTPStatusError)) and error.response is not None:
+            return ErrorChunk(error, status=error.response.status_code)
+        connection_error = isinstance(error, (requests.ConnectionError, requests.Timeout,
+                                              httpx.TransportError))
+        return ErrorChunk(error, connection_error=connection_error)
+
+    @staticmethod
+    def _reply_content(result: dict) -> Optional[str]:
+        if 'choices' in result and result['choices']:
+            return result['choices'][0].get('message', {}).get('content', '')
+        return None
+
+    def send_message(self, messages: list, stream: bool = True,
+                     cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        url, headers, data = self._request(messages, stream)
+
+        with self._tracked():
+            response = None
+            try:
+                response = self.session.post(url, headers=headers, json=data, stream=stream)
+                mark_connected()
+                with closing_on_cancel(cancel, lambda: abort_response(response)):
+                    response.raise_for_status()
+
+                    if stream:
+                        reads = iter_reads(response)
+                        yield from iter_deltas(reads)
+                        # Read past [DONE] to the end so the connection can go back to the pool
+                        for _ in reads:
+                            pass
+                    else:
+                        # Non-streaming: return full response
+                        content = self._reply_content(response.json())
+                        if content is not None:
+                            yield content
+            except requests.RequestException as e:
+                if not is_cancelled(cancel):
+                    yield self._error_chunk(e)
+            except Exception:
+                # Reads on a response closed by cancel fail in assorted ways
+                if not is_cancelled(cancel):
+                    raise
+            finally:
+                # Releases a fully read connection; closes one abandoned mid-stream
+                if response is not None:
+                    response.close()
+
+    async def asend_message(self, messages: list, stream: bool = True,
+                            cancel: Optional[CancelToken] = None) -> AsyncIterator[str]:
+        url, headers, data = self._request(messages, stream)
+        session = get_async_session()
 
-            if stream:
-                for line in response.iter_lines():
-                    if line:
-                        line = line.decode('utf-8')
-                        if line.startswith('data: '):
-                            json_str = line[6:]
-                            if json_str == '[DONE]':
-                                break
-                            try:
-                                chunk = json.loads(json_str)
-                                if 'choices' in chunk and chunk['choices']:
-                                    delta = chunk['choices'][0].get('delta', {})
-                                    if 'content' in delta:
-                                        yield delta['content']
-                            except json.JSONDecodeError:
-                                continue
-            else:
-                # Non-streaming: return full response
-                result = response.json()
-                if 'choices' in result and result['choices']:
-                    content = result['choices'][0].get('message', {}).get('content', '')
-                    yield content
-        except requests.RequestException as e:
-            yield f"Error: {str(e)}"
+        with self._tracked():
+            try:
+                with cancelling_task(cancel):
+                    if stream:
+                        async with session.stream("POST", url, headers=headers, json=data) as response:
+                            mark_connected()
+                            response.raise_for_status()
+                            reads = response.aiter_bytes()
+                            async for content in aiter_deltas(reads):
+                                yield content
+                            async for _ in reads:
+                                pass
+                    else:
+                        response = await session.post(url, headers=headers, json=data)
+                        mark_connected()
+                        response.raise_for_status()
+                        content = self._reply_content(response.json())
+                        if content is not None:
+                            yield content
+            except httpx.HTTPError as e:
+                yield self._error_chunk(e)
+            except asyncio.CancelledError:
+                if not is_cancelled(cancel):
+                    raise
+                uncancel_current_task()
 
     def validate_api_key(self) -> bool:
         try:
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            response = requests.get(f"{self.base_url}/models", headers=headers, timeout=5)
+            response = self.session.get(f"{self.base_url}/models", headers=self._auth_headers(), timeout=5)
+            response.close()
             return response.status_code == 200
         except requests.RequestException:
             return False
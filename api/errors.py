@@ -0,0 +1,29 @@
+# api/errors.py
+from typing import Optional
+
+
+class ErrorChunk(str):
+    """The ``"Error: ..."`` chunk an adapter yields when its request fails.
+
+    It is still just the error text to callers that display the reply;
+    ``retryable`` tells the router whether sending the request again may
+    help: the connection failed, or the server answered with a 5xx.
+    """
+
+    status: Optional[int]
+    connection_error: bool
+
+    def __new__(cls, error, status: Optional[int] = None, connection_error: bool = False):
+        chunk = super().__new__(cls, f"Error: {error}")
+        chunk.status = status
+        chunk.connection_error = connection_error
+        return chunk
+
+    @property
+    def retryable(self) -> bool:
+        return self.connection_error or (self.status is not None and self.status >= 500)
+
+
+def is_error(chunk: str) -> bool:
+    """True for an adapter's error chunk; a reply that merely starts with "Error: " is not one."""
+    return isinstance(chunk, ErrorChunk)
@@ -0,0 +1,22 @@
+# api/local_client.py
+import requests
+from typing import Optional
+from .deepseek_client import DeepSeekClient
+
+
+class LocalClient(DeepSeekClient):
+    """Client for an OpenAI-compatible server on this machine.
+
+    Without a ``base_url`` it talks to the bundled stand-in server, started
+    on first use, so streaming works offline. No API key is needed.
+    """
+
+    requires_api_key = False
+
+    def __init__(self, api_key: str = "", model: str = "local-echo", base_url: Optional[str] = None,
+                 session: Optional[requests.Session] = None):
+        if base_url is None:
+            # Imported here so `python -m api.local_server` runs the module only once
+            from .local_server import get_local_server
+            base_url = get_local_server().base_url
+        super().__init__(api_key, model, base_url, session)
@@ -0,0 +1,252 @@
+# api/local_server.py
+"""A stand-in for an OpenAI-compatible chat API, served from this process.
+
+``LocalServer`` answers ``POST /v1/chat/completions`` (streamed as SSE over
+chunked transfer encoding, or as one JSON document) and ``GET /v1/models``
+with a generated reply. How fast and how reliably it answers is set by a
+``LocalServerConfig``, so streaming can be measured offline and the same
+run reproduced from its seed::
+
+    python -m api.local_server --port 8765 --rate 40 --jitter 0.01 --stall-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+DEFAULT_PORT = 8765
+LOCAL_MODEL = "local-echo"
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while streaming tokens arrive "
+    "one chunk at a time so every layer between socket and screen gets exercised"
+).split()
+
+
+@dataclass
+class LocalServerConfig:
+    tokens_per_second: float = 50.0  # 0 sends chunks as fast as possible
+    chunk_size: int = 1  # tokens per SSE chunk
+    reply_tokens: int = 120
+    latency: float = 0.0  # seconds before the response starts
+    jitter: float = 0.0  # up to this many seconds added to each chunk's delay
+    error_rate: float = 0.0  # share of requests answered with error_status
+    error_status: int = 500
+    stall_rate: float = 0.0  # chance, per chunk, of pausing for stall_time
+    stall_time: float = 5.0
+    seed: Optional[int] = None  # makes delays, errors and stalls repeatable
+
+
+def reply_tokens(messages: list, length: int) -> List[str]:
+    """The reply: the last user message echoed back, padded with filler words."""
+    prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    words = ["Echo:"] + prompt.split() + ["|"]
+    words += [WORDS[i % len(WORDS)] for i in range(max(0, length - len(words)))]
+    words = words[:length]
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+class LocalRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "LocalServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": LOCAL_MODEL, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+
+        config = self.server.config
+        rng = self.server.request_random()
+        if self.server.pause(config.latency):
+            return
+        if rng.random() < config.error_rate:
+            self._send_json(config.error_status, {
+                "error": {"message": "Simulated failure", "type": "server_error"}
+            })
+            return
+
+        tokens = reply_tokens(request.get("messages", []), config.reply_tokens)
+        model = request.get("model") or LOCAL_MODEL
+        try:
+            if request.get("stream"):
+                self._stream(tokens, model, rng)
+            else:
+                self._send_json(200, {
+                    "id": "chatcmpl-local", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                                 "finish_reason": "stop"}],
+                })
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away, e.g. a cancelled reply
+
+    def _stream(self, tokens: List[str], model: str, rng: random.Random):
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        created = int(time.time())
+
+        def event(delta: dict, finish_reason=None) -> bytes:
+            chunk = {
+                "id": "chatcmpl-local", "object": "chat.completion.chunk", "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+            }
+            return b"data: " + json.dumps(chunk, separators=(",", ":")).encode("utf-8") + b"\n\n"
+
+        self._write_chunk(event({"role": "assistant", "content": ""}))
+        step = max(1, config.chunk_size)
+        delay = step / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        for start in range(0, len(tokens), step):
+            wait = delay + (rng.uniform(0, config.jitter) if config.jitter else 0.0)
+            if rng.random() < config.stall_rate:
+                wait += config.stall_time
+            if self.server.pause(wait):
+                return
+            self._write_chunk(event({"content": "".join(tokens[start:start + step])}))
+        self._write_chunk(event({}, "stop") + b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class LocalServer(ThreadingHTTPServer):
+    """Serves ``LocalRequestHandler`` on a background thread.
+
+    Port 0 picks a free port; ``base_url`` is what an adapter should use.
+    Stopping wakes requests that are waiting out a delay or a stall.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[LocalServerConfig] = None, host: str = "127.0.0.1",
+                 port: int = 0):
+        super().__init__((host, port), LocalRequestHandler)
+        self.config = config or LocalServerConfig()
+        self.requests = 0  # chat completions received
+        self._requests_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def request_random(self) -> random.Random:
+        # Seeded per request, so a run replays the same way under concurrency
+        with self._requests_lock:
+            n = self.requests
+            self.requests += 1
+        if self.config.seed is None:
+            return random.Random()
+        return random.Random(f"{self.config.seed}:{n}")
+
+    def pause(self, seconds: float) -> bool:
+        """Wait ``seconds``; True if the server is stopping."""
+        if seconds > 0:
+            return self._stopping.wait(seconds)
+        return self._stopping.is_set()
+
+    def start(self) -> "LocalServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="local-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_local_server() -> LocalServer:
+    """The shared server behind the ``local`` provider, started on first use."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = LocalServer().start()
+        return _server
+
+
+def stop_local_server() -> None:
+    global _server
+    with _server_lock:
+        server, _server = _server, None
+    if server is not None:
+        server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    options = {
+        "tokens_per_second": "--rate", "chunk_size": "--chunk-size", "reply_tokens": "--tokens",
+        "latency": "--latency", "jitter": "--jitter", "error_rate": "--error-rate",
+        "error_status": "--error-status", "stall_rate": "--stall-rate", "stall_time": "--stall-time",
+        "seed": "--seed",
+    }
+    for field in fields(LocalServerConfig):
+        kind = int if field.name in ("chunk_size", "reply_tokens", "error_status", "seed") else float
+        parser.add_argument(options[field.name], dest=field.name, type=kind, default=field.default)
+    args = vars(parser.parse_args(argv))
+    host, port = args.pop("host"), args.pop("port")
+
+    server = LocalServer(LocalServerConfig(**args), host, port)
+    print(f"Serving OpenAI-compatible chat completions at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
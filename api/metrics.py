@@ -0,0 +1,106 @@
+# api/metrics.py
+import math
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from data.models import ReplyMetrics
+
+# The timer of the reply being streamed in this context; adapters report to it
+current_timer: ContextVar[Optional["StreamTimer"]] = ContextVar("current_timer", default=None)
+
+
+def mark_connected() -> None:
+    """Called by adapters once the response headers have arrived."""
+    timer = current_timer.get()
+    if timer is not None:
+        timer.connected()
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """The ``q``-th percentile (0-100) of ``values`` by nearest rank, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StreamTimer:
+    """Times one streamed reply from the moment send is pressed.
+
+    The UI calls ``chunk`` as each chunk arrives and ``rendered`` right
+    after putting the text received so far on screen, or ``hidden`` when
+    its conversation is not on screen; adapters call
+    ``mark_connected`` while the timer is ``current_timer``. ``finish``
+    turns it all into a ReplyMetrics. Not thread-safe: one reply, one thread.
+    """
+
+    def __init__(self, provider: str = "", model: str = "", clock=time.perf_counter):
+        self.provider = provider
+        self.model = model
+        self.clock = clock
+        self.start = clock()
+        self._connect = None
+        self._first = None
+        self._last = None
+        self._gaps = []
+        self._unrendered = []  # arrival times of chunks not yet on screen
+        self._lags = []
+        self.chunks = 0
+        self.chars = 0
+
+    def connected(self) -> None:
+        if self._connect is None:
+            self._connect = self.clock() - self.start
+
+    def chunk(self, text: str) -> None:
+        now = self.clock()
+        if self._first is None:
+            self._first = now
+        else:
+            self._gaps.append(now - self._last)
+        self._last = now
+        self._unrendered.append(now)
+        self.chunks += 1
+        self.chars += len(text)
+
+    def rendered(self) -> None:
+        now = self.clock()
+        self._lags.extend(now - arrived for arrived in self._unrendered)
+        self._unrendered.clear()
+
+    def hidden(self) -> None:
+        """The text received so far was taken without being shown; it has no UI lag."""
+        self._unrendered.clear()
+
+    def finish(self, tokens: Optional[int] = None) -> ReplyMetrics:
+        """Metrics of the reply so far; ``tokens`` in it gives a token rate."""
+        end = self.clock()
+        streaming = self._last - self._first if self._first is not None else 0
+        return ReplyMetrics(
+            provider=self.provider,
+            model=self.model,
+            connect=self._connect,
+            first_chunk=self._first - self.start if self._first is not None else None,
+            total=end - self.start,
+            chunks=self.chunks,
+            chars=self.chars,
+            tokens_per_sec=tokens / streaming if tokens and streaming > 0 else None,
+            gap_p50=percentile(self._gaps, 50),
+            gap_p95=percentile(self._gaps, 95),
+            gap_max=max(self._gaps, default=None),
+            ui_lag_p50=percentile(self._lags, 50),
+            ui_lag_p95=percentile(self._lags, 95),
+            ui_lag_max=max(self._lags, default=None),
+        )
+
+
+def aggregate(metrics: Iterable[ReplyMetrics], fields: List[str]) -> Dict[str, Tuple[Optional[float], Optional[float], int]]:
+    """(p50, p95, replies measured) across replies for each named ReplyMetrics field."""
+    metrics = list(metrics)
+    result = {}
+    for name in fields:
+        values = [getattr(m, name) for m in metrics if getattr(m, name) is not None]
+        result[name] = (percentile(values, 50), percentile(values, 95), len(values))
+    return result
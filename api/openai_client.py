@@ -1,32 +1,88 @@
 # api/openai_client.py
-from openai import OpenAI, OpenAIError
+import asyncio
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI, OpenAIError
 from .base import AIClientAdapter
-from typing import Iterator
+from .cancel import CancelToken, cancelling_task, closing_on_cancel, is_cancelled, uncancel_current_task
+from .errors import ErrorChunk
+from .metrics import mark_connected
+from typing import AsyncIterator, Iterator, Optional
 
 class OpenAIClient(AIClientAdapter):
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", base_url: Optional[str] = None):
         super().__init__(api_key, model)
-        self.client = OpenAI(api_key=api_key)
+        self.base_url = base_url
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self._async_client = None
+        self._async_loop = None
 
-    def send_message(self, messages: list, stream: bool = True) -> Iterator[str]:
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """SDK client for the running event loop, created on first async use"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+            self._async_loop = loop
+        return self._async_client
+
+    @staticmethod
+    def _error_chunk(error: Exception) -> ErrorChunk:
+        if isinstance(error, APIStatusError):
+            return ErrorChunk(error, status=error.status_code)
+        return ErrorChunk(error, connection_error=isinstance(error, APIConnectionError))
+
+    def send_message(self, messages: list, stream: bool = True,
+                     cancel: Optional[CancelToken] = None) -> Iterator[str]:
         formatted = [{"role": m.role, "content": m.content} for m in messages]
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=formatted,
-                stream=stream
-            )
-            if stream:
-                for chunk in response:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
-            else:
-                # Non-streaming: return full response
-                content = response.choices[0].message.content
-                yield content
-        except Exception as e:
-            yield f"Error: {str(e)}"
+        with self._tracked():
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=formatted,
+                    stream=stream
+                )
+                mark_connected()
+                if stream:
+                    with closing_on_cancel(cancel, response.close):
+                        for chunk in response:
+                            if chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                else:
+                    # Non-streaming: return full response
+                    content = response.choices[0].message.content
+                    yield content
+            except Exception as e:
+                if not is_cancelled(cancel):
+                    yield self._error_chunk(e)
+
+    async def asend_message(self, messages: list, stream: bool = True,
+                            cancel: Optional[CancelToken] = None) -> AsyncIterator[str]:
+        formatted = [{"role": m.role, "content": m.content} for m in messages]
+
+        with self._tracked():
+            try:
+                with cancelling_task(cancel):
+                    response = await self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=formatted,
+                        stream=stream
+                    )
+                    mark_connected()
+                    if stream:
+                        try:
+                            async for chunk in response:
+                                if chunk.choices[0].delta.content:
+                                    yield chunk.choices[0].delta.content
+                        finally:
+                            await response.close()
+                    else:
+                        yield response.choices[0].message.content
+            except asyncio.CancelledError:
+                if not is_cancelled(cancel):
+                    raise
+                uncancel_current_task()
+            except Exception as e:
+                yield self._error_chunk(e)
 
     def validate_api_key(self) -> bool:
         try:
@@ -34,3 +90,11 @@ class OpenAIClient(AIClientAdapter):
             return True
         except OpenAIError:
             return False
+
+    def close(self) -> None:
+        self.client.close()
+        if self._async_client is not None:
+            # The async client can only be closed on its own loop
+            if self._async_loop.is_running():
+                asyncio.run_coroutine_threadsafe(self._async_client.close(), self._async_loop)
+            self._async_client = None
@@ -0,0 +1,225 @@
+# api/router.py
+import asyncio
+import threading
+from contextlib import aclosing, closing
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, List, Optional
+
+from .base import AIClientAdapter
+from .cache import ResponseCache
+from .cancel import CancelToken, cancelling_task, closing_on_cancel, is_cancelled, uncancel_current_task
+from .config import get_client
+from .errors import ErrorChunk, is_error
+
+# Seconds without a first chunk before a backup request is sent
+HEDGE_AFTER = 3.0
+
+# Times a request is repeated on the same route after a connection error or 5xx
+MAX_RETRIES = 2
+
+# Seconds before the first retry, doubled for each one after
+RETRY_BACKOFF = 0.5
+
+_END = object()
+
+# Attempts winding down after losing a race; the loop only keeps weak references
+_background = set()
+
+
+@dataclass
+class Route:
+    provider: str
+    api_key: str
+    model: str
+    base_url: Optional[str] = None
+
+
+class _Attempt:
+    """One request on one route, run as its own task so it can be raced and stopped.
+
+    ``first`` resolves with the first chunk, or ``_END`` if the reply ended
+    without one; every chunk, then ``_END``, also goes to ``queue``.
+    """
+
+    def __init__(self, route: int, client: AIClientAdapter, messages: list, stream: bool,
+                 delay: float = 0.0):
+        loop = asyncio.get_running_loop()
+        self.route = route
+        self.cancel = CancelToken()
+        self.queue = asyncio.Queue()
+        self.first = loop.create_future()
+        self.task = loop.create_task(self._run(client, messages, stream, delay))
+        _background.add(self.task)
+        self.task.add_done_callback(_background.discard)
+
+    def _put(self, item) -> None:
+        if not self.first.done():
+            self.first.set_result(item)
+        self.queue.put_nowait(item)
+
+    async def _run(self, client: AIClientAdapter, messages: list, stream: bool, delay: float):
+        try:
+            if delay:
+                with cancelling_task(self.cancel):
+                    await asyncio.sleep(delay)
+            async with aclosing(client.asend_message(messages, stream, cancel=self.cancel)) as chunks:
+                async for chunk in chunks:
+                    self._put(chunk)
+        except asyncio.CancelledError:
+            if not self.cancel.cancelled:
+                raise
+            uncancel_current_task()
+        except Exception as e:
+            self._put(ErrorChunk(e))
+        finally:
+            self._put(_END)
+
+
+class RoutedClient(AIClientAdapter):
+    """Sends each request along a list of clients, the first one preferred.
+
+    A request that fails before its first chunk with a connection error or
+    a 5xx is retried on the same client after an exponential backoff, up to
+    ``max_retries`` times; once those run out, or on any other error, the
+    next client takes over. With ``asend_message``, if no first chunk has
+    arrived ``hedge_after`` seconds into the request, the next client is
+    also asked at once: the reply that starts streaming first is used and
+    the other request is cancelled. Errors after the first chunk are passed
+    on as they are, since the text already shown cannot be taken back.
+    """
+
+    def __init__(self, clients: List[AIClientAdapter], hedge_after: Optional[float] = HEDGE_AFTER,
+                 max_retries: int = MAX_RETRIES, backoff: float = RETRY_BACKOFF):
+        if not clients:
+            raise ValueError("RoutedClient needs at least one client")
+        super().__init__(clients[0].api_key, clients[0].model)
+        self.clients = clients
+        self.hedge_after = hedge_after
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def retry_delay(self, tries: int) -> float:
+        """Seconds to wait before repeating a request that has failed ``tries`` times."""
+        return self.backoff * 2 ** (tries - 1)
+
+    @staticmethod
+    def _retryable(chunk: str) -> bool:
+        return isinstance(chunk, ErrorChunk) and chunk.retryable
+
+    def send_message(self, messages: list, stream: bool = True,
+                     cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        """Retries and failover as in ``asend_message``, without hedging."""
+        error = None
+        for client in self.clients:
+            for tries in range(self.max_retries + 1):
+                if tries:
+                    wake = threading.Event()
+                    with closing_on_cancel(cancel, wake.set):
+                        wake.wait(self.retry_delay(tries))
+                if is_cancelled(cancel):
+                    return
+                with closing(client.send_message(messages, stream, cancel=cancel)) as chunks:
+                    first = next(chunks, None)
+                    if first is None:
+                        return
+                    if not is_error(first):
+                        yield first
+                        yield from chunks
+                        return
+                error = first
+                if not self._retryable(first):
+                    break
+        if error is not None and not is_cancelled(cancel):
+            yield error
+
+    async def asend_message(self, messages: list, stream: bool = True,
+                            cancel: Optional[CancelToken] = None) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        attempts = []
+        tries = [0] * len(self.clients)
+        next_route = 1
+        hedge_at = None if self.hedge_after is None else loop.time() + self.hedge_after
+
+        def launch(route: int, delay: float = 0.0) -> None:
+            tries[route] += 1
+            attempts.append(_Attempt(route, self.clients[route], messages, stream, delay))
+
+        def stop_all() -> None:
+            for attempt in attempts:
+                attempt.cancel.cancel()
+
+        if is_cancelled(cancel):
+            # Stopped before anything was sent, e.g. during a cache lookup
+            return
+        if cancel is not None:
+            cancel.on_cancel(stop_all)
+        try:
+            launch(0)
+            winner = error = None
+            while winner is None and attempts:
+                timeout = None
+                if hedge_at is not None and next_route < len(self.clients):
+                    timeout = max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait([a.first for a in attempts], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Too slow to start: race the next route against it
+                    hedge_at = None
+                    launch(next_route)
+                    next_route += 1
+                    continue
+
+                for attempt in [a for a in attempts if a.first.done()]:
+                    first = attempt.first.result()
+                    if first is _END or not is_error(first):
+                        winner = attempt
+                        break
+                    attempts.remove(attempt)
+                    error = first
+                    if is_cancelled(cancel):
+                        continue
+                    if self._retryable(first) and tries[attempt.route] <= self.max_retries:
+                        launch(attempt.route, self.retry_delay(tries[attempt.route]))
+                    elif next_route < len(self.clients):
+                        launch(next_route)
+                        next_route += 1
+
+            if winner is None:
+                if error is not None and not is_cancelled(cancel):
+                    yield error
+                return
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel.cancel()
+            while True:
+                chunk = await winner.queue.get()
+                if chunk is _END:
+                    break
+                yield chunk
+        finally:
+            if cancel is not None:
+                cancel.remove(stop_all)
+            stop_all()
+
+    def validate_api_key(self) -> bool:
+        return self.clients[0].validate_api_key()
+
+
+def settings_routes(settings) -> List[Route]:
+    """The routes a ``Settings`` asks for: its provider, then the backup if one is set."""
+    routes = [Route(settings.api_provider, settings.api_key, settings.model)]
+    if settings.backup_provider:
+        routes.append(Route(settings.backup_provider, settings.backup_api_key, settings.backup_model))
+    return routes
+
+
+def get_routed_client(routes: List[Route], cache: Optional[ResponseCache] = None,
+                      **options) -> RoutedClient:
+    """A RoutedClient over the shared clients for ``routes``, in order of preference.
+
+    With a ``cache``, each route caches behind the router, so a reply is
+    stored under the route that answered it. ``options`` are passed on to
+    RoutedClient.
+    """
+    clients = [get_client(r.provider, r.api_key, r.model, r.base_url, cache=cache) for r in routes]
+    return RoutedClient(clients, **options)
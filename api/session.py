@@ -0,0 +1,203 @@
+import asyncio
+import socket
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connection pools kept (one per host) and connections kept per pool
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 8
+
+# Seconds to establish a connection, and to wait between bytes of a response
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with default timeouts and connection-reuse counters.
+
+    ``requests`` counts requests sent through the adapter and ``connections``
+    counts sockets opened for them; every other request went out over a
+    kept-alive connection.
+    """
+
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        self._stats_lock = threading.Lock()
+        self._closed_requests = 0
+        self._closed_connections = 0
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+    def _pools(self) -> list:
+        pools = self.poolmanager.pools
+        result = []
+        for key in pools.keys():
+            try:
+                result.append(pools[key])
+            except KeyError:
+                pass  # evicted meanwhile
+        return result
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            sent = self._closed_requests
+            opened = self._closed_connections
+        for pool in self._pools():
+            sent += pool.num_requests
+            opened += pool.num_connections
+        return {
+            "requests": sent,
+            "connections": opened,
+            "reused": max(0, sent - opened),
+        }
+
+    def close(self) -> None:
+        # Keep the counts of pools being discarded so stats stay cumulative
+        closing = self._pools()
+        with self._stats_lock:
+            self._closed_requests += sum(p.num_requests for p in closing)
+            self._closed_connections += sum(p.num_connections for p in closing)
+        super().close()
+
+
+class PooledSession(requests.Session):
+    """``requests.Session`` whose HTTP(S) traffic goes through one PooledAdapter.
+
+    Reusing a session keeps TCP and TLS connections alive between
+    requests to the same host, so only the first message to a provider
+    pays for the handshake.
+    """
+
+    def __init__(self, **adapter_options):
+        super().__init__()
+        self.adapter = PooledAdapter(**adapter_options)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+
+    def stats(self) -> dict:
+        return self.adapter.stats()
+
+
+def iter_reads(response: requests.Response, size: int = 8192):
+    """Yield a streamed response's body as each read returns, decoded.
+
+    ``iter_content`` waits to fill its chunk size, or for the whole body
+    when it has a Content-Length, which holds back events of a stream.
+    """
+    read1 = getattr(response.raw, "read1", None)  # urllib3 2.3+
+    if read1 is None:
+        yield from response.iter_content(chunk_size=None)
+        return
+    while True:
+        # requests streams with decoding off; a gzip body would reach the parser compressed
+        data = read1(size, decode_content=True)
+        if not data:
+            return
+        yield data
+
+
+def abort_response(response: requests.Response) -> None:
+    """Stop a streamed response now, even while another thread is reading it.
+
+    Shutting the socket down wakes up a blocked read, which then fails and
+    lets the reader close the response; the broken connection is dropped
+    from the pool rather than reused.
+    """
+    connection = getattr(response.raw, "connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        response.close()
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+def new_async_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                      connect_timeout: float = CONNECT_TIMEOUT,
+                      read_timeout: float = READ_TIMEOUT) -> httpx.AsyncClient:
+    """httpx client for coroutines, with the same keep-alive pool and timeouts."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=None,
+                            max_keepalive_connections=pool_connections * pool_maxsize),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+    )
+
+
+_session: Optional[PooledSession] = None
+_session_options = {}
+_session_lock = threading.Lock()
+
+# httpx connections belong to the loop that opened them, so each loop has its own client
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_session() -> PooledSession:
+    """Return the session shared by all HTTP adapters, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession(**_session_options)
+        return _session
+
+
+def get_async_session() -> httpx.AsyncClient:
+    """Return the async client shared by adapters on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _session_lock:
+        client = _async_sessions.get(loop)
+        if client is None or client.is_closed:
+            client = _async_sessions[loop] = new_async_session(**_session_options)
+        return client
+
+
+def configure_session(**adapter_options) -> None:
+    """Set PooledAdapter options (pool sizes, timeouts) for the shared sessions.
+
+    The current session, if any, is closed; the next ``get_session`` call
+    builds a new one with these options. Async clients are dropped and
+    rebuilt on next use as well.
+    """
+    global _session
+    with _session_lock:
+        _session_options.clear()
+        _session_options.update(adapter_options)
+        _async_sessions.clear()
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def session_stats() -> dict:
+    """Connection-reuse counters of the shared session."""
+    with _session_lock:
+        session = _session
+    if session is None:
+        return {"requests": 0, "connections": 0, "reused": 0}
+    return session.stats()
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+async def aclose_session() -> None:
+    """Close the async client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _session_lock:
+        client = _async_sessions.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,152 @@
+# api/sse.py
+"""Incremental Server-Sent-Events parsing for streamed chat completions.
+
+``SSEParser`` works on raw bytes as they come off the socket, so reads may
+split lines, events or multi-byte characters anywhere. ``delta_content``
+pulls ``choices[0].delta.content`` out of an OpenAI-style chunk, reading
+the string straight from the bytes when the payload has the usual shape
+and decoding the whole JSON document otherwise.
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # optional speed-up
+    orjson = None
+    json_loads = json.loads
+
+DONE = b"[DONE]"
+
+
+@dataclass
+class SSEEvent:
+    data: bytes
+    event: str = "message"
+    id: Optional[str] = None
+    retry: Optional[int] = None
+
+
+class SSEParser:
+    """Turns a byte stream into SSEEvents, following the WHATWG rules.
+
+    Lines may end in LF, CRLF or CR. ``data`` lines of one event are joined
+    with newlines, comments (lines starting with ``:``) are skipped, and an
+    event is dispatched at the blank line ending it. ``last_event_id`` and
+    ``retry`` persist across events like they do in a browser.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._skip_lf = False
+        self._data = []
+        self._event = None
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """Parse the next read; return the events it completed."""
+        if self._skip_lf and chunk[:1] == b"\n":
+            chunk = chunk[1:]
+        self._skip_lf = False
+        if b"\r" in chunk:
+            # A CR at the end of a read may be the first half of a CRLF
+            self._skip_lf = chunk.endswith(b"\r")
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+
+        events = []
+        for line in lines:
+            if line.startswith(b"data: "):
+                self._data.append(line[6:])
+            elif not line:
+                if self._data:
+                    events.append(self._dispatch())
+                else:
+                    self._event = None
+            elif line[0] != 58:  # ':' starts a comment
+                self._field(line)
+        return events
+
+    def _field(self, line: bytes) -> None:
+        name, colon, value = line.partition(b":")
+        if colon and value[:1] == b" ":
+            value = value[1:]
+        if name == b"data":
+            self._data.append(value)
+        elif name == b"event":
+            self._event = value.decode("utf-8", "replace")
+        elif name == b"id":
+            if b"\0" not in value:
+                self.last_event_id = value.decode("utf-8", "replace")
+        elif name == b"retry":
+            if value.isdigit():
+                self.retry = int(value)
+
+    def _dispatch(self) -> SSEEvent:
+        data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+        event = SSEEvent(data, self._event or "message", self.last_event_id, self.retry)
+        self._data = []
+        self._event = None
+        return event
+
+
+# choices[0] with a delta holding nothing but the text (and, first, the role)
+FAST_DELTA = re.compile(
+    rb'"choices":\[\{"index":0,"delta":\{(?:"role":"assistant",)?'
+    rb'"content":(?:"((?:[^"\\]|\\.)*)"|null)\}'
+)
+
+
+def _fast_content(data: bytes):
+    """``choices[0].delta.content`` read directly from the bytes, or ``...`` if unsure."""
+    match = FAST_DELTA.search(data)
+    if match is None:
+        return ...
+    content = match.group(1)
+    if content is None:
+        return None
+    if b"\\" in content:
+        return json_loads(b'"' + content + b'"')
+    return content.decode("utf-8")
+
+
+def delta_content(data: bytes) -> Optional[str]:
+    """Return ``choices[0].delta.content`` of one chunk's data, if it has any."""
+    try:
+        content = _fast_content(data)
+        if content is not ...:
+            return content
+        chunk = json_loads(data)
+        return chunk["choices"][0]["delta"].get("content")
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+
+def iter_deltas(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Yield the content deltas of a chat completion stream until ``[DONE]``."""
+    parser = SSEParser()
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            if event.data == DONE:
+                return
+            content = delta_content(event.data)
+            if content:
+                yield content
+
+
+async def aiter_deltas(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """``iter_deltas`` for an async byte stream."""
+    parser = SSEParser()
+    async for chunk in chunks:
+        for event in parser.feed(chunk):
+            if event.data == DONE:
+                return
+            content = delta_content(event.data)
+            if content:
+                yield content
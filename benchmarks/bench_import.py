@@ -0,0 +1,56 @@
+"""Measure how long the headless packages take to import, in seconds.
+
+Each module is imported in a fresh interpreter, ``repeat`` times, and the
+fastest run is kept. The time is taken inside the child process, so
+interpreter start-up is left out. ``data`` and ``api`` must stay usable
+without a UI: a module that pulls in Kivy fails the run.
+
+    python -m benchmarks.bench_import [--repeat N]
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that headless tools and tests import
+MODULES = ["data", "data.models", "api", "api.batch"]
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(sorted({{m.split(".")[0] for m in sys.modules}} & {{"kivy", "kivymd"}}))
+"""
+
+
+def import_time(module: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", SCRIPT.format(module=module)],
+                                capture_output=True, text=True, cwd=ROOT, check=True)
+        seconds, ui = result.stdout.splitlines()[-2:]
+        if ui != "[]":
+            raise RuntimeError(f"importing {module} loads {ui}")
+        best = min(best, float(seconds))
+    return best
+
+
+def run(repeat: int = 5) -> dict:
+    return {module: import_time(module, repeat) for module in MODULES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<16}{'ms':>10}")
+    for module, seconds in run(args.repeat).items():
+        print(f"{module:<16}{seconds * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare the markdown rendering paths used by MarkdownLabel.
+
+``html`` is the previous path (python-markdown to HTML, then regex
+substitutions to Kivy markup); ``direct`` is ``markdown_to_markup``.
+Each is timed on whole replies, on one reply of about ``--tokens`` tokens,
+and on a streamed reply rendered through ``IncrementalMarkdownRenderer``
+one chunk at a time.
+
+    python -m benchmarks.bench_markdown [--repeat N] [--tokens N]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from markdown import markdown
+
+from api.context import count_tokens
+from ui.incremental_markdown import IncrementalMarkdownRenderer
+from ui.kivy_markdown import markdown_to_markup
+from ui.markdown_label import MarkdownLabel
+
+REPLY = """# Sorting a list
+
+Python has **two** ways to sort: `sorted()` returns a *new* list, while
+`list.sort()` sorts in place. See the [docs](https://docs.python.org/3/howto/sorting.html).
+
+## Examples
+
+- Sort numbers: `sorted([3, 1, 2])`
+- Sort by key, e.g. *case-insensitive*:
+  - `sorted(words, key=str.lower)`
+- Reverse with `reverse=True`
+
+```python
+people = [("ann", 31), ("bob", 25)]
+people.sort(key=lambda p: p[1])
+print(people)
+```
+
+1. Prefer `sorted()` when the original must be kept.
+2. Use `list.sort()` for **large** lists to save memory.
+
+> Sorting is *stable*: equal keys keep their order.
+
+That's all & good luck!
+"""
+
+CHUNK_SIZE = 8  # characters per streamed chunk, roughly one token
+
+
+def html_path(text: str) -> str:
+    return MarkdownLabel._html_to_kivy_markup(markdown(text))
+
+
+PATHS = {
+    "html": html_path,
+    "direct": markdown_to_markup,
+}
+
+
+def bench_full(render, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_stream(render, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        renderer = IncrementalMarkdownRenderer(render)
+        for end in range(CHUNK_SIZE, len(text) + CHUNK_SIZE, CHUNK_SIZE):
+            renderer.render(text[:end])
+    return (time.perf_counter() - start) / repeat
+
+
+def sized_reply(tokens: int) -> str:
+    """REPLY repeated until it is about ``tokens`` tokens long."""
+    return REPLY * max(1, round(tokens / count_tokens(REPLY)))
+
+
+def run(repeat: int = 200, tokens: int = 100000) -> dict:
+    """Return seconds per operation for each path and scenario."""
+    long_reply = REPLY * 10
+    huge_reply = sized_reply(tokens)
+    results = {}
+    for name, render in PATHS.items():
+        results[name] = {
+            "reply": bench_full(render, REPLY, repeat),
+            "long_reply": bench_full(render, long_reply, max(1, repeat // 10)),
+            "huge_reply": bench_full(render, huge_reply, 1),
+            "stream": bench_stream(render, REPLY, max(1, repeat // 10)),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=100000)
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.tokens)
+    scenarios = list(results["html"])
+    print(f"{'scenario':<12}" + "".join(f"{name:>12}" for name in PATHS) + f"{'speedup':>10}")
+    for scenario in scenarios:
+        row = [results[name][scenario] for name in PATHS]
+        speedup = row[0] / row[1] if row[1] else float("inf")
+        print(f"{scenario:<12}" + "".join(f"{t * 1000:>10.3f}ms" for t in row) + f"{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Measure DeepSeek stream parsing throughput in chunks per second.
+
+``lines`` is the previous path: ``requests`` ``iter_lines`` then a UTF-8
+decode, prefix check and ``json.loads`` per line. ``sse`` is
+``api.sse.iter_deltas`` with the stdlib decoder and, when installed, with
+orjson. Streams are recorded-style payloads (the fields DeepSeek sends
+with every chunk, keep-alive comments, a role-only first chunk and a
+finish chunk) cut into network-sized reads.
+
+    python -m benchmarks.bench_sse [--tokens N] [--repeat N]
+"""
+import argparse
+import json
+import random
+import time
+
+import requests
+
+from api import sse
+
+TOKENS = ["Sure", ",", " here", " is", " the", " code", ":\n\n", "```", "python", "\n",
+          "def", " f", "(x", "):", "\n   ", " return", " x", " *", " 2", "\n", "```",
+          " — ", "中文", " \"quoted\"", " done", "."]
+
+
+def recorded_stream(tokens: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    header = {"id": "0f3c9a1e-5d2b-4c8e-9a7f-2e6d1b3c4a5f", "object": "chat.completion.chunk",
+              "created": 1718000000, "model": "deepseek-chat", "system_fingerprint": "fp_a1b2c3d4e5"}
+
+    def event(delta, finish=None):
+        payload = dict(header, choices=[{"index": 0, "delta": delta, "logprobs": None,
+                                         "finish_reason": finish}])
+        return b"data: " + json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode() + b"\n\n"
+
+    parts = [event({"role": "assistant", "content": ""})]
+    for i in range(tokens):
+        parts.append(event({"content": rng.choice(TOKENS)}))
+        if i % 500 == 499:
+            parts.append(b": keep-alive\n\n")
+    parts.append(event({"content": ""}, finish="stop"))
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+
+def network_reads(body: bytes, seed: int = 0) -> list:
+    """Split a body the way socket reads would: uneven sizes, cutting lines anywhere."""
+    rng = random.Random(seed)
+    reads, pos = [], 0
+    while pos < len(body):
+        size = rng.choice([64, 300, 1024, 1448, 4096])
+        reads.append(body[pos:pos + size])
+        pos += size
+    return reads
+
+
+def legacy_deltas(reads: list):
+    response = requests.Response()
+    response.iter_content = lambda chunk_size=None, decode_unicode=False: iter(reads)
+    for line in response.iter_lines():
+        if line:
+            line = line.decode('utf-8')
+            if line.startswith('data: '):
+                json_str = line[6:]
+                if json_str == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(json_str)
+                    if 'choices' in chunk and chunk['choices']:
+                        delta = chunk['choices'][0].get('delta', {})
+                        if 'content' in delta:
+                            yield delta['content']
+                except json.JSONDecodeError:
+                    continue
+
+
+def sse_deltas(loads):
+    def parse(reads: list):
+        saved, sse.json_loads = sse.json_loads, loads
+        try:
+            yield from sse.iter_deltas(reads)
+        finally:
+            sse.json_loads = saved
+    return parse
+
+
+PARSERS = {"lines": legacy_deltas, "sse": sse_deltas(json.loads)}
+if sse.orjson is not None:
+    PARSERS["sse+orjson"] = sse_deltas(sse.orjson.loads)
+
+
+def bench(parse, reads: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _ in parse(reads):
+            pass
+    return (time.perf_counter() - start) / repeat
+
+
+def run(tokens: int = 20000, repeat: int = 5) -> dict:
+    """Return chunks/sec and MB/s per parser for one recorded stream."""
+    body = recorded_stream(tokens)
+    reads = network_reads(body)
+    expected = "".join(legacy_deltas(reads))
+    results = {}
+    for name, parse in PARSERS.items():
+        assert "".join(parse(reads)) == expected, name
+        seconds = bench(parse, reads, repeat)
+        results[name] = {
+            "chunks_per_sec": (tokens + 2) / seconds,
+            "mb_per_sec": len(body) / seconds / 1e6,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.tokens, args.repeat)
+    base = results["lines"]["chunks_per_sec"]
+    print(f"{'parser':<12}{'chunks/s':>12}{'MB/s':>8}{'speedup':>10}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['chunks_per_sec']:>12,.0f}{result['mb_per_sec']:>8.1f}"
+              f"{result['chunks_per_sec'] / base:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
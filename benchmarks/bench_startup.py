@@ -0,0 +1,96 @@
+"""Measure the app's time to first frame, in seconds.
+
+Each run starts the real app in a fresh interpreter, with an empty data
+directory, and times from the first line of the process to the first
+window flip; the app then quits. Module imports, KV compilation, storage
+opening and the first layout all count. Also reported: whether any
+provider SDK was already imported when the frame went up.
+
+Needs a display (or a virtual one such as Xvfb), so it is not part of
+``benchmarks.run``.
+
+    python -m benchmarks.bench_startup [--repeat N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Imported lazily by the app; none should be loaded before the first frame
+HEAVY_MODULES = ["openai", "httpx", "requests"]
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import asyncio, os, sys
+os.environ["KIVY_NO_ARGS"] = "1"
+import main
+from kivy.clock import Clock
+from kivy.core.window import Window
+
+class StartupApp(main.AIChatApp):
+    user_data_dir = {data_dir!r}
+
+    def load_kv(self, filename=None):
+        return False  # the app has no .kv file, and this class has no source file to look beside
+
+    def on_start(self):
+        super().on_start()
+        def flip(*args):
+            if not hasattr(self, "first_frame"):
+                self.first_frame = time.perf_counter() - start
+                self.loaded = sorted(set({heavy!r}) & set(sys.modules))
+                Clock.schedule_once(lambda dt: self.stop(), 0)
+        Window.bind(on_flip=flip)
+
+async def run():
+    app = StartupApp()
+    await app.async_run(async_lib="asyncio")
+    print(app.first_frame)
+    print(",".join(app.loaded))
+
+asyncio.run(run())
+"""
+
+
+def first_frame() -> tuple:
+    """(seconds to the first frame, heavy modules already imported by then)"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        script = SCRIPT.format(data_dir=data_dir, heavy=HEAVY_MODULES)
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=ROOT, check=True)
+    seconds, loaded = result.stdout.splitlines()[-2:]
+    return float(seconds), [name for name in loaded.split(",") if name]
+
+
+def run(repeat: int = 5) -> dict:
+    times, loaded = [], set()
+    for _ in range(repeat):
+        seconds, modules = first_frame()
+        times.append(seconds)
+        loaded.update(modules)
+    return {
+        "first_frame_min": min(times),
+        "first_frame_median": statistics.median(times),
+        "loaded_before_first_frame": sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(f"first frame: {results['first_frame_min'] * 1000:.0f} ms min, "
+          f"{results['first_frame_median'] * 1000:.0f} ms median")
+    loaded = results["loaded_before_first_frame"]
+    print(f"loaded before it: {', '.join(loaded) if loaded else 'no provider SDK'}")
+
+
+if __name__ == "__main__":
+    main()
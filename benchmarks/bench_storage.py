@@ -0,0 +1,113 @@
+"""Time storage operations on a large synthetic history, per backend.
+
+Each backend is loaded with the same corpus of conversations, then timed
+on the calls the UI makes: saving a new conversation, opening one,
+listing the newest, paging messages and appending a reply. Files live in
+a temporary directory that is removed afterwards. Each operation runs
+``ops`` times or for ``TIME_BUDGET`` seconds, whichever ends first.
+
+    python -m benchmarks.bench_storage [--conversations N] [--ops N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from data.config import BACKENDS
+from data.models import Conversation, Message
+from data.storage import StorageManager, conversation_to_dict
+
+WORDS = ("how do I sort a list of tuples by the second item in python without "
+         "changing the original and what about reverse order or stable keys").split()
+
+
+def corpus(conversations: int, messages: int = 6, seed: int = 0) -> list:
+    """Conversations of alternating user/assistant turns with random text."""
+    rng = random.Random(seed)
+    result = []
+    for i in range(conversations):
+        conv = Conversation(id=f"conv-{i:06d}", title=f"Chat {i}",
+                            created_at=f"2024-01-01T00:00:{i % 60:02d}.{i:06d}")
+        for j in range(messages):
+            length = rng.randint(8, 40) if j % 2 == 0 else rng.randint(60, 300)
+            conv.messages.append(Message(
+                role="user" if j % 2 == 0 else "assistant",
+                content=" ".join(rng.choice(WORDS) for _ in range(length)),
+                timestamp=f"2024-02-01T00:{j:02d}:00.{i:06d}",
+            ))
+        result.append(conv)
+    return result
+
+
+def populate(storage, conversations: list) -> None:
+    if type(storage) is StorageManager:
+        # TinyDB rewrites its whole file per save; one bulk insert keeps setup linear
+        storage.db.insert_multiple(conversation_to_dict(c) for c in conversations)
+    else:
+        for conv in conversations:
+            storage.save_conversation(conv)
+
+
+# Seconds after which an operation stops being repeated; TinyDB takes ~0.5s per call at 10k
+TIME_BUDGET = 2.0
+
+
+def timed(fn, ops: int) -> float:
+    start = time.perf_counter()
+    done = 0
+    while done < ops:
+        fn(done)
+        done += 1
+        if time.perf_counter() - start > TIME_BUDGET:
+            break
+    return (time.perf_counter() - start) / done
+
+
+def bench_backend(backend, conversations: list, ops: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    ids = [rng.choice(conversations).id for _ in range(ops)]
+    extra = corpus(ops, seed=seed + 1)
+    for conv in extra:
+        conv.id = "new-" + conv.id
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = backend(Path(tmp))
+        try:
+            populate(storage, conversations)
+            return {
+                "save": timed(lambda i: storage.save_conversation(extra[i]), ops),
+                "get": timed(lambda i: storage.get_conversation(ids[i]), ops),
+                "list": timed(lambda i: storage.list_conversations(limit=50), ops),
+                "page": timed(lambda i: storage.get_messages(ids[i], limit=50), ops),
+                "append": timed(lambda i: storage.append_message(
+                    ids[i], Message(role="assistant", content="reply")), ops),
+            }
+        finally:
+            storage.close()
+
+
+def run(conversations: int = 10000, ops: int = 50) -> dict:
+    """Return seconds per operation for each backend."""
+    history = corpus(conversations)
+    return {name: bench_backend(backend, history, ops) for name, backend in BACKENDS.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=50)
+    args = parser.parse_args()
+
+    results = run(args.conversations, args.ops)
+    operations = list(next(iter(results.values())))
+    print(f"{'backend':<10}" + "".join(f"{op:>12}" for op in operations))
+    for name, timings in results.items():
+        print(f"{name:<10}" + "".join(f"{timings[op] * 1000:>10.3f}ms" for op in operations))
+
+
+if __name__ == "__main__":
+    main()
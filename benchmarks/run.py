@@ -0,0 +1,155 @@
+"""Run every benchmark, save the results as JSON and flag regressions.
+
+Metrics are flattened to dotted names, e.g. ``storage.sqlite.get`` or
+``sse.sse.chunks_per_sec``. Names ending in ``_per_sec`` are throughputs
+(higher is better); everything else is seconds per operation (lower is
+better). Comparing against a baseline taken at the same scale reports
+each metric's change and exits with status 1 if any got worse by more
+than the tolerance. Nothing needs a display or the network.
+
+    python -m benchmarks.run [--quick] [--only storage,sse] [--output results.json]
+                             [--baseline benchmarks/baseline.json] [--save-baseline]
+                             [--tolerance 0.3]
+
+Baselines are machine specific: save one on the machine that will be
+compared against it.
+"""
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks import bench_import, bench_markdown, bench_sse, bench_storage
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# Share by which a metric may get worse before it counts as a regression
+DEFAULT_TOLERANCE = 0.3
+
+# Sizes per scale; a baseline is only comparable with results of the same scale
+SCALES = {
+    "full": {
+        "storage": {"conversations": 10000, "ops": 50},
+        "markdown": {"repeat": 200, "tokens": 100000},
+        "sse": {"tokens": 100000, "repeat": 5},
+        "imports": {"repeat": 10},
+    },
+    "quick": {
+        "storage": {"conversations": 1000, "ops": 20},
+        "markdown": {"repeat": 20, "tokens": 10000},
+        "sse": {"tokens": 10000, "repeat": 3},
+        "imports": {"repeat": 3},
+    },
+}
+
+SUITES = {
+    "storage": bench_storage.run,
+    "markdown": bench_markdown.run,
+    "sse": bench_sse.run,
+    "imports": bench_import.run,
+}
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        else:
+            metrics[name] = value
+    return metrics
+
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_sec")
+
+
+def run(scale: str = "full", only=None) -> dict:
+    """Run the suites (all, or those named in ``only``) and return a results document."""
+    config = {name: SCALES[scale][name] for name in SUITES if not only or name in only}
+    metrics = {}
+    for name, options in config.items():
+        print(f"running {name} {options}", file=sys.stderr)
+        metrics.update(flatten(SUITES[name](**options), name))
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "config": config,
+        "metrics": metrics,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Return (name, baseline, current, slowdown, regressed) for metrics in both.
+
+    ``slowdown`` is the share by which the metric got worse, negative when
+    it improved.
+    """
+    rows = []
+    for name, current in results["metrics"].items():
+        before = baseline["metrics"].get(name)
+        if not before or not current:
+            continue
+        if higher_is_better(name):
+            slowdown = before / current - 1
+        else:
+            slowdown = current / before - 1
+        rows.append((name, before, current, slowdown, slowdown > tolerance))
+    return rows
+
+
+def comparable(results: dict, baseline: dict) -> bool:
+    return all(baseline.get("config", {}).get(suite) == options
+               for suite, options in results["config"].items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller corpora, for CI")
+    parser.add_argument("--only", help="comma-separated suites: " + ",".join(SUITES))
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    only = set(args.only.split(",")) if args.only else None
+    if only and not only <= set(SUITES):
+        parser.error(f"unknown suite: {', '.join(sorted(only - set(SUITES)))}")
+
+    results = run("quick" if args.quick else "full", only)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"saved baseline to {args.baseline}")
+
+    if args.save_baseline or not args.baseline.exists():
+        for name, value in results["metrics"].items():
+            print(f"{name:<36}{value:>14.6g}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if not comparable(results, baseline):
+        print(f"{args.baseline} was taken at a different scale; not comparing", file=sys.stderr)
+        return 2
+
+    rows = compare(results, baseline, args.tolerance)
+    print(f"{'metric':<36}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, before, current, slowdown, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<36}{before:>14.6g}{current:>14.6g}{slowdown:>+10.1%}{flag}")
+    regressions = sum(row[4] for row in rows)
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -37,7 +37,7 @@ version = 0.1
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy,kivymd,cython,openai,requests,tinydb,markdown,plyer
+requirements = python3,sqlite3,kivy,kivymd,cython,openai,httpx,requests,tinydb,markdown,plyer
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
@@ -1,3 +1,8 @@
-# data/__init__.py
-from .models import Message, Conversation, Settings
+from .models import Message, Conversation, ConversationSummary, MessagePage, Settings
 from .storage import StorageManager
+from .journal import JournalStorageManager
+from .sqlite_storage import SQLiteStorageManager
+from .service import StorageService
+from .async_storage import AsyncStorage
+from .config import get_storage, get_async_storage, BACKENDS
+from .paths import default_data_dir, set_data_dir_provider
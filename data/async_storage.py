@@ -0,0 +1,130 @@
+import copy
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+from .models import Conversation, Message, Settings
+from .service import StorageService
+from .storage import MESSAGE_PAGE_SIZE, METRICS_LIMIT
+
+logger = logging.getLogger(__name__)
+
+Callback = Optional[Callable[[Any], None]]
+
+
+def call_inline(fn: Callable[[], None]) -> None:
+    fn()
+
+
+class AsyncStorage:
+    """Asynchronous front end that runs all storage I/O on one thread.
+
+    Every call is queued to a single ``storage-io`` thread that owns the
+    backend, so operations apply in submission order and the caller never
+    waits on disk. Calls return a ``Future``; an optional ``callback`` gets
+    the result through ``dispatch``, which the UI points at the Kivy Clock
+    so callbacks run on the main thread. Settings, and summaries already in
+    the service's cache, are answered without touching the queue.
+    """
+
+    def __init__(self, service: StorageService, dispatch: Callable[[Callable], None] = call_inline):
+        self.service = service
+        self.dispatch = dispatch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="storage-io", daemon=True)
+        self._thread.start()
+        service.flush_executor = self.submit
+        # Warm the settings cache so the first get_settings() does not hit disk
+        self.submit(service.get_settings)
+
+    @property
+    def data_dir(self):
+        return self.service.data_dir
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, callback = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                logger.exception("Storage call %s failed", getattr(fn, '__name__', fn))
+                future.set_exception(e)
+                continue
+            # Dispatch before resolving so a waiter on the future sees the callback's effects
+            if callback is not None:
+                self.dispatch(lambda: callback(result))
+            future.set_result(result)
+
+    def submit(self, fn: Callable, *args, callback: Callback = None, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` on the storage thread."""
+        future = Future()
+        self._queue.put((future, fn, args, kwargs, callback))
+        return future
+
+    def _resolved(self, result, callback: Callback) -> Future:
+        future = Future()
+        future.set_result(result)
+        if callback is not None:
+            self.dispatch(lambda: callback(result))
+        return future
+
+    def flush(self) -> Future:
+        return self.submit(self.service.flush)
+
+    def close(self) -> None:
+        """Drain the queue, stop the thread and close the service."""
+        self._queue.put(None)
+        self._thread.join()
+        self.service.flush_executor = None
+        self.service.close()
+
+    # Writes
+
+    def save_conversation(self, conversation: Conversation, callback: Callback = None) -> Future:
+        # Snapshot now; the caller keeps mutating its copy while the write is queued
+        return self.submit(self.service.save_conversation, copy.deepcopy(conversation),
+                           callback=callback)
+
+    def append_message(self, conv_id: str, message: Message, callback: Callback = None) -> Future:
+        return self.submit(self.service.append_message, conv_id, copy.copy(message),
+                           callback=callback)
+
+    def delete_conversation(self, conv_id: str, callback: Callback = None) -> Future:
+        return self.submit(self.service.delete_conversation, conv_id, callback=callback)
+
+    def save_settings(self, settings: Settings) -> None:
+        # In-memory only; the service flushes it on its own timer
+        self.service.save_settings(settings)
+
+    # Reads
+
+    def get_settings(self) -> Settings:
+        return self.service.get_settings()
+
+    def get_conversation_summary(self, conv_id: str, callback: Callback = None) -> Future:
+        cached = self.service.cached_summary(conv_id)
+        if cached is not None:
+            return self._resolved(cached, callback)
+        return self.submit(self.service.get_conversation_summary, conv_id, callback=callback)
+
+    def get_conversation(self, conv_id: str, callback: Callback = None) -> Future:
+        return self.submit(self.service.get_conversation, conv_id, callback=callback)
+
+    def get_messages(self, conv_id: str, before: Optional[int] = None,
+                     limit: int = MESSAGE_PAGE_SIZE, callback: Callback = None) -> Future:
+        return self.submit(self.service.get_messages, conv_id, before=before, limit=limit,
+                           callback=callback)
+
+    def list_conversations(self, offset: int = 0, limit: int = 50,
+                           callback: Callback = None) -> Future:
+        return self.submit(self.service.list_conversations, offset=offset, limit=limit,
+                           callback=callback)
+
+    def recent_reply_metrics(self, limit: int = METRICS_LIMIT, callback: Callback = None) -> Future:
+        return self.submit(self.service.recent_reply_metrics, limit=limit, callback=callback)
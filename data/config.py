@@ -0,0 +1,69 @@
+from pathlib import Path
+from typing import Callable, Optional
+from .storage import StorageManager
+from .paths import default_data_dir
+from .journal import JournalStorageManager
+from .sqlite_storage import SQLiteStorageManager
+from .service import StorageService, FLUSH_INTERVAL
+from .async_storage import AsyncStorage, call_inline
+
+BACKENDS = {
+    "tinydb": StorageManager,
+    "journal": JournalStorageManager,
+    "sqlite": SQLiteStorageManager,
+}
+
+DEFAULT_BACKEND = "sqlite"
+
+# One service per data dir, shared by every screen in the process
+_instances = {}
+# At most one I/O thread in front of each service, under the same key
+_async_instances = {}
+
+
+def _instance_key(backend: str, data_dir: Optional[Path]) -> tuple:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if data_dir is None:
+        data_dir = default_data_dir()
+    return (backend, Path(data_dir).resolve())
+
+
+def get_storage(backend: str = DEFAULT_BACKEND, data_dir: Optional[Path] = None,
+                flush_interval: float = FLUSH_INTERVAL) -> StorageService:
+    key = _instance_key(backend, data_dir)
+    if key not in _instances:
+        _instances[key] = StorageService(BACKENDS[backend](key[1]), flush_interval)
+    return _instances[key]
+
+
+def get_async_storage(dispatch: Callable[[Callable], None] = call_inline,
+                      backend: str = DEFAULT_BACKEND, data_dir: Optional[Path] = None) -> AsyncStorage:
+    """Return the shared asynchronous front end for ``get_storage(backend, data_dir)``.
+
+    ``dispatch`` only takes effect when the front end is first created.
+    """
+    key = _instance_key(backend, data_dir)
+    if key not in _async_instances:
+        _async_instances[key] = AsyncStorage(get_storage(backend, data_dir), dispatch)
+    return _async_instances[key]
+
+
+def flush_all() -> None:
+    """Write all pending changes and wait until they are on disk."""
+    for key, service in list(_instances.items()):
+        front_end = _async_instances.get(key)
+        if front_end is not None:
+            front_end.flush().result()
+        else:
+            service.flush()
+
+
+def close_all() -> None:
+    while _instances:
+        key, service = _instances.popitem()
+        front_end = _async_instances.pop(key, None)
+        if front_end is not None:
+            front_end.close()
+        else:
+            service.close()
@@ -0,0 +1,271 @@
+import heapq
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+from tinydb import TinyDB
+from .models import Conversation, ConversationSummary, Message, MessagePage, ReplyMetrics, Settings
+from .storage import (
+    StorageManager, SETTINGS_ID, MESSAGE_PAGE_SIZE, METRICS_LIMIT, message_to_dict,
+    conversation_from_dict, summarize_conversation, page_messages, newest_metrics,
+    settings_to_dict, settings_from_dict
+)
+
+JOURNAL_FILE = "chat_journal.log"
+LEGACY_FILE = "chat_data.json"
+
+
+class JournalStorageManager(StorageManager):
+    """Append-only storage backend.
+
+    Every change is appended to ``chat_journal.log`` as one JSON record and
+    applied to an in-memory index, so a save costs O(change) instead of a
+    rewrite of the whole history. Replaying the log on open rebuilds the
+    index; once superseded records pile up the log is compacted on a
+    background thread.
+
+    Record types:
+        {"op": "conv", "id", "title", "created_at"}   conversation header
+        {"op": "msgs", "id", "start", "messages"}     truncate to start, then append
+        {"op": "del", "id"}                           delete conversation
+        {"op": "settings", ...}                       replace settings
+    """
+
+    # Compact once the log holds this many records more than a fresh snapshot would
+    compact_threshold = 1000
+
+    def _open(self) -> None:
+        self.log_path = self.data_dir / JOURNAL_FILE
+        self._lock = threading.RLock()
+        self._conversations = {}  # id -> {'id', 'title', 'created_at', 'messages'}
+        self._summaries = {}  # id -> ConversationSummary, kept current by _apply
+        self._settings = None
+        self._log_records = 0
+        self._compactor = None
+        self._pending = None  # records appended while a compaction is running
+
+        if self.log_path.exists():
+            self._replay()
+        elif (self.data_dir / LEGACY_FILE).exists():
+            self._import_legacy(self.data_dir / LEGACY_FILE)
+            self._write_snapshot(self.log_path)
+
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        compactor = self._compactor
+        if compactor:
+            compactor.join()
+        with self._lock:
+            self._log.close()
+
+    # Log handling
+
+    def _replay(self) -> None:
+        complete = 0  # bytes up to the end of the last newline-terminated record
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # A torn trailing write from a crash; everything before it is intact
+                    break
+                complete += len(line)
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                self._apply(record)
+                self._log_records += 1
+        if complete < self.log_path.stat().st_size:
+            # Cut the torn record off, or the next append would be joined onto it
+            os.truncate(self.log_path, complete)
+
+    def _import_legacy(self, path: Path) -> None:
+        legacy = TinyDB(path)
+        try:
+            for doc in legacy.all():
+                if doc.get('_id') == SETTINGS_ID:
+                    self._settings = settings_to_dict(settings_from_dict(doc))
+                elif 'id' in doc:
+                    conv = {
+                        'id': doc['id'],
+                        'title': doc['title'],
+                        'created_at': doc['created_at'],
+                        'messages': list(doc['messages'])
+                    }
+                    self._conversations[conv['id']] = conv
+                    self._summaries[conv['id']] = summarize_conversation(conv)
+        finally:
+            legacy.close()
+
+    def _apply(self, record: dict) -> None:
+        op = record['op']
+        if op == 'conv':
+            conv = self._conversations.setdefault(record['id'], {'id': record['id'], 'messages': []})
+            conv['title'] = record['title']
+            conv['created_at'] = record['created_at']
+            self._summaries[conv['id']] = summarize_conversation(conv)
+        elif op == 'msgs':
+            conv = self._conversations.get(record['id'])
+            if conv is not None:
+                del conv['messages'][record['start']:]
+                conv['messages'].extend(record['messages'])
+                self._summaries[conv['id']] = summarize_conversation(conv)
+        elif op == 'del':
+            self._conversations.pop(record['id'], None)
+            self._summaries.pop(record['id'], None)
+        elif op == 'settings':
+            self._settings = record['data']
+
+    def _append(self, record: dict) -> None:
+        self._apply(record)
+        self._log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._log.flush()
+        self._log_records += 1
+        if self._pending is not None:
+            self._pending.append(record)
+        self._maybe_compact()
+
+    def _snapshot_records(self) -> list:
+        records = []
+        for conv in self._conversations.values():
+            records.append({'op': 'conv', 'id': conv['id'], 'title': conv['title'],
+                            'created_at': conv['created_at']})
+            records.append({'op': 'msgs', 'id': conv['id'], 'start': 0,
+                            'messages': list(conv['messages'])})
+        if self._settings is not None:
+            records.append({'op': 'settings', 'data': dict(self._settings)})
+        return records
+
+    def _write_snapshot(self, path: Path) -> None:
+        records = self._snapshot_records()
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, path)
+        self._log_records = len(records)
+
+    # Compaction
+
+    def _maybe_compact(self) -> None:
+        if self._compactor is not None:
+            return
+        live_records = 2 * len(self._conversations) + 1
+        if self._log_records - live_records < self.compact_threshold:
+            return
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+
+    def compact(self) -> None:
+        """Rewrite the log as a snapshot of the current state.
+
+        The snapshot is written outside the lock; records appended meanwhile
+        are replayed onto it before it replaces the live log.
+        """
+        try:
+            with self._lock:
+                records = self._snapshot_records()
+                self._pending = []
+            tmp_path = self.log_path.with_suffix('.compact')
+            f = open(tmp_path, 'w', encoding='utf-8')
+            try:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                with self._lock:
+                    for record in self._pending:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+                    self._log.close()
+                    os.replace(tmp_path, self.log_path)
+                    self._log = open(self.log_path, 'a', encoding='utf-8')
+                    self._log_records = len(records) + len(self._pending)
+            finally:
+                f.close()
+        finally:
+            self._pending = None
+            self._compactor = None
+
+    # StorageManager API
+
+    def save_conversation(self, conversation: Conversation) -> None:
+        with self._lock:
+            stored = self._conversations.get(conversation.id)
+            if (stored is None or stored['title'] != conversation.title
+                    or stored['created_at'] != conversation.created_at):
+                self._append({'op': 'conv', 'id': conversation.id, 'title': conversation.title,
+                              'created_at': conversation.created_at})
+                stored = self._conversations[conversation.id]
+
+            # Only the messages past the common prefix hit the disk
+            old = stored['messages']
+            new = [message_to_dict(m) for m in conversation.messages]
+            start = 0
+            limit = min(len(old), len(new))
+            while start < limit and old[start] == new[start]:
+                start += 1
+            if start < len(old) or start < len(new):
+                self._append({'op': 'msgs', 'id': conversation.id, 'start': start,
+                              'messages': new[start:]})
+
+    def get_conversation(self, conv_id: str) -> Conversation:
+        with self._lock:
+            result = self._conversations.get(conv_id)
+            if not result:
+                return Conversation()
+            return conversation_from_dict(result)
+
+    def get_all_conversations(self) -> List[Conversation]:
+        with self._lock:
+            return [conversation_from_dict(c) for c in self._conversations.values()]
+
+    def get_conversation_summary(self, conv_id: str) -> Optional[ConversationSummary]:
+        with self._lock:
+            return self._summaries.get(conv_id)
+
+    def get_messages(self, conv_id: str, before: Optional[int] = None,
+                     limit: int = MESSAGE_PAGE_SIZE) -> MessagePage:
+        with self._lock:
+            conv = self._conversations.get(conv_id)
+            if not conv:
+                return MessagePage(messages=[])
+            return page_messages(conv['messages'], before, limit)
+
+    def append_messages(self, conv_id: str, messages: List[Message]) -> None:
+        if not messages:
+            return
+        with self._lock:
+            conv = self._conversations.get(conv_id)
+            if conv is None:
+                raise KeyError(conv_id)
+            self._append({'op': 'msgs', 'id': conv_id, 'start': len(conv['messages']),
+                          'messages': [message_to_dict(m) for m in messages]})
+
+    def list_conversations(self, offset: int = 0, limit: int = 50) -> List[ConversationSummary]:
+        with self._lock:
+            newest = heapq.nlargest(offset + limit, self._summaries.values(),
+                                    key=lambda s: s.updated_at)
+            return newest[offset:]
+
+    def recent_reply_metrics(self, limit: int = METRICS_LIMIT) -> List[ReplyMetrics]:
+        with self._lock:
+            return newest_metrics(self._conversations.values(), limit)
+
+    def delete_conversation(self, conv_id: str) -> None:
+        with self._lock:
+            if conv_id in self._conversations:
+                self._append({'op': 'del', 'id': conv_id})
+
+    def save_settings(self, settings: Settings) -> None:
+        with self._lock:
+            data = settings_to_dict(settings)
+            if data != self._settings:
+                self._append({'op': 'settings', 'data': data})
+
+    def get_settings(self) -> Settings:
+        with self._lock:
+            if self._settings:
+                return settings_from_dict(self._settings)
+            return Settings()
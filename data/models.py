@@ -1,14 +1,36 @@
 # data/models.py
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Literal
+from typing import List, Literal, Optional
 import uuid
 
+@dataclass
+class ReplyMetrics:
+    """How a streamed reply performed. Times are seconds after send was pressed."""
+    provider: str = ""
+    model: str = ""
+    connect: Optional[float] = None  # until the response headers arrived
+    first_chunk: Optional[float] = None
+    total: float = 0.0
+    chunks: int = 0
+    chars: int = 0
+    tokens_per_sec: Optional[float] = None  # from the first chunk to the last
+    gap_p50: Optional[float] = None  # between consecutive chunks
+    gap_p95: Optional[float] = None
+    gap_max: Optional[float] = None
+    ui_lag_p50: Optional[float] = None  # from a chunk arriving to its text reaching the bubble
+    ui_lag_p95: Optional[float] = None
+    ui_lag_max: Optional[float] = None
+
 @dataclass
 class Message:
-    role: Literal['user', 'assistant']
+    role: Literal['user', 'assistant', 'system']
     content: str
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    # Tokens in content, counted once when the message is created or first sent
+    token_count: Optional[int] = field(default=None, compare=False)
+    # Set on streamed replies
+    metrics: Optional[ReplyMetrics] = field(default=None, compare=False)
 
 @dataclass
 class Conversation:
@@ -17,9 +39,27 @@ class Conversation:
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     messages: List[Message] = field(default_factory=list)
 
+@dataclass
+class ConversationSummary:
+    id: str
+    title: str
+    created_at: str
+    updated_at: str
+    message_count: int = 0
+    preview: str = ""
+
+@dataclass
+class MessagePage:
+    messages: List[Message]
+    cursor: Optional[int] = None  # position of messages[0]; None once the start is reached
+
 @dataclass
 class Settings:
     api_provider: str = "openai"
     api_key: str = ""
     model: str = "gpt-3.5-turbo"
     current_conversation_id: str = ""
+    response_cache: bool = False  # answer repeated requests from disk
+    backup_provider: str = ""  # takes over when the provider fails or is slow; "" for none
+    backup_api_key: str = ""
+    backup_model: str = ""
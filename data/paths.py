@@ -0,0 +1,36 @@
+# data/paths.py
+import os
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+# Used when no provider is set, e.g. by headless tools
+DATA_DIR_ENV = "AI_CHAT_DATA_DIR"
+
+DataDirProvider = Callable[[], Union[str, Path]]
+
+_provider: Optional[DataDirProvider] = None
+
+
+def set_data_dir_provider(provider: Optional[DataDirProvider]) -> Optional[DataDirProvider]:
+    """Make ``provider`` the source of ``default_data_dir``; returns the previous one.
+
+    The UI registers one backed by the running Kivy app, so this package
+    never has to import Kivy itself. ``None`` removes the provider.
+    """
+    global _provider
+    previous, _provider = _provider, provider
+    return previous
+
+
+def default_data_dir() -> Path:
+    """The directory storage uses when it is not given one.
+
+    Asks the registered provider, else falls back to ``$AI_CHAT_DATA_DIR``.
+    """
+    if _provider is not None:
+        return Path(_provider())
+    if os.environ.get(DATA_DIR_ENV):
+        return Path(os.environ[DATA_DIR_ENV])
+    raise RuntimeError(
+        f"No data directory: pass data_dir, call set_data_dir_provider() or set {DATA_DIR_ENV}"
+    )
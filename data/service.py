@@ -0,0 +1,281 @@
+import copy
+import dataclasses
+import logging
+import threading
+from typing import Callable, List, Optional
+from .models import Conversation, ConversationSummary, Message, MessagePage, ReplyMetrics, Settings
+from .storage import (
+    StorageManager, MESSAGE_PAGE_SIZE, METRICS_LIMIT, conversation_to_dict, summarize_conversation,
+    make_preview
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a write may sit in memory before it is flushed to the backend
+FLUSH_INTERVAL = 1.0
+
+# Flushes a change may fail in before it is dropped
+MAX_WRITE_ATTEMPTS = 5
+
+
+class StorageService:
+    """Process-wide write-behind cache in front of a storage backend.
+
+    Writes land in an in-memory dirty set and are flushed together once
+    ``flush_interval`` seconds after the first of them, so a burst such as
+    "user message, AI reply, settings save" costs one write per conversation
+    instead of one per call. Settings are served from memory; conversation
+    reads flush pending writes first so callers always see their own saves.
+    Conversation summaries are cached once read and kept current by writes.
+
+    Pending work per conversation is coalesced:
+        ('save', Conversation)    full replacement, later appends fold into it
+        ('append', [Message])     messages to add to the stored conversation
+        ('delete', None)          drop the conversation
+    """
+
+    def __init__(self, backend: StorageManager, flush_interval: float = FLUSH_INTERVAL):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # conv_id -> (kind, payload)
+        self._settings = None
+        self._settings_dirty = False
+        self._summaries = {}  # conv_id -> ConversationSummary
+        self._failures = {}  # conv_id -> flushes its first unwritten change has failed in
+        self._timer = None
+        # Runs timer-triggered flushes; AsyncStorage points this at its I/O thread
+        self.flush_executor: Optional[Callable[[Callable], None]] = None
+
+    @property
+    def data_dir(self):
+        return self.backend.data_dir
+
+    @property
+    def dirty(self) -> bool:
+        with self._lock:
+            return bool(self._pending) or self._settings_dirty
+
+    # Flushing
+
+    def _schedule_flush(self) -> None:
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self) -> None:
+        if self.flush_executor is not None:
+            self.flush_executor(self._flush_logged)
+        else:
+            self._flush_logged()
+
+    def _flush_logged(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Background storage flush failed")
+
+    def flush(self) -> None:
+        """Write every pending change to the backend now.
+
+        A change that fails to write is logged and stays pending for the
+        next flush, which is scheduled at once; the others are written
+        regardless. One that still fails after ``MAX_WRITE_ATTEMPTS``
+        flushes is dropped.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending, self._pending = self._pending, {}
+                settings = self._settings if self._settings_dirty else None
+                self._settings_dirty = False
+
+            unwritten = []
+            for conv_id, entry in pending.items():
+                rest = self._write(conv_id, entry)
+                if rest is not None:
+                    unwritten.append((conv_id, rest))
+            settings_failed = False
+            if settings is not None:
+                try:
+                    self.backend.save_settings(settings)
+                except Exception:
+                    logger.exception("Could not save settings; will retry")
+                    settings_failed = True
+
+            if unwritten or settings_failed:
+                with self._lock:
+                    for conv_id, entry in unwritten:
+                        self._requeue(conv_id, entry)
+                    if settings_failed:
+                        self._settings_dirty = True
+                    self._schedule_flush()
+
+    def _write(self, conv_id: str, entry: tuple) -> Optional[tuple]:
+        """Write one pending entry; returns the part still to retry, or None."""
+        kind, payload = entry
+        if kind == 'save' and payload.messages or kind == 'append' and len(payload) > 1:
+            try:
+                self._write_entry(conv_id, entry)
+                self._failures.pop(conv_id, None)
+                return None
+            except Exception:
+                pass
+            # Retry piece by piece, so a message that can never be stored
+            # only holds up the ones after it
+            messages = payload.messages if kind == 'save' else payload
+            if kind == 'save':
+                header = copy.copy(payload)
+                header.messages = []
+                if self._write(conv_id, ('save', header)) is not None:
+                    return entry
+            for i, message in enumerate(messages):
+                if self._write(conv_id, ('append', [message])) is not None:
+                    return ('append', messages[i:])
+            return None
+
+        try:
+            self._write_entry(conv_id, entry)
+        except Exception:
+            attempts = self._failures.get(conv_id, 0) + 1
+            if attempts >= MAX_WRITE_ATTEMPTS:
+                self._failures.pop(conv_id, None)
+                logger.exception("Dropping a %s of conversation %s after %d failed writes",
+                                 kind, conv_id, attempts)
+                return None
+            self._failures[conv_id] = attempts
+            logger.exception("Could not write a %s of conversation %s; will retry", kind, conv_id)
+            return entry
+        self._failures.pop(conv_id, None)
+        return None
+
+    def _write_entry(self, conv_id: str, entry: tuple) -> None:
+        kind, payload = entry
+        if kind == 'save':
+            self.backend.save_conversation(payload)
+        elif kind == 'append':
+            self.backend.append_messages(conv_id, payload)
+        elif kind == 'delete':
+            self.backend.delete_conversation(conv_id)
+
+    def _requeue(self, conv_id: str, entry: tuple) -> None:
+        # Merge an unwritten entry with whatever was queued for the conversation since
+        kind, payload = entry
+        newer = self._pending.get(conv_id)
+        if newer is None:
+            self._pending[conv_id] = entry
+        elif newer[0] == 'append':
+            if kind == 'save':
+                payload.messages.extend(newer[1])
+            elif kind == 'append':
+                payload.extend(newer[1])
+            self._pending[conv_id] = entry
+        # A newer save or delete replaces the unwritten entry outright
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            self.backend.close()
+
+    # Writes
+
+    def save_conversation(self, conversation: Conversation) -> None:
+        with self._lock:
+            self._pending[conversation.id] = ('save', copy.deepcopy(conversation))
+            self._summaries[conversation.id] = summarize_conversation(conversation_to_dict(conversation))
+            self._schedule_flush()
+
+    def append_message(self, conv_id: str, message: Message) -> None:
+        self.append_messages(conv_id, [message])
+
+    def append_messages(self, conv_id: str, messages: List[Message]) -> None:
+        with self._lock:
+            kind, payload = self._pending.get(conv_id, (None, None))
+            if kind == 'save':
+                payload.messages.extend(copy.copy(m) for m in messages)
+            elif kind == 'append':
+                payload.extend(copy.copy(m) for m in messages)
+            elif kind == 'delete' or (conv_id not in self._summaries
+                                      and self.backend.get_conversation_summary(conv_id) is None):
+                raise KeyError(conv_id)
+            else:
+                self._pending[conv_id] = ('append', [copy.copy(m) for m in messages])
+            summary = self._summaries.get(conv_id)
+            if summary is not None and messages:
+                self._summaries[conv_id] = dataclasses.replace(
+                    summary,
+                    updated_at=messages[-1].timestamp,
+                    message_count=summary.message_count + len(messages),
+                    preview=make_preview(messages[-1].content)
+                )
+            self._schedule_flush()
+
+    def delete_conversation(self, conv_id: str) -> None:
+        with self._lock:
+            self._pending[conv_id] = ('delete', None)
+            self._summaries.pop(conv_id, None)
+            self._schedule_flush()
+
+    def save_settings(self, settings: Settings) -> None:
+        with self._lock:
+            self._settings = copy.copy(settings)
+            self._settings_dirty = True
+            self._schedule_flush()
+
+    # Reads
+
+    def get_settings(self) -> Settings:
+        with self._lock:
+            if self._settings is None:
+                self._settings = self.backend.get_settings()
+            return copy.copy(self._settings)
+
+    def _flush_if_dirty(self) -> None:
+        if self._pending:
+            self.flush()
+
+    def get_conversation(self, conv_id: str) -> Conversation:
+        self._flush_if_dirty()
+        return self.backend.get_conversation(conv_id)
+
+    def get_all_conversations(self) -> List[Conversation]:
+        self._flush_if_dirty()
+        return self.backend.get_all_conversations()
+
+    def cached_summary(self, conv_id: str) -> Optional[ConversationSummary]:
+        """Return the summary if it is already in memory, without any I/O."""
+        with self._lock:
+            return self._summaries.get(conv_id)
+
+    def get_conversation_summary(self, conv_id: str) -> Optional[ConversationSummary]:
+        cached = self.cached_summary(conv_id)
+        if cached is not None:
+            return cached
+        self._flush_if_dirty()
+        summary = self.backend.get_conversation_summary(conv_id)
+        if summary is not None:
+            with self._lock:
+                self._summaries.setdefault(conv_id, summary)
+        return summary
+
+    def get_messages(self, conv_id: str, before: Optional[int] = None,
+                     limit: int = MESSAGE_PAGE_SIZE) -> MessagePage:
+        self._flush_if_dirty()
+        return self.backend.get_messages(conv_id, before=before, limit=limit)
+
+    def list_conversations(self, offset: int = 0, limit: int = 50) -> List[ConversationSummary]:
+        self._flush_if_dirty()
+        return self.backend.list_conversations(offset=offset, limit=limit)
+
+    def recent_reply_metrics(self, limit: int = METRICS_LIMIT) -> List[ReplyMetrics]:
+        self._flush_if_dirty()
+        return self.backend.recent_reply_metrics(limit=limit)
@@ -0,0 +1,304 @@
+import json
+import sqlite3
+import threading
+from dataclasses import asdict
+from typing import List, Optional
+from .models import Conversation, ConversationSummary, MessagePage, ReplyMetrics, Settings, Message
+from .storage import (
+    StorageManager, MESSAGE_PAGE_SIZE, METRICS_LIMIT, make_preview, settings_to_dict, settings_from_dict
+)
+from .journal import JournalStorageManager, JOURNAL_FILE, LEGACY_FILE
+
+DATABASE_FILE = "chat_data.sqlite3"
+SCHEMA_VERSION = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT '',
+    message_count INTEGER NOT NULL DEFAULT 0,
+    preview TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON conversations (created_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    token_count INTEGER,
+    metrics TEXT,
+    PRIMARY KEY (conversation_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (conversation_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_metrics ON messages (timestamp) WHERE metrics IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Version 1 databases predate the summary columns on conversations
+UPGRADE_SUMMARIES = """
+ALTER TABLE conversations ADD COLUMN updated_at TEXT NOT NULL DEFAULT '';
+ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversations ADD COLUMN preview TEXT NOT NULL DEFAULT '';
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at);
+UPDATE conversations SET
+    message_count = (SELECT COUNT(*) FROM messages WHERE conversation_id = conversations.id),
+    updated_at = COALESCE(
+        (SELECT timestamp FROM messages WHERE conversation_id = conversations.id
+         ORDER BY position DESC LIMIT 1),
+        created_at),
+    preview = COALESCE(
+        (SELECT make_preview(content) FROM messages WHERE conversation_id = conversations.id
+         ORDER BY position DESC LIMIT 1),
+        '');
+"""
+
+# Version 2 databases predate cached token counts on messages
+UPGRADE_TOKEN_COUNTS = """
+ALTER TABLE messages ADD COLUMN token_count INTEGER;
+"""
+
+# Version 3 databases predate reply metrics
+UPGRADE_REPLY_METRICS = """
+ALTER TABLE messages ADD COLUMN metrics TEXT;
+CREATE INDEX IF NOT EXISTS idx_messages_metrics ON messages (timestamp) WHERE metrics IS NOT NULL;
+"""
+
+
+def metrics_to_json(metrics: Optional[ReplyMetrics]) -> Optional[str]:
+    return json.dumps(asdict(metrics)) if metrics else None
+
+
+def message_from_row(role: str, content: str, timestamp: str, token_count: Optional[int],
+                     metrics: Optional[str]) -> Message:
+    return Message(role, content, timestamp, token_count,
+                   ReplyMetrics(**json.loads(metrics)) if metrics else None)
+
+
+class SQLiteStorageManager(StorageManager):
+    """SQLite storage backend with one row per message.
+
+    Conversations, messages and settings live in separate indexed tables, so
+    looking up a conversation is an index probe and saving one only touches
+    the message rows that changed. Each conversation row also carries its
+    listing summary (last update, message count, preview), kept current on
+    save so the history list never reads messages. On first open, data from the journal or
+    the old TinyDB ``chat_data.json`` is migrated in; the old files are left
+    in place.
+    """
+
+    def _open(self) -> None:
+        self.db_path = self.data_dir / DATABASE_FILE
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            with self.conn:
+                self.conn.executescript(SCHEMA)
+            self._migrate_legacy()
+        else:
+            if version < 2:
+                self.conn.create_function("make_preview", 1, make_preview)
+                with self.conn:
+                    self.conn.executescript(UPGRADE_SUMMARIES)
+            if version < 3:
+                with self.conn:
+                    self.conn.executescript(UPGRADE_TOKEN_COUNTS)
+            if version < 4:
+                with self.conn:
+                    self.conn.executescript(UPGRADE_REPLY_METRICS)
+        if version < SCHEMA_VERSION:
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def _migrate_legacy(self) -> None:
+        if (self.data_dir / JOURNAL_FILE).exists():
+            source = JournalStorageManager(self.data_dir)
+        elif (self.data_dir / LEGACY_FILE).exists():
+            source = StorageManager(self.data_dir)
+        else:
+            return
+        try:
+            with self._lock, self.conn:
+                for conversation in source.get_all_conversations():
+                    self._write_conversation(conversation)
+                self._write_settings(source.get_settings())
+        finally:
+            source.close()
+
+    def _write_conversation(self, conversation: Conversation) -> None:
+        last = conversation.messages[-1] if conversation.messages else None
+        self.conn.execute(
+            "INSERT INTO conversations (id, title, created_at, updated_at, message_count, preview) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET title = excluded.title, created_at = excluded.created_at, "
+            "updated_at = excluded.updated_at, message_count = excluded.message_count, "
+            "preview = excluded.preview",
+            (conversation.id, conversation.title, conversation.created_at,
+             last.timestamp if last else conversation.created_at,
+             len(conversation.messages),
+             make_preview(last.content) if last else "")
+        )
+
+        # Only the rows past the common prefix are rewritten
+        old = self.conn.execute(
+            "SELECT role, content, timestamp, token_count, metrics FROM messages "
+            "WHERE conversation_id = ? ORDER BY position",
+            (conversation.id,)
+        ).fetchall()
+        new = [(m.role, m.content, m.timestamp, m.token_count, metrics_to_json(m.metrics))
+               for m in conversation.messages]
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and old[start] == new[start]:
+            start += 1
+
+        if start < len(old):
+            self.conn.execute(
+                "DELETE FROM messages WHERE conversation_id = ? AND position >= ?",
+                (conversation.id, start)
+            )
+        self.conn.executemany(
+            "INSERT INTO messages (conversation_id, position, role, content, timestamp, token_count, "
+            "metrics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(conversation.id, i, *row) for i, row in enumerate(new[start:], start)]
+        )
+
+    def _write_settings(self, settings: Settings) -> None:
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            settings_to_dict(settings).items()
+        )
+
+    def _read_messages(self, conv_id: str) -> List[Message]:
+        rows = self.conn.execute(
+            "SELECT role, content, timestamp, token_count, metrics FROM messages "
+            "WHERE conversation_id = ? ORDER BY position",
+            (conv_id,)
+        )
+        return [message_from_row(*row) for row in rows]
+
+    def save_conversation(self, conversation: Conversation) -> None:
+        with self._lock, self.conn:
+            self._write_conversation(conversation)
+
+    def get_conversation(self, conv_id: str) -> Conversation:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, title, created_at FROM conversations WHERE id = ?", (conv_id,)
+            ).fetchone()
+            if not row:
+                return Conversation()
+            return Conversation(id=row[0], title=row[1], created_at=row[2],
+                                messages=self._read_messages(conv_id))
+
+    def get_all_conversations(self) -> List[Conversation]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, title, created_at FROM conversations ORDER BY created_at"
+            ).fetchall()
+            return [
+                Conversation(id=conv_id, title=title, created_at=created_at,
+                             messages=self._read_messages(conv_id))
+                for conv_id, title, created_at in rows
+            ]
+
+    def get_conversation_summary(self, conv_id: str) -> Optional[ConversationSummary]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, title, created_at, updated_at, message_count, preview "
+                "FROM conversations WHERE id = ?", (conv_id,)
+            ).fetchone()
+            return ConversationSummary(*row) if row else None
+
+    def get_messages(self, conv_id: str, before: Optional[int] = None,
+                     limit: int = MESSAGE_PAGE_SIZE) -> MessagePage:
+        with self._lock:
+            if before is None:
+                rows = self.conn.execute(
+                    "SELECT position, role, content, timestamp, token_count, metrics FROM messages "
+                    "WHERE conversation_id = ? ORDER BY position DESC LIMIT ?",
+                    (conv_id, limit)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT position, role, content, timestamp, token_count, metrics FROM messages "
+                    "WHERE conversation_id = ? AND position < ? ORDER BY position DESC LIMIT ?",
+                    (conv_id, before, limit)
+                ).fetchall()
+        rows.reverse()
+        start = rows[0][0] if rows else 0
+        return MessagePage(
+            messages=[message_from_row(*row[1:]) for row in rows],
+            cursor=start if start > 0 else None
+        )
+
+    def append_messages(self, conv_id: str, messages: List[Message]) -> None:
+        if not messages:
+            return
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT message_count FROM conversations WHERE id = ?", (conv_id,)
+            ).fetchone()
+            if not row:
+                raise KeyError(conv_id)
+            self.conn.executemany(
+                "INSERT INTO messages (conversation_id, position, role, content, timestamp, token_count, "
+                "metrics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(conv_id, position, m.role, m.content, m.timestamp, m.token_count,
+                  metrics_to_json(m.metrics))
+                 for position, m in enumerate(messages, row[0])]
+            )
+            last = messages[-1]
+            self.conn.execute(
+                "UPDATE conversations SET updated_at = ?, message_count = ?, preview = ? "
+                "WHERE id = ?",
+                (last.timestamp, row[0] + len(messages), make_preview(last.content), conv_id)
+            )
+
+    def list_conversations(self, offset: int = 0, limit: int = 50) -> List[ConversationSummary]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, title, created_at, updated_at, message_count, preview "
+                "FROM conversations ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+            return [ConversationSummary(*row) for row in rows]
+
+    def recent_reply_metrics(self, limit: int = METRICS_LIMIT) -> List[ReplyMetrics]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT metrics FROM messages WHERE metrics IS NOT NULL "
+                "ORDER BY timestamp DESC LIMIT ?", (limit,)
+            ).fetchall()
+            return [ReplyMetrics(**json.loads(row[0])) for row in rows]
+
+    def delete_conversation(self, conv_id: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
+
+    def save_settings(self, settings: Settings) -> None:
+        with self._lock, self.conn:
+            self._write_settings(settings)
+
+    def get_settings(self) -> Settings:
+        with self._lock:
+            rows = self.conn.execute("SELECT key, value FROM settings").fetchall()
+            if rows:
+                return settings_from_dict(dict(rows))
+            return Settings()
@@ -1,78 +1,200 @@
-# data/storage.py
+from dataclasses import asdict
 from tinydb import TinyDB, Query
-from kivy.app import App
 from pathlib import Path
-from typing import List, Optional
-from .models import Conversation, Settings, Message
+from typing import Iterable, List, Optional
+from .models import Conversation, ConversationSummary, MessagePage, ReplyMetrics, Settings, Message
+from .paths import default_data_dir
 
 # Constant for settings document ID
 SETTINGS_ID = "_settings"
 
+# Characters of the last message shown in conversation listings
+PREVIEW_LENGTH = 80
+
+# Messages returned per get_messages call unless a limit is given
+MESSAGE_PAGE_SIZE = 50
+
+
+# Reply metrics returned by recent_reply_metrics unless a limit is given
+METRICS_LIMIT = 200
+
+
+def message_to_dict(message: Message) -> dict:
+    return {'role': message.role, 'content': message.content, 'timestamp': message.timestamp,
+            'token_count': message.token_count,
+            'metrics': asdict(message.metrics) if message.metrics else None}
+
+
+def message_from_dict(data: dict) -> Message:
+    metrics = data.get('metrics')
+    return Message(**{**data, 'metrics': ReplyMetrics(**metrics) if metrics else None})
+
+
+def conversation_to_dict(conversation: Conversation) -> dict:
+    return {
+        'id': conversation.id,
+        'title': conversation.title,
+        'created_at': conversation.created_at,
+        'messages': [message_to_dict(m) for m in conversation.messages]
+    }
+
+
+def conversation_from_dict(data: dict) -> Conversation:
+    return Conversation(
+        id=data['id'],
+        title=data['title'],
+        created_at=data['created_at'],
+        messages=[message_from_dict(m) for m in data['messages']]
+    )
+
+
+def make_preview(content: str) -> str:
+    preview = " ".join(content.split())
+    if len(preview) > PREVIEW_LENGTH:
+        preview = preview[:PREVIEW_LENGTH - 1] + "…"
+    return preview
+
+
+def summarize_conversation(data: dict) -> ConversationSummary:
+    """Build a listing entry from a stored conversation dict."""
+    messages = data['messages']
+    last = messages[-1] if messages else None
+    return ConversationSummary(
+        id=data['id'],
+        title=data['title'],
+        created_at=data['created_at'],
+        updated_at=last['timestamp'] if last else data['created_at'],
+        message_count=len(messages),
+        preview=make_preview(last['content']) if last else ""
+    )
+
+
+def page_messages(messages: list, before: Optional[int], limit: int) -> MessagePage:
+    """Slice the page of stored message dicts ending just before ``before``."""
+    end = len(messages) if before is None else min(before, len(messages))
+    start = max(0, end - limit)
+    return MessagePage(
+        messages=[message_from_dict(m) for m in messages[start:end]],
+        cursor=start if start > 0 else None
+    )
+
+
+def newest_metrics(conversations: Iterable[dict], limit: int) -> List[ReplyMetrics]:
+    """Metrics of the newest ``limit`` measured replies among stored conversation dicts."""
+    measured = [m for c in conversations for m in c['messages'] if m.get('metrics')]
+    measured.sort(key=lambda m: m['timestamp'], reverse=True)
+    return [ReplyMetrics(**m['metrics']) for m in measured[:limit]]
+
+
+def settings_to_dict(settings: Settings) -> dict:
+    return {
+        'api_provider': settings.api_provider,
+        'api_key': settings.api_key,
+        'model': settings.model,
+        'current_conversation_id': settings.current_conversation_id,
+        'response_cache': settings.response_cache,
+        'backup_provider': settings.backup_provider,
+        'backup_api_key': settings.backup_api_key,
+        'backup_model': settings.backup_model
+    }
+
+
+def settings_from_dict(data: dict) -> Settings:
+    return Settings(
+        api_provider=data.get('api_provider', 'openai'),
+        api_key=data.get('api_key', ''),
+        model=data.get('model', 'gpt-3.5-turbo'),
+        current_conversation_id=data.get('current_conversation_id', ''),
+        # SQLite hands the flag back as text
+        response_cache=data.get('response_cache', False) in (True, '1'),
+        backup_provider=data.get('backup_provider', ''),
+        backup_api_key=data.get('backup_api_key', ''),
+        backup_model=data.get('backup_model', '')
+    )
+
 
 class StorageManager:
+    """TinyDB storage backend, and the interface every other backend implements.
+
+    Subclasses override ``_open`` to set up their own files and the public
+    methods to read and write through them.
+    """
+
     def __init__(self, data_dir: Optional[Path] = None):
         if data_dir is None:
-            app = App.get_running_app()
-            data_dir = Path(app.user_data_dir)
+            data_dir = default_data_dir()
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _open(self) -> None:
         self.db = TinyDB(self.data_dir / "chat_data.json")
 
+    def close(self) -> None:
+        self.db.close()
+
     def save_conversation(self, conversation: Conversation) -> None:
-        data = {
-            'id': conversation.id,
-            'title': conversation.title,
-            'created_at': conversation.created_at,
-            'messages': [
-                {'role': m.role, 'content': m.content, 'timestamp': m.timestamp}
-                for m in conversation.messages
-            ]
-        }
-        self.db.upsert(data, Query().id == conversation.id)
+        self.db.upsert(conversation_to_dict(conversation), Query().id == conversation.id)
 
     def get_conversation(self, conv_id: str) -> Conversation:
         result = self.db.get(Query().id == conv_id)
         if not result:
             return Conversation()
-        return Conversation(
-            id=result['id'],
-            title=result['title'],
-            created_at=result['created_at'],
-            messages=[Message(**m) for m in result['messages']]
-        )
+        return conversation_from_dict(result)
 
     def get_all_conversations(self) -> List[Conversation]:
         results = self.db.all()
         return [
-            Conversation(
-                id=r['id'],
-                title=r['title'],
-                created_at=r['created_at'],
-                messages=[Message(**m) for m in r['messages']]
-            )
+            conversation_from_dict(r)
             for r in results if 'id' in r  # Only conversations, not settings
         ]
 
+    def get_conversation_summary(self, conv_id: str) -> Optional[ConversationSummary]:
+        result = self.db.get(Query().id == conv_id)
+        return summarize_conversation(result) if result else None
+
+    def get_messages(self, conv_id: str, before: Optional[int] = None,
+                     limit: int = MESSAGE_PAGE_SIZE) -> MessagePage:
+        """Return up to ``limit`` messages ending just before position ``before``.
+
+        With ``before`` left as None this is the newest page. Pass the returned
+        cursor back as ``before`` to page towards the start of the conversation.
+        """
+        result = self.db.get(Query().id == conv_id)
+        if not result:
+            return MessagePage(messages=[])
+        return page_messages(result['messages'], before, limit)
+
+    def append_message(self, conv_id: str, message: Message) -> None:
+        """Add one message to the end of a stored conversation."""
+        self.append_messages(conv_id, [message])
+
+    def append_messages(self, conv_id: str, messages: List[Message]) -> None:
+        result = self.db.get(Query().id == conv_id)
+        if not result:
+            raise KeyError(conv_id)
+        result['messages'].extend(message_to_dict(m) for m in messages)
+        self.db.update({'messages': result['messages']}, Query().id == conv_id)
+
+    def list_conversations(self, offset: int = 0, limit: int = 50) -> List[ConversationSummary]:
+        """Return conversation summaries, most recently updated first."""
+        summaries = [summarize_conversation(r) for r in self.db.all() if 'id' in r]
+        summaries.sort(key=lambda s: s.updated_at, reverse=True)
+        return summaries[offset:offset + limit]
+
+    def recent_reply_metrics(self, limit: int = METRICS_LIMIT) -> List[ReplyMetrics]:
+        """Return the metrics of the newest measured replies, newest first."""
+        return newest_metrics((r for r in self.db.all() if 'id' in r), limit)
+
     def delete_conversation(self, conv_id: str) -> None:
         self.db.remove(Query().id == conv_id)
 
     def save_settings(self, settings: Settings) -> None:
-        data = {
-            '_id': SETTINGS_ID,
-            'api_provider': settings.api_provider,
-            'api_key': settings.api_key,
-            'model': settings.model,
-            'current_conversation_id': settings.current_conversation_id
-        }
+        data = {'_id': SETTINGS_ID, **settings_to_dict(settings)}
         self.db.upsert(data, Query()._id == SETTINGS_ID)
 
     def get_settings(self) -> Settings:
         result = self.db.get(Query()._id == SETTINGS_ID)
         if result:
-            return Settings(
-                api_provider=result.get('api_provider', 'openai'),
-                api_key=result.get('api_key', ''),
-                model=result.get('model', 'gpt-3.5-turbo'),
-                current_conversation_id=result.get('current_conversation_id', '')
-            )
+            return settings_from_dict(result)
         return Settings()
@@ -1,10 +1,18 @@
+import asyncio
 from kivy.app import App
 from kivymd.app import MDApp
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivy.lang import Builder
 from kivy.uix.screenmanager import ScreenManager
+from kivy.clock import Clock
 from ui.main_screen import MainScreen
 from ui.history_screen import HistoryDrawer
+from data.config import flush_all, close_all
+from api.config import evict_idle, evict_clients, preload_clients
+from api.cache import close_response_caches
+from api.local_server import stop_local_server
+from ui.render_cache import render_cache
+from pathlib import Path
 
 class RootLayout(MDBoxLayout):
     pass
@@ -13,7 +21,14 @@ class AIChatApp(MDApp):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    @property
+    def render_cache_path(self) -> Path:
+        return Path(self.user_data_dir) / "render_cache.json"
+
     def build(self):
+        render_cache.load(self.render_cache_path)
+        # Close provider clients nobody has used for a while
+        Clock.schedule_interval(lambda dt: evict_idle(), 60)
         self.theme_cls.theme_style = "Light"
         self.theme_cls.primary_palette = "Blue"
 
@@ -38,5 +53,39 @@ MDNavigationLayout:
 
         return root
 
+    def on_start(self):
+        from kivy.core.window import Window
+
+        def first_frame(*args):
+            # Unbinding during the dispatch would skip the handler after this one
+            Clock.schedule_once(lambda dt: Window.unbind(on_flip=first_frame), 0)
+            # The provider SDKs were left out of startup; load the ones in use now
+            settings = self.main_screen.storage.get_settings()
+            preload_clients(settings.api_provider, settings.backup_provider)
+        Window.bind(on_flip=first_frame)
+
+    def on_pause(self):
+        # Android may kill a paused app without calling on_stop
+        flush_all()
+        render_cache.save(self.render_cache_path)
+        return True
+
+    def on_stop(self):
+        from api.session import close_session
+        # Replies still streaming in any conversation; their partial text is saved first
+        self.main_screen.stop_all()
+        close_all()
+        evict_clients()
+        close_session()
+        close_response_caches()
+        stop_local_server()
+        render_cache.save(self.render_cache_path)
+
+async def main():
+    # Kivy's Clock runs on this asyncio loop, so replies stream as tasks on the UI thread
+    await AIChatApp().async_run(async_lib='asyncio')
+    from api.session import aclose_session
+    await aclose_session()
+
 if __name__ == '__main__':
-    AIChatApp().run()
+    asyncio.run(main())
@@ -1,12 +1,20 @@
 # tests/test_api.py
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from api.base import AIClientAdapter
 from api.openai_client import OpenAIClient
 from api.deepseek_client import DeepSeekClient
-from api.config import get_client, CLIENTS
+from api.config import get_client, evict_client, evict_clients, evict_idle, cached_clients, CLIENTS
+from api.cancel import CancelToken
+from api.session import PooledSession, configure_session, get_session, close_session
 from openai import OpenAIError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import gzip
+import threading
+import time
 import requests
+from pathlib import Path
 
 
 class TestAIClientAdapter:
@@ -125,20 +133,20 @@ class TestDeepSeekClient:
         client = DeepSeekClient("ds-test-key")
         assert client.base_url == "https://api.deepseek.com/v1"
 
-    @patch('api.deepseek_client.requests.post')
+    @patch('api.session.PooledSession.post')
     def test_send_message_success(self, mock_post):
         """Test send_message processes SSE stream correctly"""
         # Setup mock response
         mock_response = MagicMock()
         mock_response.raise_for_status = Mock()
 
-        # Simulate SSE stream
-        lines = [
-            b'data: {"choices":[{"delta":{"content":"Hello"}}]}',
-            b'data: {"choices":[{"delta":{"content":" World"}}]}',
-            b'data: [DONE]'
+        # Simulate SSE stream, with reads that split events
+        reads = [
+            b'data: {"choices":[{"delta":{"content":"Hello"}}]}\n\nda',
+            b'ta: {"choices":[{"delta":{"content":" World"}}]}\n',
+            b'\ndata: [DONE]\n\n'
         ]
-        mock_response.iter_lines.return_value = lines
+        mock_response.raw.read1.side_effect = reads + [b""]
         mock_post.return_value = mock_response
 
         # Create test messages
@@ -153,7 +161,7 @@ class TestDeepSeekClient:
         # Verify
         assert result == ["Hello", " World"]
 
-    @patch('api.deepseek_client.requests.post')
+    @patch('api.session.PooledSession.post')
     def test_send_message_handles_http_error(self, mock_post):
         """Test send_message handles HTTP errors gracefully"""
         mock_response = MagicMock()
@@ -169,7 +177,7 @@ class TestDeepSeekClient:
 
         assert result == ["Error: HTTP 401"]
 
-    @patch('api.deepseek_client.requests.get')
+    @patch('api.session.PooledSession.get')
     def test_validate_api_key_success(self, mock_get):
         """Test validate_api_key returns True on success"""
         mock_response = MagicMock()
@@ -179,7 +187,7 @@ class TestDeepSeekClient:
         client = DeepSeekClient("ds-test-key")
         assert client.validate_api_key() is True
 
-    @patch('api.deepseek_client.requests.get')
+    @patch('api.session.PooledSession.get')
     def test_validate_api_key_failure(self, mock_get):
         """Test validate_api_key returns False on error"""
         mock_response = MagicMock()
@@ -189,7 +197,7 @@ class TestDeepSeekClient:
         client = DeepSeekClient("invalid-key")
         assert client.validate_api_key() is False
 
-    @patch('api.deepseek_client.requests.get')
+    @patch('api.session.PooledSession.get')
     def test_validate_api_key_exception(self, mock_get):
         """Test validate_api_key returns False on exception"""
         mock_get.side_effect = requests.RequestException("Network error")
@@ -198,14 +206,300 @@ class TestDeepSeekClient:
         assert client.validate_api_key() is False
 
 
+SSE_BODY = (
+    b'data: {"choices":[{"delta":{"content":"Hi"}}]}\n\n'
+    b'data: {"choices":[{"delta":{"content":" there"}}]}\n\n'
+    b'data: [DONE]\n\n'
+)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(b'{"data": []}', "application/json")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._reply(SSE_BODY, "text/event-stream")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StallingHandler(KeepAliveHandler):
+    """Sends the first chunk of a reply, then stops writing until shut down"""
+    stop = None
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(SSE_BODY)))
+        self.end_headers()
+        self.wfile.write(SSE_BODY.split(b"\n\n")[0] + b"\n\n")
+        self.wfile.flush()
+        self.stop.wait(10)
+
+
+class GzipHandler(KeepAliveHandler):
+    """Sends the reply gzip-compressed"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = gzip.compress(SSE_BODY)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def stalling_server():
+    StallingHandler.stop = threading.Event()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StallingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    StallingHandler.stop.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_server():
+    server = serve(KeepAliveHandler)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gzip_server():
+    server = serve(GzipHandler)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestPooledSession:
+    """Test the shared keep-alive session"""
+
+    def test_reuses_connections(self, local_server):
+        """Test repeated requests to one host share a connection"""
+        session = PooledSession()
+        for _ in range(3):
+            assert session.get(f"{local_server}/models").status_code == 200
+
+        assert session.stats() == {"requests": 3, "connections": 1, "reused": 2}
+        session.close()
+        assert session.stats()["requests"] == 3
+
+    def test_default_timeouts(self):
+        """Test the adapter applies configured connect/read timeouts"""
+        session = PooledSession(connect_timeout=2, read_timeout=30, pool_maxsize=3)
+        assert session.adapter.timeout == (2, 30)
+        assert session.adapter._pool_maxsize == 3
+
+    def test_configure_replaces_shared_session(self):
+        """Test configure_session rebuilds the shared session with new options"""
+        first = get_session()
+        configure_session(read_timeout=5)
+        try:
+            second = get_session()
+            assert second is not first
+            assert second.adapter.timeout[1] == 5
+            assert get_session() is second
+        finally:
+            configure_session()
+            close_session()
+
+    def test_deepseek_streams_release_connection(self, local_server):
+        """Test a finished DeepSeek stream hands its connection back to the pool"""
+        session = PooledSession()
+        client = DeepSeekClient("ds-test-key", base_url=local_server, session=session)
+        message = Mock(role="user", content="Hi")
+
+        assert list(client.send_message([message])) == ["Hi", " there"]
+        assert list(client.send_message([message])) == ["Hi", " there"]
+        assert session.stats()["reused"] == 1
+
+    def test_deepseek_decodes_compressed_stream(self, gzip_server):
+        """Test a gzip-encoded stream is decompressed before it is parsed"""
+        client = DeepSeekClient("ds-test-key", base_url=gzip_server, session=PooledSession())
+        message = Mock(role="user", content="Hi")
+
+        assert list(client.send_message([message])) == ["Hi", " there"]
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestAsyncStreaming:
+    """Test the asend_message async iterators"""
+
+    def test_deepseek_streams_on_event_loop(self, local_server):
+        """Test many DeepSeek replies stream concurrently on one loop"""
+        client = DeepSeekClient("ds-test-key", base_url=local_server)
+        message = Mock(role="user", content="Hi")
+
+        async def run():
+            return await asyncio.gather(*(collect(client.asend_message([message])) for _ in range(10)))
+
+        assert asyncio.run(run()) == [["Hi", " there"]] * 10
+
+    def test_deepseek_async_http_error(self):
+        """Test connection failures come back as an error chunk"""
+        client = DeepSeekClient("ds-test-key", base_url="http://127.0.0.1:9")
+        result = asyncio.run(collect(client.asend_message([Mock(role="user", content="Hi")])))
+        assert len(result) == 1 and result[0].startswith("Error:")
+
+    @patch('api.openai_client.AsyncOpenAI')
+    def test_openai_async_stream(self, mock_async_openai_class):
+        """Test OpenAI chunks are read from the async SDK stream"""
+        async def sdk_chunks():
+            for content in ["Hello", None, " World"]:
+                chunk = MagicMock()
+                chunk.choices[0].delta.content = content
+                yield chunk
+
+        sdk_stream = MagicMock()
+        sdk_stream.__aiter__ = Mock(return_value=sdk_chunks())
+        sdk_stream.close = AsyncMock()
+        mock_client = mock_async_openai_class.return_value
+        mock_client.chat.completions.create = AsyncMock(return_value=sdk_stream)
+
+        client = OpenAIClient("sk-test-key")
+        result = asyncio.run(collect(client.asend_message([Mock(role="user", content="Hi")])))
+        assert result == ["Hello", " World"]
+        sdk_stream.close.assert_awaited_once()
+
+    def test_fallback_wraps_send_message(self):
+        """Test adapters without a native implementation still stream asynchronously"""
+        class SyncOnly(AIClientAdapter):
+            def send_message(self, messages, stream=True):
+                yield from ["a", "b", "c"]
+
+            def validate_api_key(self):
+                return True
+
+        client = SyncOnly("key", "model")
+        assert asyncio.run(collect(client.asend_message([]))) == ["a", "b", "c"]
+
+
+class TestCancellation:
+    """Test stopping a reply through a CancelToken"""
+
+    def test_token_runs_callbacks_once(self):
+        """Test callbacks run on cancel, immediately when late, and not after removal"""
+        token = CancelToken()
+        calls = []
+        token.on_cancel(lambda: calls.append("a"))
+        removed = lambda: calls.append("removed")
+        token.on_cancel(removed)
+        token.remove(removed)
+
+        token.cancel()
+        token.cancel()
+        token.on_cancel(lambda: calls.append("late"))
+        assert calls == ["a", "late"]
+
+    def test_sync_stream_stops_mid_reply(self, stalling_server):
+        """Test cancel closes a stalled response and keeps the partial reply"""
+        client = DeepSeekClient("ds-test-key", base_url=stalling_server, session=PooledSession())
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+
+        start = time.monotonic()
+        result = list(client.send_message([Mock(role="user", content="Hi")], cancel=token))
+        assert result == ["Hi"]
+        assert time.monotonic() - start < 5
+
+    def test_async_stream_stops_mid_reply(self, stalling_server):
+        """Test cancel interrupts an awaited read and ends the iterator quietly"""
+        client = DeepSeekClient("ds-test-key", base_url=stalling_server)
+        token = CancelToken()
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.2, token.cancel)
+            chunks = await collect(client.asend_message([Mock(role="user", content="Hi")], cancel=token))
+            await asyncio.sleep(0.05)  # the task is usable again afterwards
+            return chunks
+
+        start = time.monotonic()
+        assert asyncio.run(run()) == ["Hi"]
+        assert time.monotonic() - start < 5
+
+
 class TestConfig:
     """Test config module functionality"""
 
+    @pytest.fixture(autouse=True)
+    def empty_registry(self):
+        evict_clients()
+        yield
+        evict_clients()
+
     def test_clients_dict_has_providers(self):
         """Test CLIENTS dict has expected providers"""
         assert "openai" in CLIENTS
         assert "deepseek" in CLIENTS
 
+    def test_registry_resolves_classes(self):
+        """Test CLIENTS maps providers to their adapter classes, unknown ones to None"""
+        assert CLIENTS["openai"] is OpenAIClient
+        assert CLIENTS.get("deepseek") is DeepSeekClient
+        assert CLIENTS.get("unknown") is None
+        assert set(CLIENTS) == {"openai", "deepseek", "local"}
+
+    def test_registry_imports_on_lookup(self):
+        """Test provider SDKs load only when their adapter is looked up or preloaded"""
+        import subprocess
+        import sys
+        code = (
+            "import sys\n"
+            "from api.config import CLIENTS, preload_clients\n"
+            "assert 'openai' in CLIENTS and not CLIENTS.loaded('openai')\n"
+            "assert 'openai' not in sys.modules and 'requests' not in sys.modules\n"
+            "CLIENTS['deepseek']\n"
+            "assert 'requests' in sys.modules and 'openai' not in sys.modules\n"
+            "preload_clients('openai', '').join()\n"
+            "assert CLIENTS.loaded('openai') and 'openai' in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parent.parent)
+
+    def test_requires_api_key_without_import(self):
+        """Test the registry knows which providers need a key, matching their adapters"""
+        import subprocess
+        import sys
+        code = (
+            "import sys\n"
+            "from api.config import CLIENTS\n"
+            "assert CLIENTS.requires_api_key('openai') and not CLIENTS.requires_api_key('local')\n"
+            "assert CLIENTS.requires_api_key('unknown')\n"
+            "assert not any(CLIENTS.loaded(p) for p in CLIENTS) and 'openai' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parent.parent)
+        for provider in CLIENTS:
+            assert CLIENTS.requires_api_key(provider) == CLIENTS[provider].requires_api_key
+
     def test_get_client_openai(self):
         """Test get_client returns OpenAI client for openai provider"""
         client = get_client("openai", "sk-test-key", "gpt-4")
@@ -224,3 +518,62 @@ class TestConfig:
         """Test get_client raises ValueError for unknown provider"""
         with pytest.raises(ValueError, match="Unknown provider"):
             get_client("unknown", "test-key", "test-model")
+
+    def test_get_client_reuses_instances(self):
+        """Test identical settings return the same warm client"""
+        client = get_client("deepseek", "ds-test-key", "deepseek-chat")
+        assert get_client("deepseek", "ds-test-key", "deepseek-chat") is client
+        assert get_client("deepseek", "ds-test-key", "deepseek-coder") is not client
+        assert cached_clients() == 2
+
+    def test_get_client_passes_base_url(self):
+        """Test base_url is part of the key and reaches the client"""
+        client = get_client("deepseek", "ds-test-key", "deepseek-chat", base_url="http://localhost:8000/v1")
+        assert client.base_url == "http://localhost:8000/v1"
+        assert get_client("deepseek", "ds-test-key", "deepseek-chat") is not client
+
+    @patch('api.openai_client.OpenAI')
+    def test_evict_clients_closes_transports(self, mock_openai_class):
+        """Test evicting clients closes their SDK clients"""
+        client = get_client("openai", "sk-test-key", "gpt-4")
+        get_client("deepseek", "ds-test-key", "deepseek-chat")
+
+        evict_clients("openai")
+        mock_openai_class.return_value.close.assert_called_once()
+        assert cached_clients() == 1
+        assert get_client("openai", "sk-test-key", "gpt-4") is not client
+
+    @patch('api.config.time.monotonic')
+    def test_idle_clients_are_evicted(self, mock_monotonic):
+        """Test clients unused past the idle timeout are dropped"""
+        mock_monotonic.return_value = 1000.0
+        client = get_client("deepseek", "ds-test-key", "deepseek-chat")
+
+        mock_monotonic.return_value = 1010.0
+        assert evict_idle(timeout=60) == 0
+        mock_monotonic.return_value = 1100.0
+        assert evict_idle(timeout=60) == 1
+        assert get_client("deepseek", "ds-test-key", "deepseek-chat") is not client
+
+    def test_evict_client_drops_only_that_client(self):
+        """Test evicting one client's settings leaves the others cached"""
+        client = get_client("deepseek", "old-key", "deepseek-chat")
+        other = get_client("deepseek", "ds-test-key", "deepseek-coder")
+
+        assert evict_client("deepseek", "old-key", "deepseek-chat")
+        assert not evict_client("deepseek", "old-key", "deepseek-chat")
+        assert get_client("deepseek", "ds-test-key", "deepseek-coder") is other
+        assert get_client("deepseek", "old-key", "deepseek-chat") is not client
+
+    def test_evicted_client_closes_after_its_requests(self, local_server):
+        """Test a client evicted mid-reply finishes the reply before it is closed"""
+        client = get_client("deepseek", "ds-test-key", "deepseek-chat", base_url=local_server)
+        client.close = Mock()
+        chunks = client.send_message([Mock(role="user", content="Hi")])
+
+        assert next(chunks) == "Hi"
+        assert client.in_flight == 1
+        evict_clients()
+        client.close.assert_not_called()
+        assert list(chunks) == [" there"]
+        client.close.assert_called_once()
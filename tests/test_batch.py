@@ -0,0 +1,141 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from api.batch import RateLimiter, format_stats, main, parse_item, run_batch
+from api.base import AIClientAdapter
+from api.config import evict_clients
+from api.errors import ErrorChunk
+from api.local_server import LocalServer, LocalServerConfig
+
+PROMPTS = "\n".join([
+    json.dumps({"id": "a", "prompt": "alpha"}),
+    json.dumps({"messages": [{"role": "system", "content": "Be brief"},
+                             {"role": "user", "content": "beta"}]}),
+    "",
+    json.dumps({"id": "c", "prompt": "gamma", "model": "other-model"}),
+]) + "\n"
+
+
+@pytest.fixture
+def server():
+    with LocalServer(LocalServerConfig(tokens_per_second=0, reply_tokens=5)) as server:
+        yield server
+    evict_clients()
+
+
+def run(lines: str, server, **options):
+    output = io.StringIO()
+    stats = asyncio.run(run_batch(io.StringIO(lines), output, "local", "", "", server.base_url, **options))
+    return stats, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+class TestParseItem:
+    def test_prompt_and_messages(self):
+        """Test both input shapes become messages, with ids defaulting to the line number."""
+        item = parse_item('{"id": 7, "prompt": "hi"}', 1)
+        assert item.id == "7"
+        assert [(m.role, m.content) for m in item.messages] == [("user", "hi")]
+
+        item = parse_item('{"messages": [{"role": "user", "content": "yo"}], "model": "m"}', 4)
+        assert item.id == "4" and item.model == "m"
+        assert item.messages[0].content == "yo"
+
+    def test_rejects_malformed_lines(self):
+        """Test lines without a prompt, or that are not objects, raise ValueError."""
+        for line in ('{"id": 1}', '[1, 2]', 'not json'):
+            with pytest.raises(ValueError):
+                parse_item(line, 1)
+
+
+class TestRunBatch:
+    def test_writes_a_record_per_line(self, server):
+        """Test every prompt gets a reply record, with metrics and the model used."""
+        stats, records = run(PROMPTS, server, concurrency=2)
+        by_id = {r["id"]: r for r in records}
+        assert set(by_id) == {"a", "2", "c"}
+        assert by_id["a"]["reply"].startswith("Echo: alpha")
+        assert by_id["2"]["reply"].startswith("Echo: beta")
+        assert by_id["a"]["model"] == "local-echo"
+        assert by_id["c"]["model"] == "other-model"
+        assert all(r["error"] is None and r["metrics"]["first_chunk"] is not None for r in records)
+        assert stats.prompts == 3 and stats.errors == 0
+        assert stats.tokens == sum(r["tokens"] for r in records)
+
+    def test_invalid_line_is_reported_not_fatal(self, server):
+        """Test a malformed line yields an error record and the rest still run."""
+        stats, records = run('{"prompt": "ok"}\nnot json\n', server)
+        assert stats.prompts == 2 and stats.errors == 1
+        error = next(r for r in records if r["error"])
+        assert error["id"] == "2" and "line 2" in error["error"]
+
+    def test_provider_errors_keep_status(self):
+        """Test a failed request records the error text and HTTP status."""
+        with LocalServer(LocalServerConfig(error_rate=1, error_status=503)) as failing:
+            stats, records = run('{"prompt": "x"}\n', failing)
+        evict_clients()
+        assert stats.errors == 1
+        assert records[0]["status"] == 503 and records[0]["error"].startswith("Error:")
+        assert records[0]["reply"] == ""
+
+    def test_error_midway_counts_as_failed(self, server, monkeypatch):
+        """Test a reply that fails after some text is recorded as an error."""
+        class Failing(AIClientAdapter):
+            def send_message(self, messages, stream=True, cancel=None):
+                yield "partial "
+                yield ErrorChunk("server went away", status=502)
+
+            def validate_api_key(self):
+                return True
+
+        monkeypatch.setattr("api.batch.get_client", lambda *args: Failing("", "model"))
+        stats, records = run('{"prompt": "x"}\n', server)
+        assert stats.errors == 1
+        assert records[0]["error"] == "Error: server went away" and records[0]["status"] == 502
+        assert records[0]["reply"] == "partial "
+
+    def test_concurrency_limit(self, server):
+        """Test no more than ``concurrency`` requests are in flight."""
+        server.config.latency = 0.1
+        lines = "".join(json.dumps({"prompt": str(i)}) + "\n" for i in range(6))
+        stats, records = run(lines, server, concurrency=2)
+        assert len(records) == 6
+        # Three rounds of two, each waiting out the latency
+        assert stats.elapsed >= 0.3
+
+    def test_rate_limiter_spaces_starts(self):
+        """Test requests start no faster than the rate."""
+        async def starts():
+            limiter, loop, times = RateLimiter(20), asyncio.get_running_loop(), []
+            for _ in range(4):
+                await limiter.wait()
+                times.append(loop.time())
+            return times
+
+        times = asyncio.run(starts())
+        assert times[-1] - times[0] >= 0.14
+        assert RateLimiter(0).interval == 0
+
+
+class TestMain:
+    def test_files_stats_and_exit_code(self, server, tmp_path):
+        """Test the CLI writes replies and statistics and exits 0 without errors."""
+        source, output, stats = tmp_path / "in.jsonl", tmp_path / "out.jsonl", tmp_path / "stats.json"
+        source.write_text(PROMPTS)
+        code = main([str(source), "-o", str(output), "--provider", "local",
+                     "--base-url", server.base_url, "--stats", str(stats)])
+        assert code == 0
+        assert len(output.read_text().splitlines()) == 3
+        summary = json.loads(stats.read_text())
+        assert summary["prompts"] == 3
+        assert summary["percentiles"]["first_chunk"]["p50"] > 0
+
+    def test_format_stats(self, server):
+        """Test the printed summary has throughput and a percentile row per field."""
+        stats, _ = run(PROMPTS, server)
+        text = format_stats(stats)
+        assert "3 prompts, 0 errors" in text
+        assert "replies/s" in text
+        assert "first_chunk" in text
@@ -0,0 +1,31 @@
+from benchmarks.run import comparable, compare, flatten
+
+
+def results(config=None, **metrics):
+    return {"config": config or {"sse": {"tokens": 10}}, "metrics": metrics}
+
+
+class TestBenchmarkComparison:
+    def test_flatten(self):
+        """Test nested suite results become dotted metric names."""
+        assert flatten({"sqlite": {"get": 1.0, "list": 2.0}}, "storage") == {
+            "storage.sqlite.get": 1.0, "storage.sqlite.list": 2.0,
+        }
+
+    def test_regressions_respect_direction(self):
+        """Test slower timings and lower throughputs are flagged past the tolerance."""
+        baseline = results(**{"a.get": 1.0, "b.chunks_per_sec": 100.0, "c.list": 1.0})
+        current = results(**{"a.get": 1.5, "b.chunks_per_sec": 50.0, "c.list": 1.1, "d.new": 1.0})
+
+        rows = {name: (slowdown, regressed) for name, _, _, slowdown, regressed
+                in compare(current, baseline, tolerance=0.25)}
+
+        assert rows["a.get"] == (0.5, True)
+        assert rows["b.chunks_per_sec"] == (1.0, True)
+        assert rows["c.list"][1] is False
+        assert "d.new" not in rows
+
+    def test_scale_must_match(self):
+        """Test results taken at another scale are not comparable."""
+        assert comparable(results(), results())
+        assert not comparable(results(), results(config={"sse": {"tokens": 20}}))
@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import pytest
+
+from api.base import AIClientAdapter
+from api.cache import CachingClient, ResponseCache, cache_key
+from api.cancel import CancelToken
+from api.config import get_client, evict_clients
+from api.errors import ErrorChunk
+from api.router import RoutedClient
+from data.models import Message
+
+
+class ScriptedClient(AIClientAdapter):
+    """Adapter replying with fixed chunks and counting its requests."""
+
+    def __init__(self, chunks=("Hel", "lo")):
+        super().__init__("key", "model")
+        self.chunks = list(chunks)
+        self.requests = 0
+
+    def send_message(self, messages, stream=True, cancel=None):
+        self.requests += 1
+        for chunk in self.chunks:
+            if cancel is not None and cancel.cancelled:
+                return
+            yield chunk
+
+    def validate_api_key(self):
+        return True
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path)
+    yield cache
+    cache.close()
+
+
+def history(text="Hi"):
+    return [Message(role="system", content="Be brief."), Message(role="user", content=text)]
+
+
+class TestCacheKey:
+    def test_ignores_timestamps_and_outer_whitespace(self):
+        """Test the key depends only on role and stripped content."""
+        a = [Message(role="user", content="Hi", timestamp="2024-01-01T00:00:00")]
+        b = [Message(role="user", content=" Hi\n", timestamp="2025-01-01T00:00:00", token_count=1)]
+        assert cache_key("openai", "gpt-4", a) == cache_key("openai", "gpt-4", b)
+
+    def test_request_differences_change_the_key(self):
+        """Test provider, model, history and parameters all count."""
+        base = cache_key("openai", "gpt-4", history())
+        assert cache_key("deepseek", "gpt-4", history()) != base
+        assert cache_key("openai", "gpt-4o", history()) != base
+        assert cache_key("openai", "gpt-4", history("Hello")) != base
+        assert cache_key("openai", "gpt-4", history(), base_url="http://localhost") != base
+
+
+class TestResponseCache:
+    def test_put_and_get(self, cache):
+        """Test chunks come back as stored and unknown keys miss."""
+        cache.put("k", ["a", "b"])
+        assert cache.get("k") == ["a", "b"]
+        assert cache.get("missing") is None
+
+    def test_entries_expire(self, cache, monkeypatch):
+        """Test entries older than the TTL are dropped."""
+        cache.put("k", ["a"])
+        now = time.time()
+        monkeypatch.setattr("api.cache.time.time", lambda: now + cache.ttl + 1)
+        assert cache.get("k") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_are_evicted(self, tmp_path, monkeypatch):
+        """Test the size limit evicts the entry used longest ago."""
+        clock = iter(range(100))
+        monkeypatch.setattr("api.cache.time.time", lambda: next(clock))
+        cache = ResponseCache(tmp_path, max_bytes=30)
+        try:
+            cache.put("a", ["x" * 8])
+            cache.put("b", ["x" * 8])
+            cache.get("a")
+            cache.put("c", ["x" * 8])
+
+            assert cache.get("b") is None
+            assert cache.get("a") is not None
+            assert cache.get("c") is not None
+            assert cache.size <= 30
+        finally:
+            cache.close()
+
+    def test_persists_across_reopen(self, tmp_path):
+        """Test entries are read back from disk by a new instance."""
+        cache = ResponseCache(tmp_path)
+        cache.put("k", ["a"])
+        cache.close()
+
+        reopened = ResponseCache(tmp_path)
+        try:
+            assert reopened.get("k") == ["a"]
+        finally:
+            reopened.close()
+
+
+class TestCachingClient:
+    def test_hit_replays_without_a_request(self, cache):
+        """Test a repeated request streams the same chunks from the cache."""
+        inner = ScriptedClient()
+        client = CachingClient(inner, "openai", cache)
+
+        assert list(client.send_message(history())) == ["Hel", "lo"]
+        assert list(client.send_message(history())) == ["Hel", "lo"]
+        assert inner.requests == 1
+
+    def test_incomplete_replies_are_not_stored(self, cache):
+        """Test errors, cancelled and abandoned replies go back to the network."""
+        failing = CachingClient(ScriptedClient([ErrorChunk("500", status=500)]), "openai", cache)
+        list(failing.send_message(history()))
+
+        cancel = CancelToken()
+        inner = ScriptedClient()
+        client = CachingClient(inner, "openai", cache)
+        for _ in client.send_message(history(), cancel=cancel):
+            cancel.cancel()
+
+        chunks = client.send_message(history())
+        next(chunks)
+        chunks.close()
+
+        assert len(cache) == 0
+
+    def test_reply_failing_midway_is_not_stored(self, cache):
+        """Test a reply that ends in an error after some text goes back to the network."""
+        inner = ScriptedClient(["partial ", ErrorChunk("connection reset", connection_error=True)])
+        client = CachingClient(inner, "openai", cache)
+
+        list(client.send_message(history()))
+        list(client.send_message(history()))
+
+        assert inner.requests == 2
+        assert len(cache) == 0
+
+    def test_async_hit(self, cache):
+        """Test the async path stores and replays like the sync one."""
+        inner = ScriptedClient()
+        client = CachingClient(inner, "deepseek", cache)
+
+        async def collect():
+            return [chunk async for chunk in client.asend_message(history())]
+
+        assert asyncio.run(collect()) == ["Hel", "lo"]
+        assert asyncio.run(collect()) == ["Hel", "lo"]
+        assert inner.requests == 1
+
+    def test_get_client_wraps_when_given_a_cache(self, cache):
+        """Test get_client returns the shared client wrapped in the cache."""
+        try:
+            plain = get_client("deepseek", "key", "deepseek-chat")
+            cached = get_client("deepseek", "key", "deepseek-chat", cache=cache)
+            assert isinstance(cached, CachingClient)
+            assert cached.client is plain
+        finally:
+            evict_clients()
+
+    def test_failover_reply_is_stored_under_the_backup(self, cache):
+        """Test a reply from the backup route is not served for the primary's requests."""
+        primary = ScriptedClient([ErrorChunk("401", status=401)])
+        backup = ScriptedClient(["backup"])
+        client = RoutedClient([CachingClient(primary, "openai", cache),
+                               CachingClient(backup, "deepseek", cache)], max_retries=0)
+
+        assert list(client.send_message(history())) == ["backup"]
+        assert cache.get(CachingClient(primary, "openai", cache).key(history())) is None
+        assert cache.get(CachingClient(backup, "deepseek", cache).key(history())) == ["backup"]
+
+        primary.chunks = ["primary"]
+        assert list(client.send_message(history())) == ["primary"]
+        assert primary.requests == 2 and backup.requests == 1
@@ -0,0 +1,187 @@
+import copy
+
+from api.context import (
+    ContextWindow, MESSAGE_OVERHEAD, SUMMARY_HEADER, context_window, count_tokens,
+    extractive_summary, message_tokens,
+)
+from data.models import Message, MessagePage
+
+
+def turns(count, words=20):
+    return [Message(role="user" if i % 2 == 0 else "assistant", content=f"turn{i} " + "word " * words)
+            for i in range(count)]
+
+
+def contents(messages):
+    return [(m.role, m.content) for m in messages]
+
+
+def reader(messages, reads, limit=4):
+    """``read_page`` over ``messages``, recording each ``before`` it is called with"""
+    def read_page(before):
+        reads.append(before)
+        end = len(messages) if before is None else before
+        start = max(0, end - limit)
+        return MessagePage(messages=[copy.copy(m) for m in messages[start:end]],
+                           cursor=start if start > 0 else None)
+    return read_page
+
+
+class TestTokenCounting:
+    def test_count_tokens(self):
+        """Test short words, punctuation and CJK characters each count as tokens."""
+        assert count_tokens("") == 0
+        assert count_tokens("Hello, world!") == 6
+        assert count_tokens("internationalization") == 5
+        assert count_tokens("你好世界") == 4
+
+    def test_message_count_is_cached(self):
+        """Test a message's content is counted once and the count stored on it."""
+        message = Message(role="user", content="Hello there")
+        assert message_tokens(message) == count_tokens("Hello there") + MESSAGE_OVERHEAD
+        assert message.token_count == count_tokens("Hello there")
+
+        message.content = "changed"  # a stored count is trusted
+        assert message_tokens(message) == count_tokens("Hello there") + MESSAGE_OVERHEAD
+
+    def test_context_window_lookup(self):
+        """Test models match the longest known prefix, else the default."""
+        assert context_window("gpt-4") == 8192
+        assert context_window("gpt-4-turbo-preview") == 128000
+        assert context_window("deepseek-chat") == 64000
+        assert context_window("some-local-model") == 8192
+
+
+class TestContextWindow:
+    def test_history_that_fits_is_unchanged(self):
+        """Test a short history is sent as is."""
+        messages = turns(4)
+        assert ContextWindow("gpt-4").build(messages) == messages
+
+    def test_keeps_system_and_newest_turns(self):
+        """Test the oldest turns are dropped first and system messages kept."""
+        system = Message(role="system", content="Be brief.")
+        messages = [system] + turns(10)
+        window = ContextWindow("gpt-4", budget=100)
+
+        sent = window.build(messages)
+
+        assert sent[0] is system
+        assert sent[-1] is messages[-1]
+        assert sent[1:] == messages[-len(sent) + 1:]
+        assert sum(message_tokens(m) for m in sent) <= 100
+
+    def test_newest_turn_always_sent(self):
+        """Test a single turn larger than the budget still goes out."""
+        messages = turns(3, words=400)
+        assert ContextWindow("gpt-4", budget=50).build(messages) == messages[-1:]
+
+    def test_dropped_turns_are_summarized(self):
+        """Test dropped turns are replaced by one summary system message."""
+        messages = turns(10)
+        sent = ContextWindow("gpt-4", budget=200, summarize=extractive_summary).build(messages)
+
+        summary = sent[0]
+        assert summary.role == "system"
+        assert summary.content.startswith(SUMMARY_HEADER)
+        newest_dropped = messages[len(messages) - len(sent)]
+        assert newest_dropped.content.split()[0] in summary.content
+        assert sent[-1] is messages[-1]
+        assert sum(message_tokens(m) for m in sent) <= 200
+
+    def test_summary_rolls_forward(self):
+        """Test each dropped turn is summarized once as the conversation grows."""
+        calls = []
+
+        def summarize(dropped, previous):
+            calls.append([m.content.split()[0] for m in dropped])
+            return extractive_summary(dropped, previous)
+
+        messages = turns(10)
+        window = ContextWindow("gpt-4", budget=200, summarize=summarize)
+        window.build(messages)
+        window.build(messages)
+        messages.extend(turns(12)[10:])
+        window.build(messages)
+
+        summarized = [name for call in calls for name in call]
+        assert len(summarized) == len(set(summarized))
+        assert summarized == [f"turn{i}" for i in range(len(summarized))]
+        assert len(calls) == 2
+
+    def test_summary_rolls_forward_over_reread_history(self):
+        """Test a history re-read from storage, as equal copies, is not summarized again."""
+        calls = []
+
+        def summarize(dropped, previous):
+            calls.append(len(dropped))
+            return extractive_summary(dropped, previous)
+
+        messages = turns(10)
+        window = ContextWindow("gpt-4", budget=200, summarize=summarize)
+        first = window.build(messages)
+        again = window.build([copy.copy(m) for m in messages])
+
+        assert len(calls) == 1
+        assert again[0].content == first[0].content
+
+    def test_rewritten_history_restarts_summary(self):
+        """Test a different history is summarized from scratch."""
+        window = ContextWindow("gpt-4", budget=200, summarize=extractive_summary)
+        window.build(turns(10))
+
+        other = [Message(role="user", content="other " + "word " * 20) for _ in range(10)]
+        summary = window.build(other)[0]
+
+        assert "turn0" not in summary.content
+        assert "user: other word" in summary.content
+
+
+class TestPagedContextWindow:
+    def test_short_history_is_read_whole(self):
+        """Test a history that fits is sent as is from its pages."""
+        messages = turns(6)
+        reads = []
+        assert ContextWindow("gpt-4").build_paged(reader(messages, reads)) == messages
+        assert reads == [None, 2]
+
+    def test_matches_build(self):
+        """Test paging sends the same messages as building from the whole history."""
+        messages = turns(40)
+        sent = ContextWindow("gpt-4", budget=200, summarize=extractive_summary).build(messages)
+        paged = ContextWindow("gpt-4", budget=200, summarize=extractive_summary).build_paged(
+            reader(messages, []))
+        assert contents(paged) == contents(sent)
+
+    def test_reads_only_what_the_budget_needs(self):
+        """Test without a summary only the pages that fill the budget are read."""
+        messages = turns(400)
+        reads = []
+        sent = ContextWindow("gpt-4", budget=200).build_paged(reader(messages, reads))
+        assert sent == messages[-len(sent):]
+        assert len(reads) <= len(sent) // 4 + 2
+
+    def test_summary_reads_only_newly_dropped_turns(self):
+        """Test a later reply reads back only the turns dropped since the last one."""
+        calls = []
+
+        def summarize(dropped, previous):
+            calls.append([m.content.split()[0] for m in dropped])
+            return extractive_summary(dropped, previous)
+
+        messages = turns(40)
+        window = ContextWindow("gpt-4", budget=200, summarize=summarize)
+        window.build_paged(reader(messages, []))
+        assert calls[0][0] == "turn0"
+
+        messages.extend(turns(44)[40:])
+        reads = []
+        sent = window.build_paged(reader(messages, reads))
+
+        summarized = [name for call in calls for name in call]
+        assert summarized == [f"turn{i}" for i in range(len(summarized))]
+        assert len(calls) == 2 and len(calls[1]) == 4
+        assert min(r for r in reads if r is not None) >= 40 - 8
+        assert sent[-1] == messages[-1]
+        whole = ContextWindow("gpt-4", budget=200, summarize=extractive_summary).build(messages)
+        assert contents(sent) == contents(whole)
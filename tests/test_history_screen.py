@@ -9,7 +9,7 @@ from unittest.mock import Mock, MagicMock, patch
 from kivymd.app import MDApp
 from kivy.lang import Builder
 from ui.history_screen import HistoryDrawer
-from data.models import Conversation, Message
+from data.models import Conversation, ConversationSummary
 from data.storage import StorageManager
 
 
@@ -34,9 +34,14 @@ class TestHistoryDrawer:
     @pytest.fixture
     def mock_storage(self):
         """Create a mock storage manager"""
-        with patch('ui.history_screen.StorageManager') as mock:
+        with patch('ui.history_screen.get_ui_storage') as mock:
             storage = Mock()
-            storage.get_all_conversations.return_value = []
+            storage.list_conversations.return_value = []
+            # Deliver pages through the callback like AsyncStorage does
+            storage.list_conversations.side_effect = (
+                lambda offset=0, limit=50, callback=None:
+                    callback(storage.list_conversations.return_value)
+            )
             storage.get_settings.return_value = Mock(current_conversation_id="")
             mock.return_value = storage
             yield storage
@@ -51,32 +56,41 @@ class TestHistoryDrawer:
     def test_history_drawer_initialization(self, kivy_app, mock_storage, mock_main_screen):
         """Test that HistoryDrawer initializes correctly"""
         drawer = HistoryDrawer(mock_main_screen)
+        # The first page is requested on the next Clock tick
+        drawer._load_conversations()
         assert drawer.main_screen == mock_main_screen
         assert drawer.storage == mock_storage
-        mock_storage.get_all_conversations.assert_called_once()
+        mock_storage.list_conversations.assert_called_once()
 
     def test_load_conversations_empty(self, kivy_app, mock_storage, mock_main_screen):
         """Test loading conversations when none exist"""
-        mock_storage.get_all_conversations.return_value = []
+        mock_storage.list_conversations.return_value = []
         drawer = HistoryDrawer(mock_main_screen)
         # Should not raise any errors and conversation list should be empty
         assert len(drawer.ids.conversation_list.children) == 0
 
     def test_load_conversations_with_data(self, kivy_app, mock_storage, mock_main_screen):
         """Test loading conversations with existing data"""
-        conv1 = Conversation(
+        summary1 = ConversationSummary(
             id="conv1",
             title="Test Chat 1",
-            messages=[Message(role="user", content="Hello")]
+            created_at="2024-01-01T12:00:00",
+            updated_at="2024-01-01T12:00:00",
+            message_count=1,
+            preview="Hello"
         )
-        conv2 = Conversation(
+        summary2 = ConversationSummary(
             id="conv2",
             title="Test Chat 2",
-            messages=[Message(role="assistant", content="Hi there")]
+            created_at="2024-01-01T12:00:00",
+            updated_at="2024-01-01T12:00:00",
+            message_count=1,
+            preview="Hi there"
         )
-        mock_storage.get_all_conversations.return_value = [conv1, conv2]
+        mock_storage.list_conversations.return_value = [summary1, summary2]
 
         drawer = HistoryDrawer(mock_main_screen)
+        drawer._load_conversations()
 
         # Should have 2 items in the conversation list
         assert len(drawer.ids.conversation_list.children) == 2
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from api.cancel import CancelToken
+from api.config import get_client, evict_clients
+from api.deepseek_client import DeepSeekClient
+from api.local_client import LocalClient
+from api.local_server import LocalServer, LocalServerConfig, reply_tokens, stop_local_server
+from api.openai_client import OpenAIClient
+from data.models import Message
+
+MESSAGES = [Message(role="user", content="ping pong")]
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**config):
+        server = LocalServer(LocalServerConfig(**config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+class TestLocalServer:
+    def test_streams_openai_chunks(self, serve):
+        """Test the reply streams as SSE chunks over chunked transfer encoding."""
+        server = serve(tokens_per_second=0, reply_tokens=10, chunk_size=3)
+        response = requests.post(f"{server.base_url}/chat/completions", stream=True,
+                                 json={"model": "m", "messages": [{"role": "user", "content": "hi"}],
+                                       "stream": True})
+        body = response.raw.read()
+
+        assert response.headers["Transfer-Encoding"] == "chunked"
+        assert body.count(b"data: ") == 1 + 4 + 1 + 1  # role, 10 tokens in 3s, stop, [DONE]
+        assert body.endswith(b"data: [DONE]\n\n")
+
+    def test_adapters_stream_from_it(self, serve):
+        """Test both HTTP adapters receive the same reply through base_url."""
+        server = serve(tokens_per_second=0, reply_tokens=12, chunk_size=2)
+        expected = "".join(reply_tokens([{"role": "user", "content": "ping pong"}], 12))
+
+        deepseek = DeepSeekClient("key", "local-echo", base_url=server.base_url)
+        openai = OpenAIClient("key", "local-echo", base_url=server.base_url)
+
+        assert "".join(deepseek.send_message(MESSAGES)) == expected
+        assert "".join(openai.send_message(MESSAGES)) == expected
+        assert "".join(deepseek.send_message(MESSAGES, stream=False)) == expected
+        assert deepseek.validate_api_key()
+
+    def test_token_rate(self, serve):
+        """Test chunks are paced at the configured token rate."""
+        server = serve(tokens_per_second=100, reply_tokens=20)
+        client = DeepSeekClient("key", "local-echo", base_url=server.base_url)
+
+        start = time.monotonic()
+        chunks = list(client.send_message(MESSAGES))
+        elapsed = time.monotonic() - start
+
+        assert len(chunks) == 20
+        assert 0.18 <= elapsed < 2
+
+    def test_errors(self, serve):
+        """Test a simulated failure reaches the adapter as an HTTP error."""
+        server = serve(error_rate=1.0, error_status=503)
+        client = DeepSeekClient("key", "local-echo", base_url=server.base_url)
+        reply = "".join(client.send_message(MESSAGES))
+        assert reply.startswith("Error:") and "503" in reply
+
+    def test_stall_can_be_cancelled(self, serve):
+        """Test a stalled stream is cut off by cancelling the reply."""
+        server = serve(tokens_per_second=0, stall_rate=1.0, stall_time=30)
+        client = DeepSeekClient("key", "local-echo", base_url=server.base_url)
+        cancel = CancelToken()
+        threading.Timer(0.2, cancel.cancel).start()
+
+        start = time.monotonic()
+        assert list(client.send_message(MESSAGES, cancel=cancel)) == []
+        assert time.monotonic() - start < 5
+
+    def test_seed_repeats_a_run(self, serve):
+        """Test the same seed gives the same errors request by request."""
+        outcomes = []
+        for _ in range(2):
+            server = serve(error_rate=0.5, seed=7, tokens_per_second=0, reply_tokens=2)
+            client = DeepSeekClient("key", "local-echo", base_url=server.base_url)
+            outcomes.append(["".join(client.send_message(MESSAGES)).startswith("Error")
+                             for _ in range(8)])
+        assert outcomes[0] == outcomes[1]
+        assert any(outcomes[0]) and not all(outcomes[0])
+
+
+class TestLocalProvider:
+    def test_registered_and_keyless(self):
+        """Test the local provider needs no key and starts the bundled server."""
+        try:
+            client = get_client("local", "", "local-echo")
+            assert isinstance(client, LocalClient)
+            assert not client.requires_api_key
+            assert client.base_url.startswith("http://127.0.0.1:")
+
+            async def collect():
+                return "".join([c async for c in client.asend_message(MESSAGES)])
+
+            assert asyncio.run(collect()).startswith("Echo: ping pong |")
+        finally:
+            evict_clients()
+            stop_local_server()
@@ -0,0 +1,155 @@
+# tests/test_main_screen.py
+"""Tests for MainScreen replies streaming through the scheduler"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from kivy.clock import Clock
+from kivy.lang import Builder
+from kivy.properties import StringProperty
+from kivy.uix.label import Label
+from kivymd.app import MDApp
+
+from api.config import evict_clients
+from api.local_server import LocalServer, LocalServerConfig
+from data.async_storage import AsyncStorage
+from data.models import Conversation, Settings
+from data.service import StorageService
+from data.sqlite_storage import SQLiteStorageManager
+from ui.storage import clock_dispatch
+
+
+class ScreenTestApp(MDApp):
+    def build(self):
+        return Builder.load_string('MDBoxLayout:')
+
+
+class Row(Label):
+    """Plain stand-in for ChatBubble rows; the tests only read the list's data"""
+    role = StringProperty()
+    content = StringProperty()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    ScreenTestApp()
+    backend = SQLiteStorageManager(tmp_path)
+    conversation = Conversation(title="Chat")
+    backend.save_conversation(conversation)
+    backend.save_settings(Settings(api_provider="local", model="local-echo",
+                                   current_conversation_id=conversation.id))
+    storage = AsyncStorage(StorageService(backend, flush_interval=0.05), clock_dispatch)
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def server():
+    # Slow enough that a reply is still streaming after a few ticks
+    with LocalServer(LocalServerConfig(tokens_per_second=40, reply_tokens=40)) as server, \
+            patch("api.local_server.get_local_server", return_value=server):
+        yield server
+    evict_clients()
+
+
+async def tick(times=5):
+    for _ in range(times):
+        await asyncio.sleep(0.02)
+        Clock.tick()
+
+
+def screen_run(storage, test):
+    """Run ``test(screen)`` on an event loop with the Clock ticking alongside."""
+    from ui.main_screen import MainScreen
+
+    async def main():
+        with patch("ui.main_screen.get_ui_storage", return_value=storage):
+            screen = MainScreen()
+            screen.ids.message_list.viewclass = Row
+            await tick()
+            await test(screen)
+            screen.stop_all()
+            await tick()
+
+    asyncio.run(main())
+
+
+def send(screen, text):
+    screen.ids.message_input.text = text
+    screen.send_message()
+
+
+async def wait_idle(screen, limit=200):
+    for _ in range(limit):
+        if not screen.scheduler.active:
+            break
+        await tick(1)
+    await tick()
+
+
+def shown(screen):
+    return [(d['role'], d['content']) for d in screen.ids.message_list.data]
+
+
+def stored(storage, conversation_id):
+    return [(m.role, m.content) for m in storage.get_conversation(conversation_id).result().messages]
+
+
+class TestMainScreen:
+    def test_reply_is_shown_and_saved(self, storage, server):
+        """Test a reply streams into a bubble and is stored when it ends."""
+        async def test(screen):
+            send(screen, "hello")
+            await tick()
+            assert screen.is_loading
+            await wait_idle(screen)
+            assert not screen.is_loading
+            conversation_id = screen.current_conversation.id
+            assert shown(screen)[-1][1].startswith("Echo: hello")
+            assert stored(storage, conversation_id) == shown(screen)
+        screen_run(storage, test)
+
+    def test_stop_keeps_partial_reply(self, storage, server):
+        """Test stopping a reply keeps and stores the text received so far."""
+        async def test(screen):
+            send(screen, "hello")
+            await tick(10)
+            screen.stop_generation()
+            await wait_idle(screen)
+            role, content = stored(storage, screen.current_conversation.id)[-1]
+            assert role == "assistant" and content.startswith("Echo: hello")
+            assert len(content.split()) < 40
+            assert shown(screen)[-1] == (role, content)
+        screen_run(storage, test)
+
+    def test_clear_while_streaming(self, storage, server):
+        """Test clearing a chat drops the streaming reply from screen and storage."""
+        async def test(screen):
+            send(screen, "hello")
+            await tick(10)
+            screen.clear_chat()
+            await wait_idle(screen)
+            assert shown(screen) == []
+            assert stored(storage, screen.current_conversation.id) == []
+        screen_run(storage, test)
+
+    def test_switching_conversations_while_streaming(self, storage, server):
+        """Test a reply keeps streaming into its own conversation while another is open."""
+        async def test(screen):
+            send(screen, "alpha")
+            first = screen.current_conversation.id
+            await tick(5)
+            screen._open_conversation(None)
+            await tick()
+            assert not screen.is_loading
+            assert shown(screen) == []
+            send(screen, "beta")
+            await wait_idle(screen)
+            assert [c for _, c in shown(screen)][0] == "beta"
+            assert all("alpha" not in c for _, c in shown(screen))
+            assert stored(storage, first)[-1][1].startswith("Echo: alpha")
+
+            storage.get_conversation_summary(first, callback=screen._open_conversation)
+            await tick()
+            assert shown(screen) == stored(storage, first)
+        screen_run(storage, test)
@@ -0,0 +1,164 @@
+import pytest
+
+from ui.incremental_markdown import IncrementalMarkdownRenderer
+from ui.kivy_markdown import markdown_to_markup
+from ui.render_cache import RenderCache
+
+DOCUMENTS = [
+    "First paragraph.\n\nSecond paragraph with **bold** and *italic*.\n\nThird.",
+    "# Heading\nIntro line\n\n- one\n- two\n\n- loose item\n\n1. first\n\n2. second\n\nAfter the list.",
+    "Code:\n\n```\ndef f():\n\n    return 1\n```\n\nDone with `inline` code.",
+    "\n\nLeading blanks\n\n\n\nand extra blank lines\n\n",
+    "Text\n\n    indented code\n\n    more code\n\nEnd [link](http://example.com).",
+    "```\nouter\n~~~\n\nstill code\n```\n\nAfter the fence.",
+    "````md\n```\n\nnested\n```\n````\n\nDone.",
+]
+
+
+def full_render(text):
+    return markdown_to_markup(text)
+
+
+class TestMarkdownToMarkup:
+    def test_headings(self):
+        """Test headings are bold, with larger text for the top levels."""
+        assert markdown_to_markup("# Title") == "[b][size=22sp]Title[/size][/b]"
+        assert markdown_to_markup("#### Minor ##") == "[b]Minor[/b]"
+
+    def test_emphasis(self):
+        """Test bold, italic, nested and strikethrough spans."""
+        assert markdown_to_markup("**bold *nested* bold**") == "[b]bold [i]nested[/i] bold[/b]"
+        assert markdown_to_markup("__b__ _i_ ~~s~~") == "[b]b[/b] [i]i[/i] [s]s[/s]"
+        assert markdown_to_markup("***both***") == "[b][i]both[/i][/b]"
+
+    def test_unmatched_delimiters_stay_literal(self):
+        """Test stray emphasis markers and intraword underscores are kept as text."""
+        assert markdown_to_markup("a * b * c") == "a * b * c"
+        assert markdown_to_markup("**unclosed") == "**unclosed"
+        assert markdown_to_markup("snake_case_name") == "snake_case_name"
+
+    def test_markup_characters_are_escaped(self):
+        """Test text cannot inject Kivy markup tags."""
+        assert markdown_to_markup("a [b] & c") == "a &bl;b&br; &amp; c"
+        assert markdown_to_markup(r"\*literal\*") == "*literal*"
+
+    def test_inline_code(self):
+        """Test code spans are monospaced and not parsed for emphasis."""
+        assert markdown_to_markup("`x[0] * *y*`") == (
+            "[color=#2d2d2d][font=RobotoMono]x&bl;0&br; * *y*[/font][/color]"
+        )
+
+    def test_links(self):
+        """Test inline links and autolinks become refs."""
+        link = "[ref=http://a.io][color=#2196F3][u]{}[/u][/color][/ref]"
+        assert markdown_to_markup("[**site**](http://a.io)") == link.format("[b]site[/b]")
+        assert markdown_to_markup("<http://a.io>") == link.format("http://a.io")
+
+    def test_lists(self):
+        """Test bullets, numbering, nesting and lazy continuation lines."""
+        text = "- a\n- b\n  - nested\ncontinued\n\n3. three\n4. four"
+        assert markdown_to_markup(text) == "• a\n• b\n  • nested\ncontinued\n3. three\n4. four"
+
+    def test_fenced_code_keeps_blank_lines(self):
+        """Test fenced code is kept verbatim, including blank lines and markers."""
+        text = "```python\nx = **1**\n\n\ny\n```\nafter"
+        assert markdown_to_markup(text) == (
+            "[font=RobotoMono][color=#2d2d2d]x = **1**\n\n\ny[/color][/font]\nafter"
+        )
+
+    def test_quotes_and_rules(self):
+        """Test block quotes are rendered recursively and rules become a line."""
+        assert markdown_to_markup("> **q**\n> more\n\n---") == (
+            "[color=#666666][b]q[/b]\nmore[/color]\n" + "─" * 20
+        )
+
+
+class TestIncrementalMarkdownRenderer:
+    @pytest.mark.parametrize("document", DOCUMENTS)
+    def test_matches_full_render_while_streaming(self, document):
+        """Test every streamed prefix renders like a one-shot conversion."""
+        renderer = IncrementalMarkdownRenderer(full_render)
+        for end in range(1, len(document) + 1):
+            assert renderer.render(document[:end]) == full_render(document[:end])
+
+    def test_finished_blocks_render_once(self):
+        """Test streaming renders each finished block a single time."""
+        rendered = []
+
+        def render_block(block):
+            rendered.append(block)
+            return full_render(block)
+
+        renderer = IncrementalMarkdownRenderer(render_block)
+        text = ""
+        for i in range(20):
+            text += f"Paragraph {i}.\n\n"
+            renderer.render(text)
+        renderer.render(text + "Tail")
+
+        finished = [b for b in rendered if b.startswith("Paragraph 0")]
+        assert len(finished) == 2
+        assert renderer.render(text + "Tail").endswith("Tail")
+
+    def test_unrelated_text_resets(self):
+        """Test text that does not extend the previous one is rendered from scratch."""
+        renderer = IncrementalMarkdownRenderer(full_render)
+        renderer.render("Old paragraph.\n\nMore old text\n")
+
+        assert renderer.render("New text") == full_render("New text")
+
+
+class TestRenderCache:
+    def test_hit_and_miss_counters(self):
+        """Test lookups are counted as hits or misses."""
+        cache = RenderCache()
+        assert cache.get("**hi**") is None
+        cache.put("**hi**", "[b]hi[/b]")
+
+        assert cache.get("**hi**") == "[b]hi[/b]"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used_entry(self):
+        """Test the entry limit evicts the least recently used source."""
+        cache = RenderCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+        assert cache.evictions == 1
+
+    def test_evicts_by_size(self):
+        """Test the character budget bounds the cache."""
+        cache = RenderCache(max_chars=10)
+        cache.put("a", "x" * 6)
+        cache.put("b", "y" * 6)
+
+        assert len(cache) == 1
+        assert cache.size == 6
+        cache.put("huge", "z" * 11)
+        assert cache.get("huge") is None
+
+    def test_persistence_round_trip(self, tmp_path):
+        """Test saved entries are available after loading into a new cache."""
+        cache = RenderCache()
+        cache.put("# Title", "Title")
+        cache.save(tmp_path / "render_cache.json")
+
+        restored = RenderCache()
+        restored.load(tmp_path / "render_cache.json")
+
+        assert restored.get("# Title") == "Title"
+
+    def test_load_ignores_stale_or_missing_files(self, tmp_path):
+        """Test files from another render version or missing files are ignored."""
+        path = tmp_path / "render_cache.json"
+        path.write_text('{"version": "old", "entries": [["k", "v"]]}', encoding="utf-8")
+        cache = RenderCache()
+        cache.load(path)
+        cache.load(tmp_path / "missing.json")
+
+        assert len(cache) == 0
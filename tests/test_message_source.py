@@ -0,0 +1,86 @@
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+
+from data.models import Conversation, Message
+from data.sqlite_storage import SQLiteStorageManager
+from data.service import StorageService
+from data.async_storage import AsyncStorage
+from ui.message_source import MessageSource
+
+
+@pytest.fixture
+def storage():
+    """Create an async SQLite storage in a temporary directory."""
+    temp_dir = tempfile.mkdtemp()
+    storage = AsyncStorage(StorageService(SQLiteStorageManager(Path(temp_dir))))
+    yield storage
+    storage.close()
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def long_conversation(storage):
+    """Save a conversation with 25 numbered messages."""
+    conv = Conversation(title="Long Chat")
+    conv.messages.extend(Message(role="user", content=str(i)) for i in range(25))
+    storage.save_conversation(conv).result()
+    return conv
+
+
+class TestMessageSource:
+    def test_load_latest_reads_one_page(self, storage, long_conversation):
+        """Test opening a conversation loads only the newest page."""
+        source = MessageSource(storage, long_conversation.id, page_size=10)
+        source.load_latest().result()
+
+        assert [m.content for m in source.messages] == [str(i) for i in range(15, 25)]
+        assert source.has_older
+
+    def test_load_older_prepends_pages(self, storage, long_conversation):
+        """Test older pages are prepended until the start is reached."""
+        source = MessageSource(storage, long_conversation.id, page_size=10)
+        source.load_latest().result()
+
+        received = []
+        source.load_older(callback=received.append).result()
+        assert [m.content for m in received[0]] == [str(i) for i in range(5, 15)]
+        source.load_older().result()
+
+        assert [m.content for m in source.messages] == [str(i) for i in range(25)]
+        assert not source.has_older
+        assert source.load_older() is None
+
+    def test_clear(self, storage, long_conversation):
+        """Test clearing keeps the loaded list object but empties it."""
+        source = MessageSource(storage, long_conversation.id, page_size=10)
+        messages = source.messages
+        source.load_latest().result()
+
+        source.clear()
+
+        assert messages == []
+        assert not source.has_older
+
+    def test_messages_sent_while_loading_stay_last(self, storage, long_conversation):
+        """Test a message added before the first page arrives stays after it."""
+        source = MessageSource(storage, long_conversation.id, page_size=5)
+        future = source.load_latest()
+        source.messages.append(Message(role="user", content="new"))
+        future.result()
+
+        assert [m.content for m in source.messages] == ["20", "21", "22", "23", "24", "new"]
+
+    def test_page_loaded_before_clear_is_dropped(self, storage, long_conversation):
+        """Test a page that arrives after clear() is not merged."""
+        captured = []
+        source = MessageSource(storage, long_conversation.id, page_size=5)
+        source.storage = type("Deferred", (), {
+            "get_messages": lambda self, *args, callback=None, **kwargs: captured.append(callback)
+        })()
+        source.load_latest()
+        source.clear()
+        captured[0](storage.get_messages(long_conversation.id, limit=5).result())
+
+        assert source.messages == []
@@ -0,0 +1,110 @@
+import pytest
+
+from api.deepseek_client import DeepSeekClient
+from api.local_server import LocalServer, LocalServerConfig
+from api.metrics import StreamTimer, aggregate, current_timer, mark_connected, percentile
+from data.models import Message, ReplyMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([5], 95) == 5
+
+
+class TestStreamTimer:
+    def test_reply_metrics(self):
+        """Test timings, gaps, counts and token rate of a reply."""
+        clock = FakeClock()
+        timer = StreamTimer("deepseek", "deepseek-chat", clock=clock)
+        clock.now = 0.1
+        timer.connected()
+        for at, text in [(0.3, "Hel"), (0.4, "lo"), (0.7, " world")]:
+            clock.now = at
+            timer.chunk(text)
+        clock.now = 0.8
+
+        metrics = timer.finish(tokens=4)
+
+        assert metrics.connect == 0.1
+        assert metrics.first_chunk == 0.3
+        assert metrics.total == 0.8
+        assert (metrics.chunks, metrics.chars) == (3, 11)
+        assert metrics.tokens_per_sec == pytest.approx(4 / 0.4)
+        assert metrics.gap_p50 == pytest.approx(0.1)
+        assert metrics.gap_max == pytest.approx(0.3)
+
+    def test_ui_lag(self):
+        """Test lag runs from each chunk's arrival to the render that showed it."""
+        clock = FakeClock()
+        timer = StreamTimer(clock=clock)
+        clock.now = 1.0
+        timer.chunk("a")
+        clock.now = 1.04
+        timer.chunk("b")
+        clock.now = 1.05
+        timer.rendered()
+        clock.now = 1.06
+        timer.chunk("c")
+        clock.now = 1.1
+        timer.rendered()
+
+        metrics = timer.finish()
+
+        assert metrics.ui_lag_max == pytest.approx(0.05)
+        assert metrics.ui_lag_p50 == pytest.approx(0.04)
+        assert metrics.tokens_per_sec is None
+
+    def test_hidden_text_has_no_ui_lag(self):
+        """Test chunks taken while the conversation is off screen are left out of the lag."""
+        clock = FakeClock()
+        timer = StreamTimer(clock=clock)
+        clock.now = 1.0
+        timer.chunk("a")
+        clock.now = 3.0
+        timer.hidden()
+        timer.chunk("b")
+        clock.now = 3.02
+        timer.rendered()
+
+        assert timer.finish().ui_lag_max == pytest.approx(0.02)
+
+    def test_empty_reply(self):
+        """Test a reply without chunks has no chunk timings."""
+        metrics = StreamTimer().finish(tokens=0)
+        assert metrics.first_chunk is None
+        assert metrics.gap_max is None and metrics.ui_lag_max is None
+
+    def test_mark_connected_outside_a_reply(self):
+        """Test adapters may report a connection with no timer set."""
+        mark_connected()
+
+    def test_adapter_reports_connect(self):
+        """Test an adapter marks the response headers on the current timer."""
+        timer = StreamTimer()
+        with LocalServer(LocalServerConfig(tokens_per_second=0, reply_tokens=3)) as server:
+            client = DeepSeekClient("key", "local-echo", base_url=server.base_url)
+            reset = current_timer.set(timer)
+            try:
+                list(client.send_message([Message(role="user", content="hi")]))
+            finally:
+                current_timer.reset(reset)
+        assert timer.finish().connect is not None
+
+
+def test_aggregate():
+    """Test p50/p95 across replies skip replies missing a field."""
+    metrics = [ReplyMetrics(first_chunk=v / 10) for v in range(1, 11)] + [ReplyMetrics()]
+    stats = aggregate(metrics, ["first_chunk", "connect"])
+    assert stats["first_chunk"] == (0.5, 1.0, 10)
+    assert stats["connect"] == (None, None, 0)
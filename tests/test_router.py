@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+from api.cancel import CancelToken
+from api.deepseek_client import DeepSeekClient
+from api.errors import ErrorChunk, is_error
+from api.local_client import LocalClient
+from api.local_server import LocalServer, LocalServerConfig
+from api.router import RoutedClient
+from data.models import Message
+
+MESSAGES = [Message(role="user", content="ping")]
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**config):
+        config.setdefault("tokens_per_second", 0)
+        server = LocalServer(LocalServerConfig(**config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def router(*servers, **options):
+    options.setdefault("backoff", 0.01)
+    return RoutedClient([LocalClient(base_url=s.base_url) for s in servers], **options)
+
+
+def collect(client, cancel=None):
+    async def run():
+        return [chunk async for chunk in client.asend_message(MESSAGES, cancel=cancel)]
+    return asyncio.run(run())
+
+
+class TestErrorChunk:
+    def test_text_and_classification(self):
+        """Test an ErrorChunk reads like the old error strings and knows if a retry can help."""
+        assert ErrorChunk("boom") == "Error: boom"
+        assert is_error(ErrorChunk("boom"))
+        assert not is_error("Error: a reply that happens to start like one")
+        assert not is_error("Hello")
+        assert ErrorChunk("x", status=503).retryable
+        assert ErrorChunk("x", connection_error=True).retryable
+        assert not ErrorChunk("x", status=401).retryable
+        assert not ErrorChunk("x").retryable
+
+    def test_adapter_reports_status(self, serve):
+        """Test an HTTP error from an adapter carries its status code."""
+        server = serve(error_rate=1, error_status=503)
+        chunks = list(LocalClient(base_url=server.base_url).send_message(MESSAGES))
+        assert len(chunks) == 1
+        assert isinstance(chunks[0], ErrorChunk)
+        assert chunks[0].status == 503 and chunks[0].retryable
+
+    def test_adapter_reports_connection_error(self, serve):
+        """Test a refused connection counts as retryable."""
+        server = serve()
+        url = server.base_url
+        server.stop()
+        chunks = list(DeepSeekClient("key", base_url=url).send_message(MESSAGES))
+        assert chunks[0].retryable and chunks[0].status is None
+
+
+class TestRoutedClient:
+    def test_primary_answers(self, serve):
+        """Test a healthy primary is used and the backup is never asked."""
+        primary, backup = serve(reply_tokens=4), serve(reply_tokens=2)
+        assert "".join(collect(router(primary, backup))).split() == ["Echo:", "ping", "|", "the"]
+        assert backup.requests == 0
+
+    def test_hedges_slow_first_token(self, serve):
+        """Test a backup request goes out when the first chunk is late, and wins the race."""
+        primary, backup = serve(latency=5, reply_tokens=4), serve(reply_tokens=2)
+        start = time.perf_counter()
+        chunks = collect(router(primary, backup, hedge_after=0.1))
+        assert "".join(chunks).split() == ["Echo:", "ping"]
+        assert time.perf_counter() - start < 2
+        assert primary.requests == backup.requests == 1
+
+    def test_retries_server_errors(self, serve):
+        """Test a 5xx is retried on the same route before failing over."""
+        primary, backup = serve(error_rate=1, error_status=502), serve(reply_tokens=2)
+        chunks = collect(router(primary, backup, max_retries=2))
+        assert "".join(chunks).split() == ["Echo:", "ping"]
+        assert primary.requests == 3
+        assert backup.requests == 1
+
+    def test_fails_over_without_retrying_client_errors(self, serve):
+        """Test a 4xx moves straight to the next route."""
+        primary, backup = serve(error_rate=1, error_status=401), serve(reply_tokens=2)
+        chunks = collect(router(primary, backup))
+        assert "".join(chunks).split() == ["Echo:", "ping"]
+        assert primary.requests == 1
+
+    def test_all_routes_fail(self, serve):
+        """Test the last error is passed on, once, when every route fails."""
+        primary, backup = serve(error_rate=1, error_status=401), serve(error_rate=1, error_status=403)
+        chunks = collect(router(primary, backup))
+        assert len(chunks) == 1
+        assert chunks[0].status == 403
+
+    def test_cancel_stops_every_attempt(self, serve):
+        """Test cancelling mid-hedge ends the reply quietly and stops both requests."""
+        primary, backup = serve(latency=5), serve(latency=5)
+        cancel = CancelToken()
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.3, cancel.cancel)
+            return [c async for c in router(primary, backup, hedge_after=0.1)
+                    .asend_message(MESSAGES, cancel=cancel)]
+
+        start = time.perf_counter()
+        assert asyncio.run(run()) == []
+        assert time.perf_counter() - start < 2
+        assert primary.requests == backup.requests == 1
+
+    def test_cancelled_before_start_sends_nothing(self, serve):
+        """Test a token cancelled before the call ends the reply without a request."""
+        primary = serve()
+        cancel = CancelToken()
+        cancel.cancel()
+        assert collect(router(primary), cancel=cancel) == []
+        assert primary.requests == 0
+
+    def test_sync_retry_and_failover(self, serve):
+        """Test send_message retries and fails over the same way, without hedging."""
+        primary, backup = serve(error_rate=1, error_status=500), serve(reply_tokens=2)
+        chunks = list(router(primary, backup, max_retries=1).send_message(MESSAGES))
+        assert "".join(chunks).split() == ["Echo:", "ping"]
+        assert primary.requests == 2
+
+    def test_retry_delay_backs_off(self):
+        """Test each retry waits twice as long as the one before."""
+        client = RoutedClient([LocalClient()], backoff=0.5)
+        assert [client.retry_delay(n) for n in (1, 2, 3)] == [0.5, 1.0, 2.0]
@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from ui.scheduler import RequestScheduler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Recorder:
+    """Work factory that logs starts and ends and finishes when told to."""
+
+    def __init__(self):
+        self.log = []
+        self.release = {}
+
+    def work(self, name):
+        async def go(cancel):
+            self.log.append(("start", name))
+            event = self.release[name] = asyncio.Event()
+            cancel.on_cancel(event.set)
+            await event.wait()
+            self.log.append(("cancelled" if cancel.cancelled else "end", name))
+        return go
+
+    def finish(self, name):
+        self.release[name].set()
+
+    def started(self):
+        return [name for kind, name in self.log if kind == "start"]
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestRequestScheduler:
+    def test_conversations_run_in_parallel(self):
+        """Test requests for different conversations stream at the same time."""
+        async def main():
+            scheduler, rec = RequestScheduler(max_workers=3), Recorder()
+            scheduler.submit("a", rec.work("a1"))
+            scheduler.submit("b", rec.work("b1"))
+            await settle()
+            assert rec.started() == ["a1", "b1"]
+            assert scheduler.active == 2
+            rec.finish("a1")
+            rec.finish("b1")
+            await settle()
+            assert scheduler.active == 0
+        run(main())
+
+    def test_conversation_queue_is_fifo(self):
+        """Test a conversation runs one request at a time, in order."""
+        async def main():
+            scheduler, rec = RequestScheduler(), Recorder()
+            first = scheduler.submit("a", rec.work("a1"))
+            second = scheduler.submit("a", rec.work("a2"))
+            await settle()
+            assert rec.started() == ["a1"]
+            assert second.state == "queued" and scheduler.queued("a") == 1
+            rec.finish("a1")
+            await first.wait()
+            await settle()
+            assert rec.started() == ["a1", "a2"]
+            assert scheduler.running("a") is second
+            rec.finish("a2")
+            await second.wait()
+            assert not scheduler.busy("a")
+        run(main())
+
+    def test_pool_is_bounded(self):
+        """Test no more than max_workers run; the longest-waiting request goes next."""
+        async def main():
+            scheduler, rec = RequestScheduler(max_workers=2), Recorder()
+            for name in ("a", "b", "c", "d"):
+                scheduler.submit(name, rec.work(name))
+            await settle()
+            assert rec.started() == ["a", "b"]
+            assert scheduler.busy("c") and scheduler.running("c") is None
+            rec.finish("b")
+            await settle()
+            assert rec.started() == ["a", "b", "c"]
+            assert scheduler.active == 2
+        run(main())
+
+    def test_queued_conversation_does_not_block_others(self):
+        """Test a request waiting on its own conversation lets other conversations through."""
+        async def main():
+            scheduler, rec = RequestScheduler(max_workers=2), Recorder()
+            scheduler.submit("a", rec.work("a1"))
+            scheduler.submit("a", rec.work("a2"))
+            scheduler.submit("b", rec.work("b1"))
+            await settle()
+            assert rec.started() == ["a1", "b1"]
+        run(main())
+
+    def test_cancel_queued_job_never_runs(self):
+        """Test cancelling a queued job drops it and frees its conversation."""
+        async def main():
+            scheduler, rec = RequestScheduler(max_workers=1), Recorder()
+            scheduler.submit("a", rec.work("a1"))
+            queued = scheduler.submit("b", rec.work("b1"))
+            done = []
+            queued.add_done_callback(done.append)
+            queued.cancel.cancel()
+            assert queued.done and done == [queued]
+            assert not scheduler.busy("b")
+            await settle()
+            rec.finish("a1")
+            await settle()
+            assert rec.started() == ["a1"]
+        run(main())
+
+    def test_cancel_conversation(self):
+        """Test cancel stops the running request and drops the queued ones."""
+        async def main():
+            scheduler, rec = RequestScheduler(), Recorder()
+            running = scheduler.submit("a", rec.work("a1"))
+            scheduler.submit("a", rec.work("a2"))
+            other = scheduler.submit("b", rec.work("b1"))
+            await settle()
+            scheduler.cancel("a")
+            await running.wait()
+            await settle()
+            assert ("cancelled", "a1") in rec.log
+            assert "a2" not in rec.started()
+            assert not scheduler.busy("a")
+            assert not other.done
+            scheduler.cancel_all()
+            await other.wait()
+        run(main())
+
+    def test_failed_job_frees_its_worker(self):
+        """Test an exception in one request does not stall the queue behind it."""
+        async def main():
+            scheduler, rec = RequestScheduler(max_workers=1), Recorder()
+
+            async def boom(cancel):
+                raise RuntimeError("boom")
+
+            failed = scheduler.submit("a", boom)
+            scheduler.submit("a", rec.work("a2"))
+            await failed.wait()
+            await settle()
+            assert rec.started() == ["a2"]
+        run(main())
+
+    def test_needs_a_worker(self):
+        """Test a pool without workers is rejected."""
+        with pytest.raises(ValueError):
+            RequestScheduler(max_workers=0)
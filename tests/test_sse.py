@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+
+from api.sse import SSEParser, SSEEvent, delta_content, iter_deltas, aiter_deltas
+
+
+def chunk(content, **delta):
+    delta = dict(delta, content=content)
+    return json.dumps({
+        "id": "c1", "object": "chat.completion.chunk", "model": "deepseek-chat",
+        "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": None}],
+    }, separators=(",", ":")).encode()
+
+
+def stream(*contents):
+    body = b"".join(b"data: " + chunk(c) + b"\n\n" for c in contents)
+    return body + b"data: [DONE]\n\n"
+
+
+class TestSSEParser:
+    def test_events_survive_any_read_boundary(self):
+        """Test splitting the stream into single bytes yields the same events."""
+        body = b"event: delta\nid: 7\ndata: a\n\n: comment\ndata: b\n\n"
+        whole = SSEParser().feed(body)
+
+        parser = SSEParser()
+        split = [e for i in range(len(body)) for e in parser.feed(body[i:i + 1])]
+
+        assert whole == split == [
+            SSEEvent(b"a", "delta", "7"),
+            SSEEvent(b"b", "message", "7"),
+        ]
+
+    def test_line_endings(self):
+        """Test CRLF and CR line endings, including a CRLF split across reads."""
+        parser = SSEParser()
+        events = parser.feed(b"data: one\r\n\r") + parser.feed(b"\ndata: two\r\r")
+        assert [e.data for e in events] == [b"one", b"two"]
+
+    def test_multi_line_data_and_fields(self):
+        """Test data lines are joined and field parsing follows the spec."""
+        parser = SSEParser()
+        events = parser.feed(b"data:first\ndata\ndata:  third\nretry: 300\nid: a\0b\n\n")
+
+        assert events == [SSEEvent(b"first\n\n third", "message", None, 300)]
+        assert parser.retry == 300
+
+    def test_incomplete_event_is_held(self):
+        """Test an event without its terminating blank line is not dispatched."""
+        parser = SSEParser()
+        assert parser.feed(b"data: partial\n") == []
+        assert parser.feed(b"\n") == [SSEEvent(b"partial")]
+
+
+class TestDeltaContent:
+    @pytest.mark.parametrize("content", [
+        "plain", "", 'quote " and \\ backslash', "line\nbreak\ttab", "é ü 中文 😀", "ends with \\",
+    ])
+    def test_matches_json_decoding(self, content):
+        """Test the byte-level fast path agrees with a full JSON decode."""
+        assert delta_content(chunk(content)) == content
+        assert delta_content(json.dumps(json.loads(chunk(content))).encode()) == content
+
+    def test_null_and_missing_content(self):
+        """Test chunks without text give None."""
+        assert delta_content(chunk(None)) is None
+        assert delta_content(b'{"choices":[{"index":0,"delta":{"role":"assistant"}}]}') is None
+        assert delta_content(b'{"error": "overloaded"}') is None
+        assert delta_content(b"not json") is None
+
+    def test_other_content_keys_are_ignored(self):
+        """Test reasoning text and logprobs are not mistaken for the reply."""
+        assert delta_content(chunk("answer", reasoning_content="thinking")) == "answer"
+        data = (b'{"choices":[{"index":0,"delta":{"content":"x"},'
+                b'"logprobs":{"content":[{"token":"x"}]}}]}')
+        assert delta_content(data) == "x"
+
+
+class TestIterDeltas:
+    def test_stops_at_done(self):
+        """Test content is yielded in order and parsing ends at [DONE]."""
+        reads = [stream("Hel", "lo") + b"data: " + chunk("ignored") + b"\n\n"]
+        assert list(iter_deltas(reads)) == ["Hel", "lo"]
+
+    def test_multibyte_and_split_json(self):
+        """Test characters split between reads and JSON split across data lines."""
+        split_json = b'data: {"choices":[{"index":0,\ndata: "delta":{"content":"!"}}]}\n\n'
+        body = stream("中文").replace(b"data: [DONE]", split_json + b"data: [DONE]")
+        reads = [body[i:i + 3] for i in range(0, len(body), 3)]
+        assert list(iter_deltas(reads)) == ["中文", "!"]
+
+    def test_async_stream(self):
+        """Test the async variant over an async byte iterator."""
+        async def reads():
+            for part in (stream("a", "b")[:20], stream("a", "b")[20:]):
+                yield part
+
+        async def collect():
+            return [content async for content in aiter_deltas(reads())]
+
+        assert asyncio.run(collect()) == ["a", "b"]
@@ -1,13 +1,21 @@
 # tests/test_storage.py
 import pytest
 import tempfile
+import threading
+import time
 import shutil
 from pathlib import Path
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import DEFAULT, MagicMock, patch
 from tinydb import TinyDB
 
-from data.models import Message, Conversation, Settings
+from data.models import Message, Conversation, ReplyMetrics, Settings
 from data.storage import StorageManager
+from data.journal import JournalStorageManager
+from data.sqlite_storage import SQLiteStorageManager
+from data.service import MAX_WRITE_ATTEMPTS, StorageService
+from data.async_storage import AsyncStorage
+from data.config import get_storage, close_all
+from data.paths import DATA_DIR_ENV, default_data_dir, set_data_dir_provider
 
 
 @pytest.fixture
@@ -25,21 +33,20 @@ def temp_data_dir():
 
 
 @pytest.fixture
-def mock_app(temp_data_dir):
-    """Create a mock Kivy App with temporary data directory."""
-    app = Mock()
-    app.user_data_dir = str(temp_data_dir)
-    return app
+def data_dir_provider(temp_data_dir):
+    """Point the default data directory at the temporary one."""
+    previous = set_data_dir_provider(lambda: temp_data_dir)
+    yield temp_data_dir
+    set_data_dir_provider(previous)
 
 
 @pytest.fixture
-def storage_manager(mock_app):
-    """Create a StorageManager instance with mocked app."""
-    with patch('data.storage.App.get_running_app', return_value=mock_app):
-        storage = StorageManager()
-        # Clear any existing data
-        storage.db.truncate()
-        yield storage
+def storage_manager(data_dir_provider):
+    """Create a StorageManager instance in the provided data directory."""
+    storage = StorageManager()
+    # Clear any existing data
+    storage.db.truncate()
+    yield storage
 
 
 class TestMessage:
@@ -106,6 +113,35 @@ class TestSettings:
         assert settings.current_conversation_id == "conv-123"
 
 
+class TestDataDir:
+    def test_provider_supplies_default(self, data_dir_provider):
+        """Test the registered provider decides where storage goes by default."""
+        assert default_data_dir() == data_dir_provider
+        assert get_storage("tinydb").backend.data_dir == data_dir_provider
+        close_all()
+
+    def test_environment_fallback(self, temp_data_dir, monkeypatch):
+        """Test $AI_CHAT_DATA_DIR is used when no provider is registered."""
+        previous = set_data_dir_provider(None)
+        try:
+            monkeypatch.setenv(DATA_DIR_ENV, str(temp_data_dir))
+            assert default_data_dir() == temp_data_dir
+            monkeypatch.delenv(DATA_DIR_ENV)
+            with pytest.raises(RuntimeError):
+                default_data_dir()
+        finally:
+            set_data_dir_provider(previous)
+
+    def test_import_without_kivy(self):
+        """Test the data and api packages load without pulling in Kivy."""
+        import subprocess
+        import sys
+        code = "import sys, data, api, api.batch; print(any(m.startswith('kivy') for m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent.parent, check=True)
+        assert result.stdout.strip() == "False"
+
+
 class TestStorageManager:
     def test_storage_manager_initialization(self, storage_manager, temp_data_dir):
         """Test StorageManager initializes correctly."""
@@ -220,3 +256,655 @@ class TestStorageManager:
         assert retrieved.messages[1].role == "assistant"
         assert retrieved.messages[2].content == "Second message"
         assert retrieved.messages[3].content == "Second response"
+
+
+@pytest.fixture
+def journal_storage(temp_data_dir):
+    """Create a JournalStorageManager in a temporary directory."""
+    storage = JournalStorageManager(temp_data_dir)
+    yield storage
+    storage.close()
+
+
+class TestJournalStorageManager:
+    def test_save_and_get_conversation(self, journal_storage):
+        """Test saving and retrieving a conversation."""
+        conv = Conversation(title="Test Chat")
+        conv.messages.append(Message(role="user", content="Test message"))
+
+        journal_storage.save_conversation(conv)
+        retrieved = journal_storage.get_conversation(conv.id)
+
+        assert retrieved.id == conv.id
+        assert retrieved.title == "Test Chat"
+        assert retrieved.messages[0].content == "Test message"
+
+    def test_append_writes_only_the_change(self, journal_storage):
+        """Test appending a message does not rewrite earlier messages."""
+        conv = Conversation(title="Long Chat")
+        conv.messages.extend(Message(role="user", content="x" * 1000) for _ in range(50))
+        journal_storage.save_conversation(conv)
+        size_before = journal_storage.log_path.stat().st_size
+
+        conv.messages.append(Message(role="assistant", content="short"))
+        journal_storage.save_conversation(conv)
+
+        assert journal_storage.log_path.stat().st_size - size_before < 500
+
+    def test_unchanged_save_writes_nothing(self, journal_storage):
+        """Test saving an unchanged conversation leaves the log untouched."""
+        conv = Conversation(title="Chat")
+        conv.messages.append(Message(role="user", content="Hi"))
+        journal_storage.save_conversation(conv)
+        size_before = journal_storage.log_path.stat().st_size
+
+        journal_storage.save_conversation(conv)
+
+        assert journal_storage.log_path.stat().st_size == size_before
+
+    def test_reopen_replays_log(self, temp_data_dir):
+        """Test state survives closing and reopening the journal."""
+        storage = JournalStorageManager(temp_data_dir)
+        conv = Conversation(title="Persistent")
+        conv.messages.append(Message(role="user", content="First"))
+        storage.save_conversation(conv)
+        conv.messages = [Message(role="user", content="Replaced")]
+        storage.save_conversation(conv)
+        storage.save_settings(Settings(api_key="key", current_conversation_id=conv.id))
+        deleted = Conversation(title="Gone")
+        storage.save_conversation(deleted)
+        storage.delete_conversation(deleted.id)
+        storage.close()
+
+        reopened = JournalStorageManager(temp_data_dir)
+        try:
+            retrieved = reopened.get_conversation(conv.id)
+            assert [m.content for m in retrieved.messages] == ["Replaced"]
+            assert reopened.get_settings().current_conversation_id == conv.id
+            assert [c.id for c in reopened.get_all_conversations()] == [conv.id]
+        finally:
+            reopened.close()
+
+    def test_ignores_torn_trailing_record(self, temp_data_dir):
+        """Test a partially written last record does not break replay."""
+        storage = JournalStorageManager(temp_data_dir)
+        conv = Conversation(title="Chat")
+        storage.save_conversation(conv)
+        storage.close()
+        with open(temp_data_dir / "chat_journal.log", "a", encoding="utf-8") as f:
+            f.write('{"op": "msgs", "id": "')
+
+        reopened = JournalStorageManager(temp_data_dir)
+        try:
+            assert reopened.get_conversation(conv.id).title == "Chat"
+        finally:
+            reopened.close()
+
+    def test_appends_after_torn_record_survive(self, temp_data_dir):
+        """Test records written after recovering from a torn write are replayed."""
+        storage = JournalStorageManager(temp_data_dir)
+        conv = Conversation(title="Chat")
+        storage.save_conversation(conv)
+        storage.close()
+        with open(temp_data_dir / "chat_journal.log", "a", encoding="utf-8") as f:
+            f.write('{"op": "msgs", "id": "')
+
+        recovered = JournalStorageManager(temp_data_dir)
+        recovered.append_message(conv.id, Message(role="user", content="After the crash"))
+        recovered.close()
+
+        reopened = JournalStorageManager(temp_data_dir)
+        try:
+            assert [m.content for m in reopened.get_conversation(conv.id).messages] == ["After the crash"]
+        finally:
+            reopened.close()
+
+    def test_compaction_preserves_state(self, temp_data_dir):
+        """Test compaction shrinks the log without losing data."""
+        storage = JournalStorageManager(temp_data_dir)
+        storage.compact_threshold = 10
+        conv = Conversation(title="Busy Chat")
+        for i in range(30):
+            conv.messages.append(Message(role="user", content=f"message {i}"))
+            storage.save_conversation(conv)
+        storage.close()
+
+        with open(temp_data_dir / "chat_journal.log", encoding="utf-8") as f:
+            assert len(f.readlines()) < 30
+
+        reopened = JournalStorageManager(temp_data_dir)
+        try:
+            assert len(reopened.get_conversation(conv.id).messages) == 30
+        finally:
+            reopened.close()
+
+    def test_imports_legacy_tinydb_file(self, temp_data_dir):
+        """Test existing chat_data.json is imported on first open."""
+        legacy = StorageManager(temp_data_dir)
+        conv = Conversation(title="Old Chat")
+        conv.messages.append(Message(role="user", content="From TinyDB"))
+        legacy.save_conversation(conv)
+        legacy.save_settings(Settings(api_key="old-key"))
+        legacy.close()
+
+        storage = JournalStorageManager(temp_data_dir)
+        try:
+            assert storage.get_conversation(conv.id).messages[0].content == "From TinyDB"
+            assert storage.get_settings().api_key == "old-key"
+        finally:
+            storage.close()
+
+
+@pytest.fixture
+def sqlite_storage(temp_data_dir):
+    """Create a SQLiteStorageManager in a temporary directory."""
+    storage = SQLiteStorageManager(temp_data_dir)
+    yield storage
+    storage.close()
+
+
+class TestSQLiteStorageManager:
+    def test_save_and_get_conversation(self, sqlite_storage):
+        """Test saving and retrieving a conversation."""
+        conv = Conversation(title="Test Chat")
+        conv.messages.extend([
+            Message(role="user", content="Question"),
+            Message(role="assistant", content="Answer"),
+        ])
+
+        sqlite_storage.save_conversation(conv)
+        retrieved = sqlite_storage.get_conversation(conv.id)
+
+        assert retrieved.title == "Test Chat"
+        assert [m.content for m in retrieved.messages] == ["Question", "Answer"]
+        assert retrieved.messages[0].timestamp == conv.messages[0].timestamp
+
+    def test_get_nonexistent_conversation(self, sqlite_storage):
+        """Test retrieving a conversation that doesn't exist."""
+        result = sqlite_storage.get_conversation("nonexistent-id")
+        assert result.id != "nonexistent-id"
+
+    def test_update_and_clear_conversation(self, sqlite_storage):
+        """Test appending to and clearing an existing conversation."""
+        conv = Conversation(title="Original")
+        conv.messages.append(Message(role="user", content="One"))
+        sqlite_storage.save_conversation(conv)
+
+        conv.title = "Renamed"
+        conv.messages.append(Message(role="assistant", content="Two"))
+        sqlite_storage.save_conversation(conv)
+        retrieved = sqlite_storage.get_conversation(conv.id)
+        assert retrieved.title == "Renamed"
+        assert [m.content for m in retrieved.messages] == ["One", "Two"]
+
+        conv.messages = []
+        sqlite_storage.save_conversation(conv)
+        assert sqlite_storage.get_conversation(conv.id).messages == []
+
+    def test_delete_conversation_removes_messages(self, sqlite_storage):
+        """Test deleting a conversation also deletes its message rows."""
+        conv = Conversation(title="To be deleted")
+        conv.messages.append(Message(role="user", content="Bye"))
+        sqlite_storage.save_conversation(conv)
+
+        sqlite_storage.delete_conversation(conv.id)
+
+        assert sqlite_storage.get_all_conversations() == []
+        count = sqlite_storage.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        assert count == 0
+
+    def test_save_and_get_settings(self, sqlite_storage):
+        """Test saving and retrieving settings."""
+        assert sqlite_storage.get_settings() == Settings()
+        settings = Settings(api_provider="deepseek", api_key="key", model="deepseek-chat",
+                            current_conversation_id="conv-1", response_cache=True,
+                            backup_provider="local", backup_model="local-echo")
+        sqlite_storage.save_settings(settings)
+        assert sqlite_storage.get_settings() == settings
+
+        settings.response_cache = False
+        sqlite_storage.save_settings(settings)
+        assert sqlite_storage.get_settings().response_cache is False
+
+    def test_migrates_tinydb_file(self, temp_data_dir):
+        """Test chat_data.json is migrated on first open and not again."""
+        legacy = StorageManager(temp_data_dir)
+        conv = Conversation(title="Old Chat")
+        conv.messages.append(Message(role="user", content="From TinyDB"))
+        legacy.save_conversation(conv)
+        legacy.save_settings(Settings(api_key="old-key", current_conversation_id=conv.id))
+        legacy.close()
+
+        storage = SQLiteStorageManager(temp_data_dir)
+        assert storage.get_conversation(conv.id).messages[0].content == "From TinyDB"
+        assert storage.get_settings().api_key == "old-key"
+        storage.delete_conversation(conv.id)
+        storage.close()
+
+        reopened = SQLiteStorageManager(temp_data_dir)
+        try:
+            assert reopened.get_all_conversations() == []
+        finally:
+            reopened.close()
+
+    def test_migrates_journal(self, temp_data_dir):
+        """Test the journal takes precedence over chat_data.json when migrating."""
+        journal = JournalStorageManager(temp_data_dir)
+        conv = Conversation(title="Journaled")
+        journal.save_conversation(conv)
+        journal.close()
+
+        storage = SQLiteStorageManager(temp_data_dir)
+        try:
+            assert storage.get_conversation(conv.id).title == "Journaled"
+        finally:
+            storage.close()
+
+
+@pytest.fixture(params=[StorageManager, JournalStorageManager, SQLiteStorageManager])
+def any_storage(request, temp_data_dir):
+    """Create each storage backend in a temporary directory."""
+    storage = request.param(temp_data_dir)
+    yield storage
+    storage.close()
+
+
+class TestConversationListing:
+    def test_summaries_sorted_by_recency(self, any_storage):
+        """Test summaries come back most recently updated first."""
+        old = Conversation(title="Old", created_at="2024-01-01T00:00:00")
+        old.messages.append(Message(role="user", content="old", timestamp="2024-01-01T00:00:01"))
+        new = Conversation(title="New", created_at="2024-01-02T00:00:00")
+        active = Conversation(title="Active", created_at="2023-12-31T00:00:00")
+        active.messages.append(Message(role="user", content="latest", timestamp="2024-01-03T00:00:00"))
+        for conv in (old, new, active):
+            any_storage.save_conversation(conv)
+
+        summaries = any_storage.list_conversations()
+
+        assert [s.title for s in summaries] == ["Active", "New", "Old"]
+        assert summaries[0].updated_at == "2024-01-03T00:00:00"
+        assert summaries[1].updated_at == "2024-01-02T00:00:00"
+
+    def test_summary_fields(self, any_storage):
+        """Test message count and preview reflect the last save."""
+        conv = Conversation(title="Chat")
+        conv.messages.extend([
+            Message(role="user", content="Question"),
+            Message(role="assistant", content="A long\nanswer " + "x" * 200),
+        ])
+        any_storage.save_conversation(conv)
+
+        summary = any_storage.list_conversations()[0]
+
+        assert summary.id == conv.id
+        assert summary.message_count == 2
+        assert summary.preview.startswith("A long answer x")
+        assert len(summary.preview) == 80
+
+        conv.messages = []
+        any_storage.save_conversation(conv)
+        summary = any_storage.list_conversations()[0]
+        assert summary.message_count == 0
+        assert summary.preview == ""
+
+    def test_pagination(self, any_storage):
+        """Test offset and limit page through the listing."""
+        for i in range(5):
+            any_storage.save_conversation(
+                Conversation(title=f"Chat {i}", created_at=f"2024-01-0{i + 1}T00:00:00"))
+
+        first = any_storage.list_conversations(offset=0, limit=2)
+        second = any_storage.list_conversations(offset=2, limit=2)
+        last = any_storage.list_conversations(offset=4, limit=2)
+
+        assert [s.title for s in first] == ["Chat 4", "Chat 3"]
+        assert [s.title for s in second] == ["Chat 2", "Chat 1"]
+        assert [s.title for s in last] == ["Chat 0"]
+
+    def test_deleted_conversation_not_listed(self, any_storage):
+        """Test deleting a conversation removes its summary."""
+        conv = Conversation(title="Gone")
+        any_storage.save_conversation(conv)
+        any_storage.delete_conversation(conv.id)
+        assert any_storage.list_conversations() == []
+
+
+def test_sqlite_upgrades_version_1_database(temp_data_dir):
+    """Test summary columns are backfilled when opening a version 1 database."""
+    import sqlite3
+    conn = sqlite3.connect(str(temp_data_dir / "chat_data.sqlite3"))
+    conn.executescript("""
+        CREATE TABLE conversations (id TEXT PRIMARY KEY, title TEXT NOT NULL, created_at TEXT NOT NULL);
+        CREATE TABLE messages (conversation_id TEXT NOT NULL, position INTEGER NOT NULL,
+            role TEXT NOT NULL, content TEXT NOT NULL, timestamp TEXT NOT NULL,
+            PRIMARY KEY (conversation_id, position));
+        CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        INSERT INTO conversations VALUES ('c1', 'Chat', '2024-01-01T00:00:00');
+        INSERT INTO messages VALUES ('c1', 0, 'user', 'first', '2024-01-01T00:00:01');
+        INSERT INTO messages VALUES ('c1', 1, 'assistant', 'second', '2024-01-01T00:00:02');
+        PRAGMA user_version = 1;
+    """)
+    conn.close()
+
+    storage = SQLiteStorageManager(temp_data_dir)
+    try:
+        summary = storage.list_conversations()[0]
+        assert summary.message_count == 2
+        assert summary.updated_at == "2024-01-01T00:00:02"
+        assert summary.preview == "second"
+        assert [m.token_count for m in storage.get_conversation("c1").messages] == [None, None]
+    finally:
+        storage.close()
+
+
+class TestMessagePaging:
+    def _save_numbered(self, storage, count):
+        conv = Conversation(title="Long Chat")
+        conv.messages.extend(Message(role="user", content=f"message {i}") for i in range(count))
+        storage.save_conversation(conv)
+        return conv
+
+    def test_latest_page_and_cursor(self, any_storage):
+        """Test the newest page is returned with a cursor to the older ones."""
+        conv = self._save_numbered(any_storage, 7)
+
+        page = any_storage.get_messages(conv.id, limit=3)
+
+        assert [m.content for m in page.messages] == ["message 4", "message 5", "message 6"]
+        assert page.cursor == 4
+
+    def test_paging_back_to_start(self, any_storage):
+        """Test following cursors walks back to the first message."""
+        conv = self._save_numbered(any_storage, 7)
+
+        second = any_storage.get_messages(conv.id, before=4, limit=3)
+        first = any_storage.get_messages(conv.id, before=second.cursor, limit=3)
+
+        assert [m.content for m in second.messages] == ["message 1", "message 2", "message 3"]
+        assert second.cursor == 1
+        assert [m.content for m in first.messages] == ["message 0"]
+        assert first.cursor is None
+
+    def test_missing_conversation_is_empty(self, any_storage):
+        """Test paging an unknown conversation returns an empty page."""
+        page = any_storage.get_messages("nonexistent-id")
+        assert page.messages == []
+        assert page.cursor is None
+
+    def test_append_message(self, any_storage):
+        """Test appending a message updates messages and summary."""
+        conv = self._save_numbered(any_storage, 2)
+
+        any_storage.append_message(conv.id, Message(role="assistant", content="reply",
+                                                    timestamp="2999-01-01T00:00:00"))
+
+        assert [m.content for m in any_storage.get_conversation(conv.id).messages][-1] == "reply"
+        summary = any_storage.get_conversation_summary(conv.id)
+        assert summary.message_count == 3
+        assert summary.preview == "reply"
+        assert summary.updated_at == "2999-01-01T00:00:00"
+
+    def test_append_to_missing_conversation(self, any_storage):
+        """Test appending to an unknown conversation raises KeyError."""
+        with pytest.raises(KeyError):
+            any_storage.append_message("nonexistent-id", Message(role="user", content="Hi"))
+
+    def test_token_counts_are_stored(self, any_storage):
+        """Test cached token counts survive saving, appending and paging."""
+        conv = self._save_numbered(any_storage, 1)
+        conv.messages[0].token_count = 3
+        any_storage.save_conversation(conv)
+        any_storage.append_message(conv.id, Message(role="assistant", content="reply", token_count=1))
+
+        page = any_storage.get_messages(conv.id)
+        assert [m.token_count for m in page.messages] == [3, 1]
+
+    def test_reply_metrics_are_stored(self, any_storage):
+        """Test reply metrics round-trip and the newest are listed first."""
+        conv = self._save_numbered(any_storage, 1)
+        older = ReplyMetrics(provider="openai", model="gpt-4", first_chunk=0.5, total=2.0, chunks=9)
+        newer = ReplyMetrics(provider="openai", model="gpt-4", first_chunk=0.2, total=1.0, chunks=4)
+        conv.messages.append(Message(role="assistant", content="a", timestamp="2999-01-01T00:00:00",
+                                     metrics=older))
+        any_storage.save_conversation(conv)
+        any_storage.append_message(conv.id, Message(role="assistant", content="b",
+                                                    timestamp="2999-01-02T00:00:00", metrics=newer))
+
+        assert [m.metrics for m in any_storage.get_conversation(conv.id).messages] == [None, older, newer]
+        assert any_storage.recent_reply_metrics() == [newer, older]
+        assert any_storage.recent_reply_metrics(limit=1) == [newer]
+
+    def test_missing_summary_is_none(self, any_storage):
+        """Test get_conversation_summary returns None for unknown ids."""
+        assert any_storage.get_conversation_summary("nonexistent-id") is None
+
+
+@pytest.fixture
+def service(temp_data_dir):
+    """Create a StorageService over a spied SQLite backend with a long flush timer."""
+    backend = SQLiteStorageManager(temp_data_dir)
+    spy = MagicMock(wraps=backend)
+    spy.data_dir = temp_data_dir
+    service = StorageService(spy, flush_interval=60)
+    yield service
+    service.close()
+
+
+class TestStorageService:
+    def test_burst_coalesces_into_one_write(self, service):
+        """Test a save followed by appends and a settings save flush once."""
+        conv = Conversation(title="Chat")
+        service.save_conversation(conv)
+        service.append_message(conv.id, Message(role="user", content="Hi"))
+        service.append_message(conv.id, Message(role="assistant", content="Hello"))
+        service.save_settings(Settings(current_conversation_id=conv.id))
+        service.save_settings(Settings(api_key="key", current_conversation_id=conv.id))
+
+        service.backend.save_conversation.assert_not_called()
+        service.flush()
+
+        service.backend.save_conversation.assert_called_once()
+        service.backend.append_messages.assert_not_called()
+        service.backend.save_settings.assert_called_once()
+        stored = service.backend.get_conversation(conv.id)
+        assert [m.content for m in stored.messages] == ["Hi", "Hello"]
+        assert service.backend.get_settings().api_key == "key"
+
+    def test_appends_to_stored_conversation_batch(self, service):
+        """Test several appends to a flushed conversation become one batch."""
+        conv = Conversation(title="Chat")
+        service.save_conversation(conv)
+        service.flush()
+
+        for i in range(3):
+            service.append_message(conv.id, Message(role="user", content=str(i)))
+        service.flush()
+
+        service.backend.append_messages.assert_called_once()
+        assert len(service.backend.get_conversation(conv.id).messages) == 3
+
+    def test_reads_see_pending_writes(self, service):
+        """Test reads reflect writes that have not been flushed yet."""
+        conv = Conversation(title="Pending")
+        service.save_conversation(conv)
+        service.append_message(conv.id, Message(role="user", content="Hi"))
+        service.save_settings(Settings(api_key="pending-key"))
+
+        assert service.get_settings().api_key == "pending-key"
+        assert service.get_messages(conv.id).messages[0].content == "Hi"
+        assert service.list_conversations()[0].title == "Pending"
+
+    def test_saved_objects_are_snapshotted(self, service):
+        """Test mutating a conversation after saving does not change what is flushed."""
+        conv = Conversation(title="Chat")
+        service.save_conversation(conv)
+        conv.messages.append(Message(role="user", content="not saved"))
+        service.flush()
+
+        assert service.backend.get_conversation(conv.id).messages == []
+
+    def test_delete_supersedes_pending_save(self, service):
+        """Test deleting a conversation drops its pending writes."""
+        conv = Conversation(title="Gone")
+        service.save_conversation(conv)
+        service.delete_conversation(conv.id)
+        service.flush()
+
+        assert service.backend.get_conversation_summary(conv.id) is None
+
+    def test_append_to_missing_conversation(self, service):
+        """Test appending to an unknown conversation raises KeyError."""
+        with pytest.raises(KeyError):
+            service.append_message("nonexistent-id", Message(role="user", content="Hi"))
+
+    def test_failed_flush_is_retried(self, service):
+        """Test writes a failed flush did not get to stay pending and land on the next one."""
+        first, second = Conversation(title="First"), Conversation(title="Second")
+        service.save_conversation(first)
+        service.save_conversation(second)
+        service.save_settings(Settings(api_key="key"))
+        service.backend.save_conversation.side_effect = [OSError("disk full"), DEFAULT, DEFAULT]
+
+        service.flush()
+        assert service.dirty
+        assert service.backend.get_conversation(second.id).title == "Second"
+        assert service.backend.get_settings().api_key == "key"
+        service.append_message(first.id, Message(role="user", content="Hi"))
+        service.flush()
+
+        assert [m.content for m in service.backend.get_conversation(first.id).messages] == ["Hi"]
+        assert not service.dirty
+
+    def test_unwritable_message_is_dropped_alone(self, service):
+        """Test a message the backend always rejects holds up only its own conversation, then is dropped."""
+        first, second = Conversation(title="First"), Conversation(title="Second")
+        service.save_conversation(first)
+        service.save_conversation(second)
+        service.flush()
+        # SQLite cannot encode a lone surrogate
+        service.append_message(first.id, Message(role="assistant", content="bad \ud800"))
+        service.append_message(first.id, Message(role="user", content="after"))
+        service.append_message(second.id, Message(role="user", content="other"))
+
+        service.flush()
+        assert [m.content for m in service.backend.get_conversation(second.id).messages] == ["other"]
+        assert service.backend.get_conversation(first.id).messages == []
+        for _ in range(MAX_WRITE_ATTEMPTS - 1):
+            service.flush()
+
+        assert [m.content for m in service.backend.get_conversation(first.id).messages] == ["after"]
+        assert not service.dirty
+
+    def test_close_survives_a_failing_backend(self, temp_data_dir):
+        """Test close still closes the backend when pending writes cannot be stored."""
+        backend = MagicMock()
+        backend.save_conversation.side_effect = OSError("read-only file system")
+        service = StorageService(backend, flush_interval=60)
+        service.save_conversation(Conversation(title="Lost"))
+
+        service.close()
+
+        backend.close.assert_called_once()
+
+    def test_timer_flushes(self, temp_data_dir):
+        """Test pending writes are flushed once the interval elapses."""
+        service = StorageService(SQLiteStorageManager(temp_data_dir), flush_interval=0.01)
+        try:
+            service.save_settings(Settings(api_key="timed"))
+            deadline = time.monotonic() + 2
+            while service.dirty and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert not service.dirty
+            assert service.backend.get_settings().api_key == "timed"
+        finally:
+            service.close()
+
+
+def test_get_storage_shares_one_service(temp_data_dir):
+    """Test get_storage returns the same service for the same data dir."""
+    first = get_storage(data_dir=temp_data_dir)
+    try:
+        assert get_storage(data_dir=temp_data_dir) is first
+        assert isinstance(first.backend, SQLiteStorageManager)
+        with pytest.raises(ValueError, match="Unknown storage backend"):
+            get_storage("unknown", data_dir=temp_data_dir)
+    finally:
+        close_all()
+
+
+@pytest.fixture
+def async_storage(temp_data_dir):
+    """Create an AsyncStorage over SQLite that records dispatched callbacks."""
+    dispatched = []
+
+    def dispatch(fn):
+        dispatched.append(threading.current_thread().name)
+        fn()
+
+    storage = AsyncStorage(StorageService(SQLiteStorageManager(temp_data_dir)), dispatch)
+    storage.dispatched = dispatched
+    yield storage
+    storage.close()
+
+
+class TestAsyncStorage:
+    def test_operations_run_in_order_on_io_thread(self, async_storage):
+        """Test queued writes are visible to reads queued after them."""
+        conv = Conversation(title="Async")
+        async_storage.save_conversation(conv)
+        async_storage.append_message(conv.id, Message(role="user", content="Hi"))
+        page = async_storage.get_messages(conv.id).result()
+
+        assert [m.content for m in page.messages] == ["Hi"]
+
+    def test_callback_goes_through_dispatch(self, async_storage):
+        """Test callbacks are delivered via the dispatch function."""
+        conv = Conversation(title="Async")
+        async_storage.save_conversation(conv)
+        results = []
+        async_storage.list_conversations(callback=results.append).result()
+
+        assert results[0][0].title == "Async"
+        assert async_storage.dispatched == ["storage-io"]
+
+    def test_save_snapshots_conversation(self, async_storage):
+        """Test later changes to a saved conversation do not leak into the queued write."""
+        conv = Conversation(title="Before")
+        async_storage.save_conversation(conv)
+        conv.title = "After"
+
+        assert async_storage.get_conversation(conv.id).result().title == "Before"
+
+    def test_cached_summary_skips_queue(self, async_storage):
+        """Test a cached summary resolves immediately."""
+        conv = Conversation(title="Cached")
+        async_storage.save_conversation(conv).result()
+        with patch.object(async_storage, 'submit') as submit:
+            future = async_storage.get_conversation_summary(conv.id)
+        submit.assert_not_called()
+        assert future.result().title == "Cached"
+
+    def test_settings_are_synchronous(self, async_storage):
+        """Test settings round-trip without waiting for the I/O thread."""
+        async_storage.save_settings(Settings(api_key="sync-key"))
+        assert async_storage.get_settings().api_key == "sync-key"
+
+    def test_errors_reach_the_future(self, async_storage):
+        """Test exceptions from storage calls are set on the future."""
+        future = async_storage.append_message("nonexistent-id", Message(role="user", content="Hi"))
+        with pytest.raises(KeyError):
+            future.result()
+
+    def test_close_flushes_pending_writes(self, temp_data_dir):
+        """Test closing writes queued changes to disk."""
+        storage = AsyncStorage(StorageService(SQLiteStorageManager(temp_data_dir), flush_interval=60))
+        conv = Conversation(title="Durable")
+        storage.save_conversation(conv)
+        storage.close()
+
+        reopened = SQLiteStorageManager(temp_data_dir)
+        try:
+            assert reopened.get_conversation(conv.id).title == "Durable"
+        finally:
+            reopened.close()
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+from ui.stream_buffer import StreamBuffer
+
+
+class TestStreamBuffer:
+    def test_take_joins_chunks_since_last_take(self):
+        """Test many pushed chunks come out as one text update."""
+        buffer = StreamBuffer()
+        for chunk in ["Hel", "lo", " wor", "ld"]:
+            buffer.push(chunk)
+
+        assert buffer.take() == ("Hello world", False)
+        assert buffer.take() == (None, False)
+
+        buffer.push("!")
+        buffer.close()
+        assert buffer.take() == ("Hello world!", True)
+
+    def test_close_with_error(self):
+        """Test an error passed to close is kept for the UI."""
+        buffer = StreamBuffer()
+        buffer.push("partial")
+        error = RuntimeError("boom")
+        buffer.close(error=error)
+
+        assert buffer.take() == ("partial", True)
+        assert buffer.error is error
+
+    def test_push_blocks_until_taken(self):
+        """Test the producer waits once max_pending characters are queued."""
+        buffer = StreamBuffer(max_pending=4)
+        buffer.push("abcd")
+        pushed = threading.Event()
+
+        def produce():
+            buffer.push("efgh")
+            pushed.set()
+
+        thread = threading.Thread(target=produce)
+        thread.start()
+        assert not pushed.wait(0.05)
+
+        buffer.take()
+        assert pushed.wait(1)
+        thread.join()
+        assert buffer.text == "abcdefgh"
+
+    def test_close_releases_blocked_producer(self):
+        """Test closing the buffer unblocks a waiting producer."""
+        buffer = StreamBuffer(max_pending=1)
+        buffer.push("a")
+        thread = threading.Thread(target=buffer.push, args=("b",))
+        thread.start()
+        time.sleep(0.02)
+
+        buffer.close()
+        thread.join(1)
+
+        assert not thread.is_alive()
+        assert buffer.text == "a"
+
+    def test_many_tokens_few_updates(self):
+        """Test a long reply taken at a fixed rate costs few updates."""
+        buffer = StreamBuffer()
+        updates = 0
+        for i in range(4000):
+            buffer.push("tok ")
+            if i % 200 == 199:
+                text, _ = buffer.take()
+                updates += text is not None
+        buffer.close()
+        text, done = buffer.take()
+
+        assert updates == 20
+        assert done and len(buffer.text) == 16000
+
+    def test_apush_waits_without_blocking_the_loop(self):
+        """Test async producers yield to the loop until the UI takes the backlog."""
+        buffer = StreamBuffer(max_pending=4)
+        taken = []
+
+        async def produce():
+            for chunk in ["abcd", "efgh"]:
+                await buffer.apush(chunk)
+            buffer.close()
+
+        async def consume():
+            while True:
+                await asyncio.sleep(0.01)
+                text, done = buffer.take()
+                if text is not None:
+                    taken.append(text)
+                if done:
+                    return
+
+        async def run():
+            await asyncio.gather(produce(), consume())
+
+        asyncio.run(run())
+        assert taken == ["abcd", "abcdefgh"]
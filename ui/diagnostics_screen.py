@@ -0,0 +1,97 @@
+# ui/diagnostics_screen.py
+from kivy.lang import Builder
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.label import MDLabel
+from ui.storage import get_ui_storage
+from api.metrics import aggregate
+
+# (ReplyMetrics field, label, unit) shown as p50/p95 across recent replies
+ROWS = [
+    ("connect", "Connect", "s"),
+    ("first_chunk", "First chunk", "s"),
+    ("total", "Total", "s"),
+    ("tokens_per_sec", "Tokens/s", "rate"),
+    ("gap_p50", "Chunk gap", "s"),
+    ("gap_max", "Longest gap", "s"),
+    ("ui_lag_p50", "UI lag", "s"),
+    ("ui_lag_max", "Worst UI lag", "s"),
+    ("chunks", "Chunks", "count"),
+]
+
+KV_CODE = """
+<DiagnosticsScreen>:
+    orientation: 'vertical'
+    padding: "16dp"
+    spacing: "12dp"
+    size_hint_y: None
+    height: self.minimum_height
+
+    MDLabel:
+        id: summary
+        text: "Loading…"
+        font_style: "Subtitle2"
+        size_hint_y: None
+        height: self.texture_size[1]
+
+    MDGridLayout:
+        id: table
+        cols: 3
+        spacing: "4dp"
+        adaptive_height: True
+
+    MDRaisedButton:
+        text: "Close"
+        on_release: root.dismiss()
+        size_hint_y: None
+        height: "50dp"
+        md_bg_color: root.theme_cls.primary_color
+"""
+
+
+def format_value(value, unit: str) -> str:
+    if value is None:
+        return "—"
+    if unit == "s":
+        return f"{value * 1000:.0f} ms"
+    if unit == "rate":
+        return f"{value:.1f}"
+    return f"{value:.0f}"
+
+
+class DiagnosticsScreen(MDBoxLayout):
+    """p50/p95 latency of recent streamed replies, read from storage."""
+    dialog = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.storage = get_ui_storage()
+        self.storage.recent_reply_metrics(callback=self._show)
+
+    def _cell(self, text: str, bold: bool = False):
+        self.ids.table.add_widget(MDLabel(
+            text=f"[b]{text}[/b]" if bold else text, markup=True,
+            size_hint_y=None, height="24dp",
+        ))
+
+    def _show(self, metrics: list):
+        table = self.ids.table
+        table.clear_widgets()
+        if not metrics:
+            self.ids.summary.text = "No streamed replies measured yet"
+            return
+
+        self.ids.summary.text = f"Last {len(metrics)} replies"
+        for heading in ("", "p50", "p95"):
+            self._cell(heading, bold=True)
+        stats = aggregate(metrics, [name for name, _, _ in ROWS])
+        for name, label, unit in ROWS:
+            p50, p95, _ = stats[name]
+            self._cell(label)
+            self._cell(format_value(p50, unit))
+            self._cell(format_value(p95, unit))
+
+    def dismiss(self):
+        if self.dialog:
+            self.dialog.dismiss()
+
+Builder.load_string(KV_CODE)
@@ -3,8 +3,11 @@ from kivy.lang import Builder
 from kivy.clock import Clock
 from kivy.properties import ObjectProperty
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.list import OneLineListItem
-from data.storage import StorageManager
+from kivymd.uix.list import TwoLineListItem
+from ui.storage import get_ui_storage
+
+# Conversations fetched per page; more load when the list is scrolled to the end
+PAGE_SIZE = 30
 
 KV_CODE = """
 <HistoryDrawer>:
@@ -23,6 +26,7 @@ KV_CODE = """
 
         MDScrollView:
             id: scroll
+            on_scroll_y: root._on_scroll(self.scroll_y)
             MDList:
                 id: conversation_list
 
@@ -40,12 +44,16 @@ KV_CODE = """
 class HistoryDrawer(MDBoxLayout):
     storage = None
     main_screen = ObjectProperty(None, allownone=True)
+    _loaded = 0
+    _has_more = False
+    _loading = False
+    _generation = 0  # bumped on reload so pages still in flight are dropped
 
     def __init__(self, main_screen=None, **kwargs):
         super().__init__(**kwargs)
         if main_screen:
             self.main_screen = main_screen
-        self.storage = StorageManager()
+        self.storage = get_ui_storage()
         # Don't load conversations in __init__ - wait until main_screen is set
         Clock.schedule_once(lambda dt: self._load_conversations(), 0)
 
@@ -58,14 +66,35 @@ class HistoryDrawer(MDBoxLayout):
             return
 
         self.ids.conversation_list.clear_widgets()
-
-        conversations = self.storage.get_all_conversations()
-        for conv in conversations:
-            item = OneLineListItem(
-                text=conv.title if hasattr(conv, 'title') else 'New Chat',
-                on_release=lambda x, c=conv.id if hasattr(conv, 'id') else None: self.load_conversation(c)
+        self._loaded = 0
+        self._generation += 1
+        self._load_page()
+
+    def _load_page(self):
+        self._loading = True
+        generation = self._generation
+        self.storage.list_conversations(
+            offset=self._loaded, limit=PAGE_SIZE,
+            callback=lambda summaries: self._add_page(generation, summaries)
+        )
+
+    def _add_page(self, generation: int, summaries: list):
+        if generation != self._generation:
+            return
+        self._loading = False
+        for summary in summaries:
+            item = TwoLineListItem(
+                text=summary.title,
+                secondary_text=summary.preview or "No messages",
+                on_release=lambda x, c=summary.id: self.load_conversation(c)
             )
             self.ids.conversation_list.add_widget(item)
+        self._loaded += len(summaries)
+        self._has_more = len(summaries) == PAGE_SIZE
+
+    def _on_scroll(self, scroll_y: float):
+        if scroll_y <= 0 and self._has_more and not self._loading:
+            self._load_page()
 
     def load_conversation(self, conv_id: str):
         settings = self.storage.get_settings()
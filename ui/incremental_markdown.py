@@ -0,0 +1,74 @@
+import re
+from typing import Callable
+
+from ui.kivy_markdown import FENCE
+
+# A line after a blank line that still belongs to the block above it:
+# indented content, or the next item of a loose list
+CONTINUATION = re.compile(r'(\s|[-*+]\s|\d+[.)]\s)')
+
+
+class IncrementalMarkdownRenderer:
+    """Re-renders only the open trailing block as streamed text grows.
+
+    Text is split into blocks at blank lines outside code fences. Once a
+    block is followed by a blank line and the first line of a new block,
+    its markup is cached and never rendered again; each call renders just
+    the block still being written. If the new text does not extend the
+    previous one the cache is dropped and rendering starts over.
+
+    Blocks are rendered independently, so a reference-style link only
+    resolves when its definition is in the same block.
+    """
+
+    def __init__(self, render_block: Callable[[str], str]):
+        self.render_block = render_block
+        self.reset()
+
+    def reset(self) -> None:
+        self._source = ""  # prefix of the text covered by finished blocks
+        self._markup = ""  # their rendered markup, joined
+
+    def render(self, text: str) -> str:
+        if not text.startswith(self._source):
+            self.reset()
+
+        block_start = pos = len(self._source)
+        fence = None  # marker of the open code fence
+        prev_blank = False
+        # Only complete lines can end a block; the partial last line stays open
+        while True:
+            end = text.find('\n', pos)
+            if end == -1:
+                break
+            line = text[pos:end]
+            if prev_blank and line.strip() and not CONTINUATION.match(line):
+                self._finish_block(text[block_start:pos])
+                self._source = text[:pos]
+                block_start = pos
+            if fence is not None:
+                # Closed only by a run of the opening marker, as markdown_to_markup does
+                closing = line.strip()
+                if closing.startswith(fence) and closing.strip(fence[0]) == '':
+                    fence = None
+                prev_blank = False
+            else:
+                opening = FENCE.match(line)
+                if opening and not (opening.group(1)[0] == '`' and '`' in opening.group(2)):
+                    fence = opening.group(1)
+                    prev_blank = False
+                else:
+                    prev_blank = not line.strip()
+            pos = end + 1
+
+        open_block = text[block_start:]
+        if not open_block.strip():
+            return self._markup
+        open_markup = self.render_block(open_block)
+        return f"{self._markup}\n{open_markup}" if self._markup else open_markup
+
+    def _finish_block(self, block: str) -> None:
+        if not block.strip():
+            return
+        markup = self.render_block(block)
+        self._markup = f"{self._markup}\n{markup}" if self._markup else markup
@@ -0,0 +1,281 @@
+"""Single-pass conversion from Markdown to Kivy label markup.
+
+Covers what chat replies use: ATX headings, paragraphs, bullet and
+numbered lists (nested by indentation), fenced and indented code blocks,
+block quotes, horizontal rules, inline code, bold, italic, strikethrough,
+links and autolinks. Text is escaped for Kivy markup as it is emitted,
+so no intermediate HTML is built.
+"""
+import re
+
+CODE_COLOR = "#2d2d2d"
+LINK_COLOR = "#2196F3"
+QUOTE_COLOR = "#666666"
+CODE_FONT = "RobotoMono"
+HEADING_SIZES = {1: "22sp", 2: "20sp", 3: "18sp"}
+BULLET = "•"
+RULE = "─" * 20
+
+FENCE = re.compile(r' {0,3}(`{3,}|~{3,})(.*)$')
+HEADING = re.compile(r' {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+RULE_LINE = re.compile(r' {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+LIST_ITEM = re.compile(r'([ \t]*)([-*+]|\d{1,9}[.)])[ \t]+(.*)$')
+QUOTE = re.compile(r' {0,3}> ?(.*)$')
+INDENTED = re.compile(r'(?: {4}|\t)(.*)$')
+
+SPECIAL = re.compile(r'[\\`*_~\[\]<&]')
+LINK = re.compile(r'\[([^\[\]\n]+)\]\(\s*<?([^()\s<>\[\]]+)>?(?:\s+"[^"\n]*")?\s*\)')
+AUTOLINK = re.compile(r'<((?:https?|mailto):[^<>\s\[\]]+)>')
+PUNCTUATION = set('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~')
+
+
+def escape_markup(text: str) -> str:
+    return text.replace('&', '&amp;').replace('[', '&bl;').replace(']', '&br;')
+
+
+def _code_span(code: str) -> str:
+    return f"[color={CODE_COLOR}][font={CODE_FONT}]{escape_markup(code)}[/font][/color]"
+
+
+def _link(label_markup: str, url: str) -> str:
+    return f"[ref={url}][color={LINK_COLOR}][u]{label_markup}[/u][/color][/ref]"
+
+
+def _find_closing(text: str, delim: str, start: int) -> int:
+    """Position of the delimiter closing an emphasis opened before ``start``, or -1."""
+    char = delim[0]
+    k = text.find(delim, start)
+    while k != -1:
+        after = k + len(delim)
+        if (k > start and not text[k - 1].isspace()
+                and not (len(delim) == 1 and after < len(text) and text[after] == char)
+                and not (char == '_' and after < len(text) and text[after].isalnum())):
+            return k
+        # Skip over a longer run so '*' does not close on half of '**'
+        while after < len(text) and text[after] == char:
+            after += 1
+        k = text.find(delim, after)
+    return -1
+
+
+def render_inline(text: str) -> str:
+    out = []
+    i = 0
+    n = len(text)
+    while i < n:
+        m = SPECIAL.search(text, i)
+        if not m:
+            out.append(text[i:])
+            break
+        j = m.start()
+        if j > i:
+            out.append(text[i:j])
+        c = text[j]
+        i = j + 1
+
+        if c == '\\':
+            if i < n and text[i] in PUNCTUATION:
+                out.append(escape_markup(text[i]))
+                i += 1
+            else:
+                out.append('\\')
+
+        elif c == '`':
+            run_end = i
+            while run_end < n and text[run_end] == '`':
+                run_end += 1
+            fence = text[j:run_end]
+            k = text.find(fence, run_end)
+            while k != -1 and k + len(fence) < n and text[k + len(fence)] == '`':
+                k = text.find(fence, k + len(fence) + 1)
+            if k == -1:
+                out.append(fence)
+                i = run_end
+            else:
+                out.append(_code_span(text[run_end:k].strip()))
+                i = k + len(fence)
+
+        elif c in '*_':
+            run_end = i
+            while run_end < n and text[run_end] == c:
+                run_end += 1
+            left_ok = (run_end < n and not text[run_end].isspace()
+                       and not (c == '_' and j > 0 and text[j - 1].isalnum()))
+            handled = False
+            if left_ok and run_end - j >= 3:
+                k = _find_closing(text, c * 3, j + 3)
+                if k != -1:
+                    out.append(f"[b][i]{render_inline(text[j + 3:k])}[/i][/b]")
+                    i = k + 3
+                    handled = True
+            if not handled and left_ok and run_end - j >= 2:
+                k = _find_closing(text, c * 2, j + 2)
+                if k != -1:
+                    out.append(f"[b]{render_inline(text[j + 2:k])}[/b]")
+                    i = k + 2
+                    handled = True
+            if not handled and left_ok and run_end - j == 1:
+                k = _find_closing(text, c, j + 1)
+                if k != -1:
+                    out.append(f"[i]{render_inline(text[j + 1:k])}[/i]")
+                    i = k + 1
+                    handled = True
+            if not handled:
+                out.append(text[j:run_end])
+                i = run_end
+
+        elif c == '~':
+            k = _find_closing(text, '~~', j + 2) if text.startswith('~~', j) else -1
+            if k != -1:
+                out.append(f"[s]{render_inline(text[j + 2:k])}[/s]")
+                i = k + 2
+            else:
+                out.append('~')
+
+        elif c == '[':
+            link = LINK.match(text, j)
+            if link:
+                out.append(_link(render_inline(link.group(1)), link.group(2)))
+                i = link.end()
+            else:
+                out.append('&bl;')
+
+        elif c == ']':
+            out.append('&br;')
+
+        elif c == '&':
+            out.append('&amp;')
+
+        elif c == '<':
+            link = AUTOLINK.match(text, j)
+            if link:
+                out.append(_link(escape_markup(link.group(1)), link.group(1)))
+                i = link.end()
+            else:
+                out.append('<')
+    return ''.join(out)
+
+
+def _code_block(lines: list) -> str:
+    code = '\n'.join(lines)
+    return f"[font={CODE_FONT}][color={CODE_COLOR}]{escape_markup(code)}[/color][/font]"
+
+
+def markdown_to_markup(text: str) -> str:
+    """Convert Markdown ``text`` to Kivy markup in one pass over its lines."""
+    lines = text.split('\n')
+    n = len(lines)
+    blocks = []
+    paragraph = []
+    item = None  # [prefix, lines] of the list item being collected
+    i = 0
+
+    def flush():
+        nonlocal item
+        if paragraph:
+            blocks.append(render_inline('\n'.join(paragraph)))
+            paragraph.clear()
+        if item is not None:
+            blocks.append(item[0] + render_inline('\n'.join(item[1])))
+            item = None
+
+    while i < n:
+        line = lines[i]
+        if not line.strip():
+            if paragraph:
+                flush()
+            i += 1
+            continue
+
+        fence = FENCE.match(line)
+        if fence and not (fence.group(1)[0] == '`' and '`' in fence.group(2)):
+            flush()
+            marker = fence.group(1)
+            code = []
+            i += 1
+            while i < n:
+                closing = lines[i].strip()
+                if closing.startswith(marker) and closing.strip(marker[0]) == '':
+                    i += 1
+                    break
+                code.append(lines[i])
+                i += 1
+            blocks.append(_code_block(code))
+            continue
+
+        list_item = LIST_ITEM.match(line)
+        if item is not None and not list_item and (
+                line[:1] in ' \t'
+                or (lines[i - 1].strip() and not (HEADING.match(line) or RULE_LINE.match(line)
+                                                  or QUOTE.match(line)))):
+            # Continuation of the current item: indented text, or a lazy line right after it
+            item[1].append(line.strip())
+            i += 1
+            continue
+
+        heading = HEADING.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            content = render_inline(heading.group(2) or '')
+            size = HEADING_SIZES.get(level)
+            blocks.append(f"[b][size={size}]{content}[/size][/b]" if size else f"[b]{content}[/b]")
+            i += 1
+            continue
+
+        if RULE_LINE.match(line):
+            flush()
+            blocks.append(RULE)
+            i += 1
+            continue
+
+        if list_item:
+            flush()
+            indent, marker, content = list_item.groups()
+            depth = len(indent.expandtabs(4)) // 2
+            bullet = BULLET if marker[0] in '-*+' else marker
+            item = ["  " * depth + bullet + " ", [content]]
+            i += 1
+            continue
+
+        quote = QUOTE.match(line)
+        if quote:
+            flush()
+            quoted = []
+            while i < n:
+                inner = QUOTE.match(lines[i])
+                if inner:
+                    quoted.append(inner.group(1))
+                elif lines[i].strip() and quoted and quoted[-1].strip():
+                    quoted.append(lines[i])  # lazy continuation
+                else:
+                    break
+                i += 1
+            blocks.append(f"[color={QUOTE_COLOR}]{markdown_to_markup(chr(10).join(quoted))}[/color]")
+            continue
+
+        indented = INDENTED.match(line)
+        if indented and not paragraph:
+            flush()
+            code = []
+            while i < n:
+                inner = INDENTED.match(lines[i])
+                if inner:
+                    code.append(inner.group(1))
+                elif not lines[i].strip():
+                    code.append('')
+                else:
+                    break
+                i += 1
+            while code and not code[-1]:
+                code.pop()
+            blocks.append(_code_block(code))
+            continue
+
+        if item is not None:
+            flush()
+        paragraph.append(line.strip())
+        i += 1
+
+    flush()
+    return '\n'.join(blocks)
@@ -6,11 +6,32 @@ from kivymd.uix.screen import MDScreen
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.dialog import MDDialog
 from ui.chat_bubble import ChatBubble
-from ui.settings_screen import SettingsScreen
+from ui.message_source import MessageSource, bubble_data
+from ui.stream_buffer import StreamBuffer, STREAM_UPDATE_RATE
 from data.models import Conversation, Message, Settings
-from data.storage import StorageManager
-from api.config import get_client
-import threading
+from ui.storage import get_ui_storage
+from ui.scheduler import RequestScheduler
+from api.config import CLIENTS
+from api.cache import get_response_cache
+from api.router import get_routed_client, settings_routes
+from api.context import ContextWindow, count_tokens, extractive_summary
+from api.cancel import CancelToken, uncancel_current_task
+from dataclasses import dataclass, field
+from api.metrics import StreamTimer, current_timer
+from contextlib import aclosing
+import asyncio
+from pathlib import Path
+
+
+@dataclass
+class _Reply:
+    """A reply being generated for a conversation, shown or not."""
+    conversation: Conversation
+    cancel: CancelToken
+    timer: StreamTimer
+    buffer: StreamBuffer = field(default_factory=StreamBuffer)
+    discard: bool = False  # set when the conversation is cleared under it
+    finished: bool = False  # saved already, e.g. at exit while still streaming
 
 KV_CODE = """
 <MainScreen>:
@@ -22,12 +43,13 @@ KV_CODE = """
             title: "AI Chat"
             elevation: 2
             left_action_items: [["menu", lambda x: root.toggle_drawer()]]
-            right_action_items: [["cog", lambda x: root.open_settings()], ["delete", lambda x: root.clear_chat()]]
+            right_action_items: [["chart-box-outline", lambda x: root.open_diagnostics()], ["cog", lambda x: root.open_settings()], ["delete", lambda x: root.clear_chat()]]
 
         # Message List
         RecycleView:
             id: message_list
             viewclass: 'ChatBubble'
+            on_scroll_y: root._on_message_scroll(self.scroll_y)
             RecycleBoxLayout:
                 default_size: None, dp(80)
                 default_size_hint: 1, None
@@ -50,45 +72,105 @@ KV_CODE = """
                 multiline: False
                 on_text_validate: root.send_message()
 
+            # Becomes a stop button while a reply streams
             MDFloatingActionButton:
-                icon: "send"
+                icon: "stop" if root.is_loading else "send"
                 theme_icon_color: "Custom"
                 icon_color: 1, 1, 1, 1
                 md_bg_color: root.theme_cls.primary_color
                 size_hint: None, None
                 size: "55dp", "55dp"
                 pos_hint: {"center_y": 0.5}
-                disabled: root.is_loading
-                on_release: root.send_message()
+                on_release: root.stop_generation() if root.is_loading else root.send_message()
 """
 
 class MainScreen(MDScreen):
     current_conversation = ObjectProperty(None, allownone=True)
     drawer = ObjectProperty(None, allownone=True)
     storage = None
+    message_source = None
+    scheduler = None
+    # True while the open conversation has a reply streaming or waiting for a worker
     is_loading = BooleanProperty(False)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.storage = StorageManager()
+        self.storage = get_ui_storage()
+        self.scheduler = RequestScheduler()
+        self._replies = {}  # conversation id -> _Reply streaming for it
+        self._contexts = {}  # conversation id -> ContextWindow
         # Defer conversation loading until after KV is loaded
         Clock.schedule_once(lambda dt: self._load_or_create_conversation(), 0)
 
     def _load_or_create_conversation(self):
         settings = self.storage.get_settings()
         if settings.current_conversation_id:
-            self.current_conversation = self.storage.get_conversation(settings.current_conversation_id)
+            self.storage.get_conversation_summary(
+                settings.current_conversation_id, callback=self._open_conversation
+            )
+        else:
+            self._open_conversation(None)
+
+    def _open_conversation(self, summary):
+        if summary:
+            self.current_conversation = Conversation(
+                id=summary.id, title=summary.title, created_at=summary.created_at
+            )
         else:
             self.current_conversation = Conversation()
+            self.storage.save_conversation(self.current_conversation)
+            settings = self.storage.get_settings()
             settings.current_conversation_id = self.current_conversation.id
             self.storage.save_settings(settings)
 
+        self._contexts.pop(self.current_conversation.id, None)
+        self._update_loading()
+        # Only the newest page is loaded; older ones arrive on scroll
+        source = MessageSource(self.storage, self.current_conversation.id)
+        self.message_source = source
+        self.current_conversation.messages = source.messages
         self._refresh_messages()
+        source.load_latest(callback=lambda messages: self._on_latest_page(source))
+
+    def _on_latest_page(self, source: MessageSource):
+        if source is self.message_source:
+            self._refresh_messages()
 
     def _refresh_messages(self):
-        self.ids.message_list.data = []
-        for msg in self.current_conversation.messages:
-            self._add_bubble(msg.role, msg.content)
+        data = [bubble_data(m) for m in self.current_conversation.messages]
+        reply = self._replies.get(self.current_conversation.id)
+        if reply is not None and not reply.discard and reply.buffer.text:
+            # Streamed while the conversation was not on screen
+            data.append({'role': 'assistant', 'content': reply.buffer.text})
+        self.ids.message_list.data = data
+
+    def _is_open(self, conversation_id: str) -> bool:
+        return self.current_conversation is not None and self.current_conversation.id == conversation_id
+
+    def _update_loading(self, *args):
+        if self.current_conversation is not None:
+            self.is_loading = self.scheduler.busy(self.current_conversation.id)
+
+    def _on_message_scroll(self, scroll_y: float):
+        if scroll_y < 1 or not self.message_source:
+            return
+        source = self.message_source
+        source.load_older(callback=lambda older: self._prepend_older(source, older))
+
+    def _prepend_older(self, source: MessageSource, older: list):
+        if source is not self.message_source or not older:
+            return
+        message_list = self.ids.message_list
+        old_height = message_list.layout_manager.height
+        message_list.data = [bubble_data(m) for m in older] + message_list.data
+
+        def keep_position(dt):
+            # Hold the previously top-most bubble in place once the new rows are laid out
+            added = message_list.layout_manager.height - old_height
+            scrollable = message_list.layout_manager.height - message_list.height
+            if scrollable > 0:
+                message_list.scroll_y = max(0, 1 - added / scrollable)
+        Clock.schedule_once(keep_position, 0)
 
     def _add_bubble(self, role: str, content: str):
         self.ids.message_list.data.append({
@@ -106,49 +188,134 @@ class MainScreen(MDScreen):
         if not message:
             return
 
+        timer = StreamTimer()
         input_field.text = ""
-        self.is_loading = True  # Start loading
+        conversation = self.current_conversation
 
         # Add user message
-        user_msg = Message(role="user", content=message)
-        self.current_conversation.messages.append(user_msg)
+        user_msg = Message(role="user", content=message, token_count=count_tokens(message))
+        conversation.messages.append(user_msg)
         self._add_bubble("user", message)
 
-        # Save conversation
-        self.storage.save_conversation(self.current_conversation)
+        # Save the new message
+        self.storage.append_message(conversation.id, user_msg)
 
         # Get AI response
         settings = self.storage.get_settings()
-        if not settings.api_key:
+        if not settings.api_key and CLIENTS.requires_api_key(settings.api_provider):
             self._show_error("Please configure API key in settings")
-            self.is_loading = False  # Stop loading on error
             return
 
-        # Start AI response in thread
-        thread = threading.Thread(target=self._get_ai_response, args=(settings,))
-        thread.start()
+        # Queued until a worker is free; the reply stays tied to this conversation
+        timer.provider, timer.model = settings.api_provider, settings.model
+        job = self.scheduler.submit(
+            conversation.id, lambda cancel: self._stream_reply(conversation, settings, cancel, timer)
+        )
+        job.add_done_callback(self._update_loading)
+        self._update_loading()
+
+    def _context_for(self, conversation_id: str, settings: Settings) -> ContextWindow:
+        # Kept per conversation so the summary of older turns rolls forward
+        context = self._contexts.get(conversation_id)
+        if context is None or context.model != settings.model:
+            context = self._contexts[conversation_id] = ContextWindow(
+                settings.model, summarize=extractive_summary
+            )
+        return context
 
-    def _get_ai_response(self, settings: Settings):
+    async def _stream_reply(self, conversation: Conversation, settings: Settings,
+                            cancel: CancelToken, timer: StreamTimer):
+        # Stream on the app's event loop; the UI picks up the text once per tick
+        reply = self._replies[conversation.id] = _Reply(conversation, cancel, timer)
+        publish = Clock.schedule_interval(lambda dt: self._publish_stream(reply), 1 / STREAM_UPDATE_RATE)
         try:
-            client = get_client(settings.api_provider, settings.api_key, settings.model)
+            await self._get_ai_response(settings, conversation.id, reply.buffer, cancel, timer)
+        finally:
+            publish.cancel()
+            del self._replies[conversation.id]
+        self._finish_reply(reply)
 
-            # Stream response FIRST, without modifying shared state
-            response_text = ""
-            for chunk in client.send_message(self.current_conversation.messages):
-                response_text += chunk
-                Clock.schedule_once(lambda dt: self._update_last_bubble(response_text), 0)
+    async def _get_ai_response(self, settings: Settings, conversation_id: str, buffer: StreamBuffer,
+                               cancel: CancelToken, timer: StreamTimer):
+        # This task's own context, so the adapter reports to this reply's timer
+        current_timer.set(timer)
+        try:
+            # Read newest first on the storage thread, only as far back as the budget
+            # and summary need; queued after the user's message, so it is included
+            service = self.storage.service
+            messages = await asyncio.wrap_future(self.storage.submit(
+                self._context_for(conversation_id, settings).build_paged,
+                lambda before: service.get_messages(conversation_id, before=before)
+            ))
+            cache = None
+            if settings.response_cache:
+                # Opening it creates the database on first use, so not on the UI thread
+                cache = await asyncio.wrap_future(self.storage.submit(
+                    get_response_cache, Path(self.storage.data_dir) / "response_cache"
+                ))
+            client = get_routed_client(settings_routes(settings), cache=cache)
+            async with aclosing(client.asend_message(messages, cancel=cancel)) as chunks:
+                async for chunk in chunks:
+                    timer.chunk(chunk)
+                    await buffer.apush(chunk)
+            buffer.close()
+        except asyncio.CancelledError:
+            buffer.close()
+            if not cancel.cancelled:
+                raise
+            # Stopped while waiting on the buffer rather than on the adapter
+            uncancel_current_task()
+        except Exception as e:
+            buffer.close(error=e)
 
-            # Add to conversation on main thread AFTER streaming completes
-            def save_message(dt):
-                ai_msg = Message(role="assistant", content=response_text)
-                self.current_conversation.messages.append(ai_msg)
-                self.storage.save_conversation(self.current_conversation)
-                self.is_loading = False  # Stop loading
-            Clock.schedule_once(save_message, 0)
+    def stop_generation(self):
+        """Abort the open conversation's reply; the text received so far is kept."""
+        if self.current_conversation is not None:
+            self.scheduler.cancel(self.current_conversation.id)
 
-        except Exception as e:
-            Clock.schedule_once(lambda dt: self._show_error(str(e)), 0)
-            self.is_loading = False  # Stop loading on error
+    def stop_all(self):
+        """Cancel every reply and save the text each has received so far.
+
+        Called at exit before storage closes; the cancelled tasks only wind
+        down after that, too late to write anything.
+        """
+        self.scheduler.cancel_all()
+        for reply in list(self._replies.values()):
+            self._finish_reply(reply)
+
+    def _publish_stream(self, reply: _Reply):
+        # Taken even when off screen, so the producer never waits on a hidden chat
+        text, _ = reply.buffer.take()
+        if text is None or reply.discard:
+            return
+        if self._is_open(reply.conversation.id):
+            self._update_last_bubble(text)
+            reply.timer.rendered()
+        else:
+            # Never reached a bubble, so it does not count towards UI lag
+            reply.timer.hidden()
+
+    def _finish_reply(self, reply: _Reply):
+        if reply.finished:
+            return
+        reply.finished = True
+        if reply.discard:
+            return
+        conversation, cancel, timer = reply.conversation, reply.cancel, reply.timer
+        self._publish_stream(reply)
+        buffer = reply.buffer
+        if buffer.error is not None:
+            if self._is_open(conversation.id):
+                self._show_error(str(buffer.error))
+        elif buffer.text or not cancel.cancelled:
+            token_count = count_tokens(buffer.text)
+            ai_msg = Message(role="assistant", content=buffer.text, token_count=token_count,
+                             metrics=timer.finish(token_count))
+            conversation.messages.append(ai_msg)
+            if self._is_open(conversation.id) and self.current_conversation is not conversation:
+                # Reopened while streaming: the screen holds a fresh copy of the conversation
+                self.current_conversation.messages.append(ai_msg)
+            self.storage.append_message(conversation.id, ai_msg)
 
     def _update_last_bubble(self, content: str):
         if self.ids.message_list.data:
@@ -171,6 +338,8 @@ class MainScreen(MDScreen):
             self.drawer.set_state("toggle")
 
     def open_settings(self):
+        # Imported, and its KV rules compiled, only once a session opens it
+        from ui.settings_screen import SettingsScreen
         settings_screen = SettingsScreen()
         settings_dialog = MDDialog(
             title="Settings",
@@ -180,8 +349,24 @@ class MainScreen(MDScreen):
         settings_screen.dialog = settings_dialog  # Store reference
         settings_dialog.open()
 
+    def open_diagnostics(self):
+        from ui.diagnostics_screen import DiagnosticsScreen
+        diagnostics = DiagnosticsScreen()
+        dialog = MDDialog(
+            title="Diagnostics",
+            type="custom",
+            content_cls=diagnostics,
+        )
+        diagnostics.dialog = dialog
+        dialog.open()
+
     def clear_chat(self):
-        self.current_conversation.messages = []
+        reply = self._replies.get(self.current_conversation.id)
+        if reply is not None:
+            reply.discard = True
+        self.scheduler.cancel(self.current_conversation.id)
+        self._contexts.pop(self.current_conversation.id, None)
+        self.message_source.clear()
         self._refresh_messages()
         self.storage.save_conversation(self.current_conversation)
 
@@ -2,7 +2,9 @@
 from kivy.lang import Builder
 from kivy.properties import StringProperty
 from kivymd.uix.label import MDLabel
-from markdown import markdown
+from ui.incremental_markdown import IncrementalMarkdownRenderer
+from ui.kivy_markdown import markdown_to_markup
+from ui.render_cache import render_cache
 import re
 
 KV_CODE = """
@@ -16,6 +18,9 @@ class MarkdownLabel(MDLabel):
     source_text = StringProperty("")
 
     def __init__(self, **kwargs):
+        # Streaming replies only extend source_text, so finished blocks are reused
+        self._renderer = IncrementalMarkdownRenderer(self._render_block)
+        self._last_source = ""
         super().__init__(**kwargs)
         # Don't call _render_markdown() here - on_source_text will handle it
 
@@ -23,23 +28,39 @@ class MarkdownLabel(MDLabel):
         self._render_markdown()
 
     def _render_markdown(self):
-        if not self.source_text:
+        source = self.source_text
+        streaming = bool(self._last_source) and source.startswith(self._last_source)
+        self._last_source = source
+        if not source:
             self.text = ""
             return
 
         try:
-            # Convert markdown to HTML
-            html = markdown(self.source_text)
-
-            # Convert HTML to Kivy markup
-            kivy_markup = self._html_to_kivy_markup(html)
-            self.text = kivy_markup
+            if streaming:
+                self.text = self._renderer.render(source)
+                return
+            # New content, usually a recycled bubble: reuse an earlier render if there is one
+            self._renderer.reset()
+            markup = render_cache.get(source)
+            if markup is None:
+                markup = self._renderer.render(source)
+                render_cache.put(source, markup)
+            self.text = markup
         except Exception as e:
             # Fallback to plain text if conversion fails
-            self.text = self.source_text
+            self._renderer.reset()
+            self.text = source
+
+    def _render_block(self, block: str) -> str:
+        return markdown_to_markup(block)
+
+    @staticmethod
+    def _html_to_kivy_markup(html: str) -> str:
+        """Simple HTML to Kivy markup conversion.
 
-    def _html_to_kivy_markup(self, html: str) -> str:
-        """Simple HTML to Kivy markup conversion"""
+        The previous rendering path (``markdown`` to HTML, then this), kept
+        so benchmarks can compare it against ``markdown_to_markup``.
+        """
         result = html
 
         # Handle line breaks first
@@ -0,0 +1,71 @@
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from data.models import Message, MessagePage
+from data.storage import MESSAGE_PAGE_SIZE
+
+
+def bubble_data(message: Message) -> dict:
+    return {'role': message.role, 'content': message.content}
+
+
+class MessageSource:
+    """Windowed view of one conversation for the ``message_list`` RecycleView.
+
+    Only the newest page is read when a conversation opens; older pages are
+    fetched from storage as the user scrolls towards the top. ``messages``
+    holds whatever is loaded so far, oldest first. Pages are requested from
+    an ``AsyncStorage`` and merged when its callback fires, so messages sent
+    while a page is loading keep their place after it.
+    """
+
+    def __init__(self, storage, conv_id: str, page_size: int = MESSAGE_PAGE_SIZE):
+        self.storage = storage
+        self.conv_id = conv_id
+        self.page_size = page_size
+        self.messages: List[Message] = []
+        self.cursor: Optional[int] = None
+        self.loading = False
+        self._generation = 0  # bumped by clear() so in-flight pages are dropped
+
+    @property
+    def has_older(self) -> bool:
+        return self.cursor is not None
+
+    def load_latest(self, callback: Optional[Callable[[List[Message]], None]] = None) -> Future:
+        self.loading = True
+        return self.storage.get_messages(
+            self.conv_id, limit=self.page_size,
+            callback=self._page_handler(callback)
+        )
+
+    def load_older(self, callback: Optional[Callable[[List[Message]], None]] = None) -> Optional[Future]:
+        """Fetch the page before the oldest loaded message and prepend it.
+
+        Returns None when there is nothing older or a page is already loading.
+        """
+        if self.cursor is None or self.loading:
+            return None
+        self.loading = True
+        return self.storage.get_messages(
+            self.conv_id, before=self.cursor, limit=self.page_size,
+            callback=self._page_handler(callback)
+        )
+
+    def _page_handler(self, callback):
+        generation = self._generation
+
+        def on_page(page: MessagePage):
+            if generation != self._generation:
+                return
+            self.messages[:0] = page.messages
+            self.cursor = page.cursor
+            self.loading = False
+            if callback:
+                callback(page.messages)
+        return on_page
+
+    def clear(self) -> None:
+        self._generation += 1
+        self.messages.clear()
+        self.cursor = None
+        self.loading = False
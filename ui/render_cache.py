@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# Bump when the markdown-to-markup conversion changes so persisted entries are ignored
+RENDER_VERSION = "2"
+
+MAX_ENTRIES = 512
+MAX_CHARS = 2_000_000  # total characters of cached markup
+
+
+def content_key(source: str) -> str:
+    return hashlib.sha1(f"{RENDER_VERSION}\0{source}".encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Bounded LRU cache from message source to rendered Kivy markup.
+
+    Keys are content hashes, so recycled bubbles showing the same message
+    share one entry. Least recently used entries are evicted once either
+    ``max_entries`` or ``max_chars`` of markup is exceeded. ``hits``,
+    ``misses`` and ``evictions`` count cache traffic. With ``load``/``save``
+    the cache survives restarts, so reopening a long conversation does not
+    re-render it.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_chars: int = MAX_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> markup
+        self._chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._chars
+
+    def get(self, source: str) -> Optional[str]:
+        key = content_key(source)
+        with self._lock:
+            markup = self._entries.get(key)
+            if markup is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return markup
+
+    def put(self, source: str, markup: str) -> None:
+        if len(markup) > self.max_chars:
+            return
+        key = content_key(source)
+        with self._lock:
+            self._store(key, markup)
+
+    def _store(self, key: str, markup: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._chars -= len(old)
+        self._entries[key] = markup
+        self._chars += len(markup)
+        while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+            _, evicted = self._entries.popitem(last=False)
+            self._chars -= len(evicted)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "chars": self._chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def save(self, path: Path) -> None:
+        with self._lock:
+            data = {"version": RENDER_VERSION, "entries": list(self._entries.items())}
+        tmp_path = Path(path).with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Path) -> None:
+        """Merge entries saved by ``save``; a missing or stale file is ignored."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != RENDER_VERSION:
+            return
+        with self._lock:
+            for key, markup in data.get("entries", []):
+                if key not in self._entries:
+                    self._store(key, markup)
+
+
+# Shared by every MarkdownLabel in the process
+render_cache = RenderCache()
@@ -0,0 +1,139 @@
+# ui/scheduler.py
+import asyncio
+from collections import deque
+from itertools import count
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from api.cancel import CancelToken
+from ui.tasks import spawn
+
+# Replies that may stream at the same time, across all conversations
+MAX_WORKERS = 3
+
+Work = Callable[[CancelToken], Awaitable[None]]
+
+
+class Job:
+    """One request, tied to the conversation its reply belongs to."""
+
+    def __init__(self, conversation_id: str, work: Work, seq: int):
+        self.conversation_id = conversation_id
+        self.work = work
+        self.seq = seq  # submission order
+        self.cancel = CancelToken()
+        self.state = "queued"  # then "running", then "done"
+        self.task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+        self._callbacks: List[Callable[["Job"], None]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    def add_done_callback(self, callback: Callable[["Job"], None]) -> None:
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    async def wait(self) -> None:
+        await self._done.wait()
+
+    def _finish(self) -> None:
+        self.state = "done"
+        self._done.set()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class RequestScheduler:
+    """Runs requests on the event loop, at most ``max_workers`` at once.
+
+    Each conversation has its own FIFO queue and at most one request
+    running, so its replies come in the order they were asked for while
+    different conversations generate side by side. When a worker frees up,
+    the longest-waiting request of an idle conversation goes next.
+
+    ``work`` is called with the job's CancelToken once the job starts.
+    Cancelling a job that is still queued drops it without running it.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._queues: Dict[str, Deque[Job]] = {}
+        self._running: Dict[str, Job] = {}
+        self._seq = count()
+
+    def submit(self, conversation_id: str, work: Work) -> Job:
+        job = Job(conversation_id, work, next(self._seq))
+        job.cancel.on_cancel(lambda: self._drop(job))
+        self._queues.setdefault(conversation_id, deque()).append(job)
+        self._dispatch()
+        return job
+
+    def running(self, conversation_id: str) -> Optional[Job]:
+        return self._running.get(conversation_id)
+
+    def queued(self, conversation_id: str) -> int:
+        return len(self._queues.get(conversation_id, ()))
+
+    def busy(self, conversation_id: str) -> bool:
+        """True while a request for the conversation is running or waiting."""
+        return conversation_id in self._running or conversation_id in self._queues
+
+    @property
+    def active(self) -> int:
+        return len(self._running)
+
+    def cancel(self, conversation_id: str) -> None:
+        """Cancel the conversation's running request and drop its queued ones."""
+        jobs = list(self._queues.get(conversation_id, ()))
+        if conversation_id in self._running:
+            jobs.append(self._running[conversation_id])
+        for job in jobs:
+            job.cancel.cancel()
+
+    def cancel_all(self) -> None:
+        for conversation_id in list(self._queues) + list(self._running):
+            self.cancel(conversation_id)
+
+    def _drop(self, job: Job) -> None:
+        if job.state != "queued":
+            return
+        queue = self._queues[job.conversation_id]
+        queue.remove(job)
+        if not queue:
+            del self._queues[job.conversation_id]
+        job._finish()
+
+    def _next(self) -> Optional[Job]:
+        waiting = [queue[0] for conversation_id, queue in self._queues.items()
+                   if conversation_id not in self._running]
+        if not waiting:
+            return None
+        job = min(waiting, key=lambda j: j.seq)
+        queue = self._queues[job.conversation_id]
+        queue.popleft()
+        if not queue:
+            del self._queues[job.conversation_id]
+        return job
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self.max_workers:
+            job = self._next()
+            if job is None:
+                return
+            job.state = "running"
+            self._running[job.conversation_id] = job
+            job.task = spawn(self._run(job))
+
+    async def _run(self, job: Job) -> None:
+        try:
+            await job.work(job.cancel)
+        finally:
+            del self._running[job.conversation_id]
+            job._finish()
+            self._dispatch()
@@ -3,12 +3,16 @@ from kivy.lang import Builder
 from kivy.properties import ObjectProperty
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.boxlayout import MDBoxLayout
-from data.storage import StorageManager
+from kivymd.uix.menu import MDDropdownMenu
+from ui.storage import get_ui_storage
 from data.models import Settings
+from api.config import evict_client, CLIENTS
+from api.router import settings_routes
 
 PROVIDER_NAMES = {
     "openai": "OpenAI",
     "deepseek": "DeepSeek",
+    "local": "Local",
 }
 
 KV_CODE = """
@@ -75,6 +79,49 @@ KV_CODE = """
             hint_text: "gpt-3.5-turbo"
             mode: "fill"
 
+    MDBoxLayout:
+        orientation: 'vertical'
+        size_hint_y: None
+        height: self.minimum_height
+        spacing: "8dp"
+
+        MDLabel:
+            text: "Backup Provider"
+            font_style: "Subtitle2"
+            size_hint_y: None
+            height: self.texture_size[1]
+
+        MDDropDownItem:
+            id: backup_provider_dropdown
+            text: "None"
+            on_release: root.show_backup_provider_menu()
+
+        MDTextField:
+            id: backup_api_key_input
+            hint_text: "Backup API key"
+            password: True
+            mode: "fill"
+
+        MDTextField:
+            id: backup_model_input
+            hint_text: "Backup model (provider default if empty)"
+            mode: "fill"
+
+    MDBoxLayout:
+        size_hint_y: None
+        height: "48dp"
+        spacing: "8dp"
+
+        MDLabel:
+            text: "Reuse replies to repeated questions"
+            font_style: "Subtitle2"
+
+        MDSwitch:
+            id: response_cache_switch
+            size_hint_x: None
+            width: "48dp"
+            pos_hint: {"center_y": .5}
+
     MDWidget:
         # Spacer
 
@@ -103,7 +150,7 @@ class SettingsScreen(MDBoxLayout):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.storage = StorageManager()
+        self.storage = get_ui_storage()
         self._load_settings()
 
     def _load_settings(self):
@@ -112,11 +159,16 @@ class SettingsScreen(MDBoxLayout):
         self.ids.provider_dropdown.text = PROVIDER_NAMES.get(provider, provider.capitalize())
         self.ids.api_key_input.text = self.settings.api_key
         self.ids.model_input.text = self.settings.model
+        self.ids.response_cache_switch.active = self.settings.response_cache
+        self.set_backup_provider(self.settings.backup_provider)
+        self.ids.backup_api_key_input.text = self.settings.backup_api_key
+        self.ids.backup_model_input.text = self.settings.backup_model
 
     def show_provider_menu(self):
         menu_items = [
             {"text": "OpenAI", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_provider("openai")},
             {"text": "DeepSeek", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_provider("deepseek")},
+            {"text": "Local", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_provider("local")},
         ]
 
         MDDropdownMenu(
@@ -127,25 +179,65 @@ class SettingsScreen(MDBoxLayout):
     def set_provider(self, provider: str):
         self.ids.provider_dropdown.text = PROVIDER_NAMES.get(provider, provider.capitalize())
 
+    def show_backup_provider_menu(self):
+        menu_items = [
+            {"text": "None", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_backup_provider("")},
+            {"text": "OpenAI", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_backup_provider("openai")},
+            {"text": "DeepSeek", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_backup_provider("deepseek")},
+            {"text": "Local", "viewclass": "OneLineListItem", "on_release": lambda x: self.set_backup_provider("local")},
+        ]
+
+        MDDropdownMenu(
+            items=menu_items,
+            width_mult=4,
+        ).open(self.ids.backup_provider_dropdown)
+
+    def set_backup_provider(self, provider: str):
+        if provider:
+            self.ids.backup_provider_dropdown.text = PROVIDER_NAMES.get(provider, provider.capitalize())
+        else:
+            self.ids.backup_provider_dropdown.text = "None"
+
+    @staticmethod
+    def _provider_for(name: str) -> str:
+        # Map display name back to provider key
+        name_to_provider = {v: k for k, v in PROVIDER_NAMES.items()}
+        return name_to_provider.get(name, name.lower())
+
     def save_settings(self):
+        from kivymd.toast import toast
         api_key = self.ids.api_key_input.text.strip()
+        provider = self._provider_for(self.ids.provider_dropdown.text)
 
-        if not api_key:
+        if not api_key and CLIENTS.requires_api_key(provider):
             # Show error - for now use a simple toast
-            from kivymd.toast import toast
             toast("Please enter an API key")
             return
 
-        # Map display name back to provider key
-        name_to_provider = {v: k for k, v in PROVIDER_NAMES.items()}
-        self.settings.api_provider = name_to_provider.get(
-            self.ids.provider_dropdown.text,
-            self.ids.provider_dropdown.text.lower()
-        )
+        backup_api_key = self.ids.backup_api_key_input.text.strip()
+        backup_provider = ""
+        if self.ids.backup_provider_dropdown.text != "None":
+            backup_provider = self._provider_for(self.ids.backup_provider_dropdown.text)
+            if not backup_api_key and CLIENTS.requires_api_key(backup_provider):
+                toast("Please enter an API key for the backup provider")
+                return
+
+        previous = settings_routes(self.settings)
+
+        self.settings.api_provider = provider
         self.settings.api_key = api_key
         self.settings.model = self.ids.model_input.text or "gpt-3.5-turbo"
+        self.settings.response_cache = self.ids.response_cache_switch.active
+        self.settings.backup_provider = backup_provider
+        self.settings.backup_api_key = backup_api_key if backup_provider else ""
+        self.settings.backup_model = self.ids.backup_model_input.text.strip() if backup_provider else ""
 
         self.storage.save_settings(self.settings)
+        current = settings_routes(self.settings)
+        for route in previous:
+            if route not in current:
+                # Built for the old key or model; replies streaming on it finish first
+                evict_client(route.provider, route.api_key, route.model, route.base_url)
 
         if self.callback:
             self.callback(self.settings)
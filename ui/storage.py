@@ -0,0 +1,23 @@
+from kivy.app import App
+from kivy.clock import Clock
+from data.async_storage import AsyncStorage
+from data.config import get_async_storage
+from data.paths import set_data_dir_provider
+
+
+def app_data_dir() -> str:
+    """The running app's per-user data directory."""
+    return App.get_running_app().user_data_dir
+
+
+set_data_dir_provider(app_data_dir)
+
+
+def clock_dispatch(fn):
+    """Run ``fn`` on the Kivy main thread at the next frame."""
+    Clock.schedule_once(lambda dt: fn(), 0)
+
+
+def get_ui_storage() -> AsyncStorage:
+    """Shared storage whose callbacks are delivered on the main thread."""
+    return get_async_storage(dispatch=clock_dispatch)
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from typing import Optional, Tuple
+
+# UI updates per second while a reply streams
+STREAM_UPDATE_RATE = 20
+
+# Unpublished characters the producer may queue before it has to wait
+MAX_PENDING_CHARS = 64 * 1024
+
+
+class StreamBuffer:
+    """Hand-off between the thread reading an adapter and the UI thread.
+
+    The reader ``push``es chunks as they arrive; the UI ``take``s the text
+    on its own schedule, once per frame at most, so a reply costs one UI
+    update per tick rather than one per token. Chunks are joined only when
+    taken. If the UI falls behind by more than ``max_pending`` characters
+    the reader blocks until it catches up.
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING_CHARS):
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._text = ""
+        self._chunks = []
+        self._pending = 0
+        self._done = False
+        self.error: Optional[BaseException] = None
+
+    def push(self, chunk: str) -> None:
+        with self._cond:
+            while self._pending >= self.max_pending and not self._done:
+                self._cond.wait()
+            if self._done:
+                return
+            self._chunks.append(chunk)
+            self._pending += len(chunk)
+
+    async def apush(self, chunk: str) -> None:
+        """``push`` for a producer running on the UI thread's event loop.
+
+        Waiting for room would block the loop, and with it the UI that has
+        to ``take``, so backpressure yields to the loop instead.
+        """
+        while True:
+            with self._cond:
+                if self._done:
+                    return
+                if self._pending < self.max_pending:
+                    self._chunks.append(chunk)
+                    self._pending += len(chunk)
+                    return
+            await asyncio.sleep(1 / STREAM_UPDATE_RATE)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Mark the stream finished, optionally because of ``error``."""
+        with self._cond:
+            self._done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def take(self) -> Tuple[Optional[str], bool]:
+        """Return (full text if anything arrived since the last take, finished)."""
+        with self._cond:
+            text = None
+            if self._chunks:
+                self._text += "".join(self._chunks)
+                self._chunks = []
+                self._pending = 0
+                self._cond.notify_all()
+                text = self._text
+            return text, self._done
+
+    @property
+    def text(self) -> str:
+        with self._cond:
+            return self._text + "".join(self._chunks)
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+from typing import Coroutine
+
+logger = logging.getLogger(__name__)
+
+# Strong references to running tasks; the loop itself only keeps weak ones
+_tasks = set()
+
+
+def spawn(coro: Coroutine) -> asyncio.Task:
+    """Run ``coro`` on the event loop the app's Clock runs on.
+
+    The app is started with ``async_run(async_lib='asyncio')``, so Kivy
+    callbacks execute inside that loop and tasks spawned here share the UI
+    thread: they may touch widgets directly, and any number of them can
+    stream at once without a thread each.
+    """
+    task = asyncio.get_running_loop().create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
+
+
+def _task_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+
+def running_tasks() -> int:
+    return len(_tasks)